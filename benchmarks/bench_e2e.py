@@ -0,0 +1,131 @@
+"""
+End-to-end benchmark: runs ScraperApp against the local vendr stand-in.
+
+Run from the repository root:
+    python -m benchmarks.bench_e2e --targets sqlite null --latency 0.05 --error-rate 0.01 --output bench.jsonl
+
+Targets:
+    sqlite   - SqliteWriter on a temporary database file
+    postgres - PostgresWriter on --postgres-dsn (or BENCH_POSTGRES_DSN), skipped when not set
+    null     - stand-in writer that drops rows, measures the pipeline without a database
+
+Each run prints one JSON line with pages/sec, rows/sec and the share of reused connections.
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from src.app import ScraperApp
+from src.http_client import connection_stats
+from src.databases import AWriter
+from src.product_batch import ProductBatch
+from .results import emit
+from .vendr_standin import VendrSite, VendrStandIn
+
+
+class NullWriter(AWriter):
+    """Stand-in writer that discards rows."""
+
+    def __init__(self, write_queue, batch_size=20, stop_event=None, flush_policy=None):
+        super().__init__(write_queue, batch_size, stop_event, name="NullWriter", flush_policy=flush_policy)
+
+    def _write(self, batch: ProductBatch):
+        pass
+
+    def _read_fingerprints(self):
+        return []
+
+
+def run_target(target: str, standin: VendrStandIn, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if target == "postgres":
+            os.environ["DB_DSN"] = args.postgres_dsn
+        else:
+            os.environ["DB_DSN"] = str(Path(tmp_dir) / "bench.db")
+        app = ScraperApp(
+            category_urls=standin.category_urls(args.categories),
+            worker_count=args.workers,
+            mode=args.mode,
+            async_concurrency=args.async_concurrency,
+            producer_threads=args.producer_threads,
+            parse_processes=args.parse_processes,
+        )
+        if target == "null":
+            app.db_writer = NullWriter(
+                app.write_queue, app.db_writer.batch_size,
+                stop_event=app.stop_event, flush_policy=app.db_writer.flush_policy
+            )
+
+        # count rows reaching the database
+        rows_written = 0
+        write = app.db_writer._write
+
+        def counting_write(items):
+            nonlocal rows_written
+            write(items)
+            rows_written += len(items)
+
+        app.db_writer._write = counting_write
+
+        requests_before = standin.requests
+        connections_before = connection_stats()
+        started = time.perf_counter()
+        app.start()
+        seconds = time.perf_counter() - started
+        connections = connection_stats()
+
+    pages = standin.requests - requests_before
+    # the connection counters are process-wide, only count this run's share
+    opened = connections["connections_opened"] - connections_before["connections_opened"]
+    sent = connections["requests_sent"] - connections_before["requests_sent"]
+    return {
+        "benchmark": "e2e",
+        "target": target,
+        "mode": args.mode,
+        "workers": args.workers,
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "seconds": round(seconds, 3),
+        "pages": pages,
+        "rows": rows_written,
+        "pages_per_sec": round(pages / seconds, 2),
+        "rows_per_sec": round(rows_written / seconds, 2),
+        "connections_opened": opened,
+        "reuse_ratio": round(1 - opened / sent, 3) if sent else None,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--targets", nargs="+", default=["sqlite", "postgres", "null"],
+                            choices=["sqlite", "postgres", "null"])
+    arg_parser.add_argument("--categories", nargs="+", default=["devops", "it-infrastructure"])
+    arg_parser.add_argument("--subcategories", type=int, default=4)
+    arg_parser.add_argument("--pages", type=int, default=3)
+    arg_parser.add_argument("--cards", type=int, default=12)
+    arg_parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every response")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    arg_parser.add_argument("--mode", default="threads", choices=["threads", "async"])
+    arg_parser.add_argument("--workers", type=int, default=30)
+    arg_parser.add_argument("--async-concurrency", type=int, default=200)
+    arg_parser.add_argument("--producer-threads", type=int, default=4)
+    arg_parser.add_argument("--parse-processes", type=int, default=0)
+    arg_parser.add_argument("--embedded-json", action="store_true", help="serve pages with JSON-LD blobs")
+    arg_parser.add_argument("--postgres-dsn", default=os.environ.get("BENCH_POSTGRES_DSN"))
+    arg_parser.add_argument("--output", type=Path, help="append JSON lines to this file")
+    args = arg_parser.parse_args()
+
+    site = VendrSite(
+        subcategories=args.subcategories, pages=args.pages, cards=args.cards, embedded_json=args.embedded_json
+    )
+    with VendrStandIn(site, latency=args.latency, error_rate=args.error_rate) as standin:
+        for target in args.targets:
+            if target == "postgres" and not args.postgres_dsn:
+                emit({"benchmark": "e2e", "target": target, "skipped": "no --postgres-dsn"}, args.output)
+                continue
+            emit(run_target(target, standin, args), args.output)
+
+
+if __name__ == "__main__":
+    main()
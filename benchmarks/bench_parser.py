@@ -0,0 +1,106 @@
+"""
+Micro-benchmark of per-page extraction: inline document-wide XPath strings
+(the previous implementation) against the precompiled, anchored XPathSelectors.
+Parsing and selection are timed separately, since parsing dominates the total.
+
+Run from the repository root:
+    python -m benchmarks.bench_parser [--repeat N] [product.html listing.html category.html]
+
+Pages default to the fixtures in benchmarks/fixtures, pass saved vendr pages to measure real ones.
+"""
+import argparse
+import timeit
+from pathlib import Path
+from lxml import html
+from src.xpath_selectors import XPathSelectors, content_root, parse_html
+
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+def legacy_product(doc):
+    name_elements = doc.xpath('//h1[contains(@class, "rt-Heading")]')
+    doc.xpath('//div[contains(@class, "_read-more-box__content_122o3_1")]//p[contains(@class, "rt-Text")]')
+    if name_elements:
+        name_elements[0].xpath('.//../..//p')
+    doc.xpath('//div[contains(@class, "_rangeAverage_118fo_42")]/text()[normalize-space()]')
+    doc.xpath('//div[contains(@class, "_rangeSlider_118fo_13")]//span/text()')
+
+
+def registry_product(doc):
+    name_elements = XPathSelectors.HEADING(doc)
+    XPathSelectors.DESCRIPTION(doc)
+    if name_elements:
+        XPathSelectors.FALLBACK_DESCRIPTION(name_elements[0])
+    XPathSelectors.PRICE_AVERAGE(doc)
+    XPathSelectors.PRICE_RANGE(doc)
+
+
+def legacy_listing(doc):
+    doc.xpath('//a[contains(@class, "_card_1u7u9_1 _cardLink_1q928_1")]')
+    doc.xpath('//h1[contains(@class, "rt-Heading")]')
+    doc.xpath('//div[contains(@class, "rt-r-ai-center")]//'
+              'span[contains(string(), "Page") and contains(string(), "of")]')
+
+
+def registry_listing(doc):
+    XPathSelectors.PRODUCT_CARDS(doc)
+    XPathSelectors.HEADING(doc)
+    XPathSelectors.PAGINATION(doc)
+
+
+def legacy_category(doc):
+    doc.xpath('//h1[contains(@class, "rt-Heading")]')
+    doc.xpath('//div[contains(@class, "rt-BaseCard")]//span[contains(text(), "View more")]/..')
+
+
+def registry_category(doc):
+    XPathSelectors.HEADING(doc)
+    XPathSelectors.SUBCATEGORY_LINKS(doc)
+
+
+EXTRACTORS = {
+    "product": (legacy_product, registry_product),
+    "listing": (legacy_listing, registry_listing),
+    "category": (legacy_category, registry_category),
+}
+
+
+def page_kind(path: Path) -> str:
+    for kind in EXTRACTORS:
+        if kind in path.name:
+            return kind
+    return "product"
+
+
+def timed_us(func, repeat: int) -> float:
+    return min(timeit.repeat(func, number=repeat, repeat=7)) / repeat * 1e6
+
+
+def bench(paths, repeat: int) -> None:
+    print(f"{'page':<24}{'parse us':>10}{'tuned us':>10}{'select us':>11}{'registry us':>13}{'total gain':>12}")
+    for path in paths:
+        page_html = path.read_text(encoding="utf-8")
+        legacy, registry = EXTRACTORS[page_kind(path)]
+        legacy_doc = html.fromstring(page_html)
+        registry_root = content_root(parse_html(page_html))
+
+        parse_us = timed_us(lambda: html.fromstring(page_html), repeat)
+        tuned_parse_us = timed_us(lambda: content_root(parse_html(page_html)), repeat)
+        select_us = timed_us(lambda: legacy(legacy_doc), repeat)
+        registry_us = timed_us(lambda: registry(registry_root), repeat)
+        gain = (parse_us + select_us) / (tuned_parse_us + registry_us)
+        print(f"{path.name:<24}{parse_us:>10.1f}{tuned_parse_us:>10.1f}{select_us:>11.1f}{registry_us:>13.1f}"
+              f"{gain:>11.2f}x")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("pages", nargs="*", type=Path)
+    arg_parser.add_argument("--repeat", type=int, default=200)
+    args = arg_parser.parse_args()
+    bench(args.pages or sorted(FIXTURES_DIR.glob("*.html")), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
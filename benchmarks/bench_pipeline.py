@@ -0,0 +1,177 @@
+"""
+Micro-benchmarks of single pipeline stages, without network:
+    parser   - ProductParser.parse_product_page on the product fixture, as fetched bytes,
+               with XPath and with the embedded JSON-LD fast path
+    producer - CategoryProducer.produce over the in-process VendrSite
+    flush    - AWriter._flush of batches into SQLite (plain, bulk and bulk with deferred index)
+               and Postgres (plain and bulk, with --postgres-dsn)
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline [--stages parser producer flush] [--output bench.jsonl]
+
+Each stage prints one JSON line with its throughput.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from queue import Queue
+from src.databases import PostgresWriter, SqliteWriter
+from src.databases.sqlite_writer import BULK_PRAGMAS
+from src.embedded_json import JSON_PATH, XPATH_PATH
+from src.parser import ProductParser
+from src.producers import CategoryProducer
+from src.product import Product
+from .results import emit
+from .vendr_standin import FixtureHttpClient, VendrSite
+
+
+def bench_parser(args, embedded_json: bool = False) -> dict:
+    parser = ProductParser()
+    page_html = VendrSite(embedded_json=embedded_json).product_page("Datadog").encode("utf-8")
+    started = time.perf_counter()
+    for i in range(args.parser_pages):
+        parser.parse_product_page(page_html, f"/marketplace/{i}", "DevOps", "utf-8")
+    seconds = time.perf_counter() - started
+    return {
+        "benchmark": "parser",
+        "path": JSON_PATH if embedded_json else XPATH_PATH,
+        "pages": args.parser_pages,
+        "seconds": round(seconds, 3),
+        "pages_per_sec": round(args.parser_pages / seconds, 2),
+    }
+
+
+def bench_producer(args) -> dict:
+    site = VendrSite(subcategories=8, pages=5, cards=24)
+    http_client = FixtureHttpClient(site)
+    fetched = 0
+    render = site.render
+
+    def counting_render(url):
+        nonlocal fetched
+        fetched += 1
+        return render(url)
+
+    site.render = counting_render
+    task_queue = Queue()
+    producer = CategoryProducer(
+        http_client,
+        [f"http://vendr.test/categories/{name}" for name in ("devops", "it-infrastructure", "data")],
+        task_queue,
+        producer_threads=args.producer_threads,
+    )
+    started = time.perf_counter()
+    producer.produce()
+    seconds = time.perf_counter() - started
+    return {
+        "benchmark": "producer",
+        "producer_threads": args.producer_threads,
+        "pages": fetched,
+        "tasks": task_queue.qsize(),
+        "seconds": round(seconds, 3),
+        "pages_per_sec": round(fetched / seconds, 2),
+    }
+
+
+def make_products(count: int):
+    return [
+        Product(
+            name=f"Vendor {i}",
+            description="Monitoring and analytics platform for developers. " * 4,
+            category="DevOps - Monitoring",
+            min_price=1000 + i,
+            max_price=50000 + i,
+            median_price=12000 + i,
+            url=f"https://www.vendr.com/marketplace/vendor-{i}",
+        )
+        for i in range(count)
+    ]
+
+
+def bench_flush(writer, target: str, args) -> dict:
+    products = make_products(args.flush_rows)
+    started = time.perf_counter()
+    for start in range(0, len(products), args.batch_size):
+        writer._buffer.extend(products[start:start + args.batch_size])
+        writer._flush()
+    if isinstance(writer, SqliteWriter) and writer.bulk:
+        writer._commit()
+    if getattr(writer, "defer_index", False) or isinstance(writer, PostgresWriter) and writer.bulk:
+        writer._merge_staging()
+    seconds = time.perf_counter() - started
+    return {
+        "benchmark": "flush",
+        "target": target,
+        "batch_size": args.batch_size,
+        "rows": len(products),
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(len(products) / seconds, 2),
+    }
+
+
+def bench_sqlite_flush(args, bulk: bool = False, defer_index: bool = False) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        writer = SqliteWriter(
+            str(Path(tmp_dir) / "bench.db"), Queue(), args.batch_size, threading.Event(),
+            bulk=bulk, defer_index=defer_index
+        )
+        writer._conn = sqlite3.connect(writer.dsn)
+        if bulk:
+            for pragma in BULK_PRAGMAS:
+                writer._conn.execute(pragma)
+        writer._ensure_table()
+        if writer.defer_index:
+            writer._ensure_staging_table()
+        target = "sqlite-bulk-deferred" if writer.defer_index else "sqlite-bulk" if bulk else "sqlite"
+        try:
+            return bench_flush(writer, target, args)
+        finally:
+            writer._conn.close()
+
+
+def bench_postgres_flush(args, bulk: bool = False) -> dict:
+    import psycopg2
+
+    writer = PostgresWriter(args.postgres_dsn, Queue(), args.batch_size, threading.Event(), bulk=bulk)
+    writer._conn = psycopg2.connect(writer.dsn)
+    writer._ensure_table()
+    if bulk:
+        writer._ensure_staging_table()
+    try:
+        return bench_flush(writer, "postgres-bulk" if bulk else "postgres", args)
+    finally:
+        writer._conn.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--stages", nargs="+", default=["parser", "producer", "flush"],
+                            choices=["parser", "producer", "flush"])
+    arg_parser.add_argument("--parser-pages", type=int, default=500)
+    arg_parser.add_argument("--producer-threads", type=int, default=4)
+    arg_parser.add_argument("--flush-rows", type=int, default=5000)
+    arg_parser.add_argument("--batch-size", type=int, default=20)
+    arg_parser.add_argument("--postgres-dsn", default=os.environ.get("BENCH_POSTGRES_DSN"))
+    arg_parser.add_argument("--output", type=Path, help="append JSON lines to this file")
+    args = arg_parser.parse_args()
+
+    if "parser" in args.stages:
+        emit(bench_parser(args), args.output)
+        emit(bench_parser(args, embedded_json=True), args.output)
+    if "producer" in args.stages:
+        emit(bench_producer(args), args.output)
+    if "flush" in args.stages:
+        emit(bench_sqlite_flush(args), args.output)
+        emit(bench_sqlite_flush(args, bulk=True), args.output)
+        emit(bench_sqlite_flush(args, bulk=True, defer_index=True), args.output)
+        if args.postgres_dsn:
+            emit(bench_postgres_flush(args), args.output)
+            emit(bench_postgres_flush(args, bulk=True), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import json
+import platform
+import subprocess
+import time
+from pathlib import Path
+from typing import Optional
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def emit(record: dict, output: Optional[Path] = None) -> dict:
+    """Print a benchmark result as one JSON line and append it to output, if given."""
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        **record,
+    }
+    line = json.dumps(record, sort_keys=True)
+    print(line)
+    if output:
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    return record
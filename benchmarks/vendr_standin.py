@@ -0,0 +1,198 @@
+"""
+Local stand-in for www.vendr.com built from the recorded pages in benchmarks/fixtures.
+
+VendrSite renders category, listing and product pages for any path, VendrStandIn
+serves them over HTTP with configurable latency and error rate, and
+FixtureHttpClient returns them in-process for benchmarks that should not touch sockets.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+from src.http_client import HttpClient, RawPage
+
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+SUBCATEGORY_CARD = re.compile(r'\s*<div class="rt-Card rt-BaseCard _subcategory.*?</div>', re.S)
+PRODUCT_CARD = re.compile(r'\s*<a class="rt-reset _card_1u7u9_1.*?</a>', re.S)
+PRODUCT_HREF = re.compile(r'<a class="rt-reset _card_1u7u9_1[^>]*href="([^"]+)"')
+
+
+class VendrSite:
+    """
+    Renders vendr-like pages from the fixtures:
+    /categories/<category>, /categories/<category>/<subcategory>?page=N and /marketplace/<product>.
+    With embedded_json, listing and product pages also carry a JSON-LD blob with the same data.
+    """
+
+    def __init__(self, subcategories: int = 8, pages: int = 5, cards: int = 24, embedded_json: bool = False):
+        self.subcategories = subcategories
+        self.pages = pages
+        self.cards = cards
+        self.embedded_json = embedded_json
+        self.category_template = (FIXTURES_DIR / "category.html").read_text(encoding="utf-8")
+        self.listing_template = (FIXTURES_DIR / "listing.html").read_text(encoding="utf-8")
+        self.product_template = (FIXTURES_DIR / "product.html").read_text(encoding="utf-8")
+        self.product_fields = self._product_fields() if embedded_json else None
+
+    @property
+    def products_per_category(self) -> int:
+        return self.subcategories * self.pages * self.cards
+
+    def render(self, url: str) -> Optional[str]:
+        parsed = urlparse(url)
+        parts = parsed.path.strip("/").split("/")
+        if parts[0] == "categories" and len(parts) == 2:
+            return self.category_page(parts[1])
+        if parts[0] == "categories" and len(parts) == 3:
+            page = int(parse_qs(parsed.query).get("page", ["1"])[0])
+            return self.listing_page(parts[1], parts[2], page)
+        if parts[0] == "marketplace" and len(parts) == 2:
+            return self.product_page(parts[1])
+        return None
+
+    def category_page(self, category: str) -> str:
+        page = self._keep_first(SUBCATEGORY_CARD, self.category_template, self.subcategories)
+        page = page.replace("/categories/devops/", f"/categories/{category}/")
+        return page.replace(">DevOps<", f">{category.title()}<")
+
+    def listing_page(self, category: str, subcategory: str, page_number: int) -> Optional[str]:
+        if not 1 <= page_number <= self.pages:
+            return None
+        page = self._keep_first(PRODUCT_CARD, self.listing_template, self.cards)
+        page = page.replace("/marketplace/vendor-", f"/marketplace/{category}-{subcategory}-p{page_number}-vendor-")
+        page = page.replace("Page 1 of 5", f"Page {page_number} of {self.pages}")
+        page = page.replace(">Monitoring<", f">{subcategory.title()}<")
+        if self.embedded_json:
+            item_list = {
+                "@context": "https://schema.org",
+                "@type": "ItemList",
+                "itemListElement": [
+                    {"@type": "ListItem", "position": i + 1, "url": href}
+                    for i, href in enumerate(PRODUCT_HREF.findall(page))
+                ],
+            }
+            page = self._embed(page, item_list)
+        return page
+
+    def product_page(self, product: str) -> str:
+        page = self.product_template.replace(">Datadog<", f">{product}<")
+        if self.embedded_json:
+            page = self._embed(page, dict(self.product_fields, name=product))
+        return page
+
+    def _product_fields(self) -> dict:
+        """JSON-LD Product holding what the XPath parser reads from the product fixture."""
+        from src.parser import ProductParser
+        product = ProductParser()._parse_product_page(self.product_template, "/marketplace/datadog", "")
+        return {
+            "@context": "https://schema.org",
+            "@type": "Product",
+            "description": product.description,
+            "offers": {
+                "@type": "AggregateOffer",
+                "priceCurrency": "USD",
+                "price": product.median_price,
+                "lowPrice": product.min_price,
+                "highPrice": product.max_price,
+            },
+        }
+
+    @staticmethod
+    def _embed(page: str, data: dict) -> str:
+        script = f'<script type="application/ld+json">{json.dumps(data)}</script>'
+        return page.replace("</head>", f"{script}</head>", 1)
+
+    @staticmethod
+    def _keep_first(pattern: re.Pattern, page: str, count: int) -> str:
+        seen = 0
+
+        def keep(match: re.Match) -> str:
+            nonlocal seen
+            seen += 1
+            return match.group(0) if seen <= count else ""
+
+        return pattern.sub(keep, page)
+
+
+class VendrStandIn:
+    """Threaded HTTP server for VendrSite with per-request latency and a 503 error rate."""
+
+    def __init__(self, site: VendrSite, latency: float = 0.0, error_rate: float = 0.0, port: int = 0):
+        self.site = site
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="VendrStandIn", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def category_urls(self, categories: List[str]) -> List[str]:
+        return [f"{self.base_url}/categories/{category}" for category in categories]
+
+    def __enter__(self) -> "VendrStandIn":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive like the real site, so connection reuse of the clients shows up in the results
+            protocol_version = "HTTP/1.1"
+            # headers and body are separate writes, Nagle would hold the body for the client's delayed ACK
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if standin.latency:
+                    time.sleep(standin.latency)
+                with standin._lock:
+                    standin.requests += 1
+                    failed = random.random() < standin.error_rate
+                    standin.errors += failed
+                if failed:
+                    self.send_error(503)
+                    return
+                page = standin.site.render(self.path)
+                if page is None:
+                    self.send_error(404)
+                    return
+                body = page.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+class FixtureHttpClient(HttpClient):
+    """HttpClient answering from VendrSite in-process, for micro-benchmarks without network."""
+
+    def __init__(self, site: VendrSite):
+        super().__init__()
+        self.site = site
+
+    def fetch_bytes(self, url: str) -> Optional[RawPage]:
+        page = self.site.render(url)
+        return RawPage(page.encode("utf-8"), "utf-8") if page is not None else None
@@ -2,19 +2,92 @@ import os
 import json
 from dotenv import load_dotenv
 from src.app import ScraperApp
+from src.logger import configure_logging
 
 
 load_dotenv()
 
 WORKER_COUNT = int(os.environ.get("WORKER_COUNT", "8"))
+PARSE_PROCESSES = int(os.environ.get("PARSE_PROCESSES", "0"))
 TARGET_URLS = json.loads(os.environ.get("CATEGORIES_URLS", "[]"))
+SCRAPER_MODE = os.environ.get("SCRAPER_MODE", "threads")
+ASYNC_CONCURRENCY = int(os.environ.get("ASYNC_CONCURRENCY", "200"))
+PRODUCER_THREADS = int(os.environ.get("PRODUCER_THREADS", "4"))
+HTTP_CACHE_PATH = os.environ.get("HTTP_CACHE_PATH") or None
+HTTP_CACHE_MAX_MB = int(os.environ.get("HTTP_CACHE_MAX_MB", "512"))
+INCREMENTAL = os.environ.get("INCREMENTAL", "0") == "1"
+METRICS_INTERVAL = float(os.environ.get("METRICS_INTERVAL", "5"))
+METRICS_SNAPSHOT_PATH = os.environ.get("METRICS_SNAPSHOT_PATH") or None
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_HOST = os.environ.get("METRICS_HOST") or "127.0.0.1"
+ADAPTIVE_CONCURRENCY = os.environ.get("ADAPTIVE_CONCURRENCY", "0") == "1"
+LATENCY_TARGET = float(os.environ.get("LATENCY_TARGET", "2"))
+MAX_RETRY_AFTER = float(os.environ.get("MAX_RETRY_AFTER", "60"))
+FRONTIER_PATH = os.environ.get("FRONTIER_PATH") or None
+RESUME = os.environ.get("RESUME", "0") == "1"
+TASK_QUEUE_SIZE = int(os.environ.get("TASK_QUEUE_SIZE", "0"))
+WRITE_QUEUE_SIZE = int(os.environ.get("WRITE_QUEUE_SIZE", "0"))
+QUEUE_SPILL_DIR = os.environ.get("QUEUE_SPILL_DIR") or None
+WORK_QUEUE_DSN = os.environ.get("WORK_QUEUE_DSN") or None
+DISCOVER = os.environ.get("DISCOVER", "1") == "1"
+LEASE_BATCH = int(os.environ.get("LEASE_BATCH", "50"))
+LEASE_SECONDS = float(os.environ.get("LEASE_SECONDS", "60"))
+HTTP2 = os.environ.get("HTTP2", "0") == "1"
+DISCOVERY_SOURCE = os.environ.get("DISCOVERY_SOURCE", "categories")
+SITEMAP_URL = os.environ.get("SITEMAP_URL") or None
+SITEMAP_PRODUCT_PATTERN = os.environ.get("SITEMAP_PRODUCT_PATTERN", "/marketplace/")
+SCHEDULER_PRIORITIES = json.loads(os.environ.get("SCHEDULER_PRIORITIES") or "{}")
+CATEGORY_QUOTAS = json.loads(os.environ.get("CATEGORY_QUOTAS") or "{}")
+PRODUCT_RETRIES = int(os.environ.get("PRODUCT_RETRIES", "1"))
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+LOG_PATH = os.environ.get("LOG_PATH", "app.log")
+LOG_SAMPLE_RATES = json.loads(os.environ.get("LOG_SAMPLE_RATES") or "{}")
+LOG_RATE_LIMITS = json.loads(os.environ.get("LOG_RATE_LIMITS") or "{}")
 
 
 def main():
     """Entrypoint"""
+    configure_logging(
+        level=LOG_LEVEL,
+        log_format=LOG_FORMAT,
+        path=LOG_PATH,
+        sample_rates=LOG_SAMPLE_RATES,
+        rate_limits=LOG_RATE_LIMITS,
+    )
     app = ScraperApp(
         category_urls=TARGET_URLS,
         worker_count=WORKER_COUNT,
+        parse_processes=PARSE_PROCESSES,
+        mode=SCRAPER_MODE,
+        async_concurrency=ASYNC_CONCURRENCY,
+        producer_threads=PRODUCER_THREADS,
+        cache_path=HTTP_CACHE_PATH,
+        cache_max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024,
+        incremental=INCREMENTAL,
+        metrics_interval=METRICS_INTERVAL,
+        metrics_snapshot_path=METRICS_SNAPSHOT_PATH,
+        metrics_port=METRICS_PORT,
+        metrics_host=METRICS_HOST,
+        adaptive_concurrency=ADAPTIVE_CONCURRENCY,
+        latency_target=LATENCY_TARGET,
+        max_retry_after=MAX_RETRY_AFTER,
+        frontier_path=FRONTIER_PATH,
+        resume=RESUME,
+        task_queue_size=TASK_QUEUE_SIZE,
+        write_queue_size=WRITE_QUEUE_SIZE,
+        spill_dir=QUEUE_SPILL_DIR,
+        work_queue_dsn=WORK_QUEUE_DSN,
+        discover=DISCOVER,
+        lease_batch=LEASE_BATCH,
+        lease_seconds=LEASE_SECONDS,
+        http2=HTTP2,
+        discovery_source=DISCOVERY_SOURCE,
+        sitemap_url=SITEMAP_URL,
+        sitemap_product_pattern=SITEMAP_PRODUCT_PATTERN,
+        scheduler_priorities=SCHEDULER_PRIORITIES,
+        category_quotas=CATEGORY_QUOTAS,
+        product_retries=PRODUCT_RETRIES,
     )
     app.start()
 
@@ -1,80 +1,330 @@
 from pathlib import Path
 import threading
 from queue import Queue
-from typing import List
-from src.http_client import HttpClient
+from typing import Dict, List, Optional
+from src.http_client import Http2Client, HttpClient, connection_stats
+from src.http_cache import ResponseCache
+from src.rate_controller import AdaptiveConcurrencyController
+from src.fingerprints import FingerprintStore
+from src.frontier import CrawlFrontier
+from src.work_queue import LeaseFetcher, LeasedWorkQueue, work_queue_from_dsn
+from src.async_http_client import AsyncHttpClient
 from src.parser import ProductParser
-from src.producers import CategoryProducer
+from src.parse_pool import ParsePool
+from src.producers import CategoryProducer, SitemapProducer
+from src.scheduler import TaskScheduler
 from src.worker import ProductWorker
+from src.async_worker import AsyncProductWorker
 import src.databases as databases
-from src.logger import get_logger
+from src.logger import get_logger, log_stats
+from src.metrics import MetricsReporter, metrics
+from src.spill_queue import SpillQueue
+
+
+THREADS_MODE = "threads"
+ASYNC_MODE = "async"
+CATEGORIES_DISCOVERY = "categories"
+SITEMAP_DISCOVERY = "sitemap"
 
 
 class ScraperApp:
-    """Orchestrates producer, workers, and DB writer threads."""
+    """
+    Orchestrates producer, workers, and DB writer threads.
+
+    mode "threads" runs worker_count ProductWorker threads, "async" one AsyncProductWorker.
+    The keyword options enable the optional stages (cache, frontier, parse pool, shared work
+    queue, sitemap discovery, ...) and mirror the variables documented in .env.
+    """
 
-    def __init__(self, category_urls: List[str], worker_count: int):
-        self.http_client = HttpClient()
+    def __init__(
+        self,
+        category_urls: List[str],
+        worker_count: int,
+        mode: str = THREADS_MODE,
+        async_concurrency: int = 200,
+        producer_threads: int = 4,
+        cache_path: Optional[str] = None,
+        cache_max_bytes: int = 512 * 1024 * 1024,
+        incremental: bool = False,
+        parse_processes: int = 0,
+        metrics_interval: float = 5.0,
+        metrics_snapshot_path: Optional[str] = None,
+        metrics_port: int = 0,
+        metrics_host: str = "127.0.0.1",
+        adaptive_concurrency: bool = False,
+        latency_target: float = 2.0,
+        max_retry_after: float = 60.0,
+        frontier_path: Optional[str] = None,
+        resume: bool = False,
+        task_queue_size: int = 0,
+        write_queue_size: int = 0,
+        spill_dir: Optional[str] = None,
+        work_queue_dsn: Optional[str] = None,
+        discover: bool = True,
+        lease_batch: int = 50,
+        lease_seconds: float = 60.0,
+        http2: bool = False,
+        discovery_source: str = CATEGORIES_DISCOVERY,
+        sitemap_url: Optional[str] = None,
+        sitemap_product_pattern: str = "/marketplace/",
+        scheduler_priorities: Optional[Dict[str, int]] = None,
+        category_quotas: Optional[Dict[str, int]] = None,
+        product_retries: int = 1
+    ):
+        self.logger = get_logger("ScraperApp")
+        # on-disk response cache is enabled only when cache_path is set
+        self.response_cache = ResponseCache(cache_path, cache_max_bytes) if cache_path else None
+        fetchers = async_concurrency if mode == ASYNC_MODE else worker_count
+        self.controller = AdaptiveConcurrencyController(
+            max_limit=fetchers + producer_threads,
+            latency_target=latency_target,
+            max_pause=max_retry_after
+        ) if adaptive_concurrency else None
+        http_client_class = Http2Client if http2 else HttpClient
+        self.http_client = http_client_class(
+            cache=self.response_cache, controller=self.controller, pool_size=worker_count + producer_threads
+        )
+        self.fingerprints = FingerprintStore() if incremental else None
+        self.work_queue: Optional[LeasedWorkQueue] = None
+        if work_queue_dsn:
+            if frontier_path:
+                self.logger.warning("Shared work queue replaces the frontier, FRONTIER_PATH is ignored.")
+            self.work_queue = work_queue_from_dsn(work_queue_dsn)
+            self.frontier = self.work_queue
+        else:
+            self.frontier = CrawlFrontier(frontier_path) if frontier_path else None
+        self.resume = resume
+        self.discover = discover
+        if resume and self.frontier is None:
+            self.logger.warning("Resume requested without a frontier path, starting from scratch.")
         self.category_urls = category_urls
         self.parser = ProductParser()
-        self.task_queue: Queue = Queue()
-        self.write_queue: Queue = Queue()
+        # listing pages are fetched by the product workers, one pool of fetch threads
+        shared_pool = mode == THREADS_MODE and not (task_queue_size and spill_dir)
+        if task_queue_size and spill_dir:
+            self.logger.warning("Spilling task queue keeps FIFO order, task priorities are not applied.")
+            self.task_queue: Queue = SpillQueue(task_queue_size, spill_dir)
+        else:
+            self.task_queue: Queue = TaskScheduler(
+                task_queue_size, priorities=scheduler_priorities, category_quotas=category_quotas,
+                max_retries=product_retries, max_jobs=producer_threads if shared_pool else None
+            )
+        self.write_queue: Queue = self._make_queue(write_queue_size, spill_dir)
+        self.parse_pool = ParsePool(
+            self.write_queue, parse_processes, frontier=self.frontier
+        ) if parse_processes > 0 else None
         self.stop_event = threading.Event()
-        self.producer = CategoryProducer(
-            self.http_client,
-            self.category_urls,
-            self.task_queue,
+        self.lease_fetcher = LeaseFetcher(
+            self.work_queue, self.task_queue, lease_batch=lease_batch, lease_seconds=lease_seconds,
+            stop_event=self.stop_event
+        ) if self.work_queue else None
+        metrics.gauge("task_queue_depth", "Product tasks waiting for a worker", self.task_queue.qsize)
+        metrics.gauge("write_queue_depth", "Products waiting for the writer", self.write_queue.qsize)
+        self.metrics_reporter = MetricsReporter(
+            metrics,
+            interval=metrics_interval,
+            snapshot_path=metrics_snapshot_path,
+            port=metrics_port,
+            host=metrics_host,
             stop_event=self.stop_event
         )
-        self.workers: List[ProductWorker] = [
-            ProductWorker(self.http_client, self.parser, self.task_queue, self.write_queue, stop_event=self.stop_event)
-            for _ in range(worker_count)
+        if discovery_source == SITEMAP_DISCOVERY:
+            self.producer: CategoryProducer = SitemapProducer(
+                self.http_client,
+                self.category_urls,
+                self.task_queue,
+                sitemap_url=sitemap_url,
+                product_pattern=sitemap_product_pattern,
+                stop_event=self.stop_event,
+                producer_threads=producer_threads,
+                frontier=self.frontier,
+                shared_pool=shared_pool
+            )
+        elif discovery_source == CATEGORIES_DISCOVERY:
+            self.producer: CategoryProducer = CategoryProducer(
+                self.http_client,
+                self.category_urls,
+                self.task_queue,
+                stop_event=self.stop_event,
+                producer_threads=producer_threads,
+                frontier=self.frontier,
+                shared_pool=shared_pool
+            )
+        else:
+            raise ValueError(f"Unknown discovery source: {discovery_source}")
+        if mode == ASYNC_MODE:
+            self.workers: List[threading.Thread] = [
+                AsyncProductWorker(
+                    AsyncHttpClient(
+                        concurrency=async_concurrency, cache=self.response_cache, controller=self.controller
+                    ),
+                    self.parser, self.task_queue, self.write_queue, concurrency=async_concurrency,
+                    stop_event=self.stop_event, fingerprints=self.fingerprints, parse_pool=self.parse_pool,
+                    frontier=self.frontier
+                )
+            ]
+        elif mode == THREADS_MODE:
+            self.workers: List[threading.Thread] = [
+                ProductWorker(
+                    self.http_client, self.parser, self.task_queue, self.write_queue,
+                    stop_event=self.stop_event, fingerprints=self.fingerprints, parse_pool=self.parse_pool,
+                    frontier=self.frontier
+                )
+                # the producer's listing jobs run on producer_threads of them
+                for _ in range(worker_count + (producer_threads if shared_pool else 0))
+            ]
+        else:
+            raise ValueError(f"Unknown scraper mode: {mode}")
+        export_dsns = databases.get_export_dsns()
+        writer_queue = self.write_queue
+        export_queues: List[Queue] = []
+        self.fanout: Optional[databases.WriteFanOut] = None
+        if export_dsns:
+            # every writer consumes its own copy of write_queue
+            writer_queue = self._make_queue(write_queue_size, spill_dir)
+            export_queues = [self._make_queue(write_queue_size, spill_dir) for _ in export_dsns]
+            self.fanout = databases.WriteFanOut(self.write_queue, [writer_queue] + export_queues, self.stop_event)
+        self.db_writer: databases.AWriter = self._make_writer(
+            databases.get_db_dsn(), writer_queue, fingerprints=self.fingerprints, frontier=self.frontier
+        )
+        # fingerprint filtering and frontier checkpoints belong to the main writer only
+        self.export_writers: List[databases.AWriter] = [
+            self._make_writer(dsn, queue) for dsn, queue in zip(export_dsns, export_queues)
         ]
-        database_dsn = databases.get_db_dsn()
+
+    def _make_writer(
+        self,
+        database_dsn: str,
+        write_queue: Queue,
+        fingerprints: Optional[FingerprintStore] = None,
+        frontier: Optional[CrawlFrontier] = None
+    ) -> databases.AWriter:
+        """Create the writer selected by the DSN: file formats by scheme, PostgreSQL, otherwise SQLite."""
         banch_size = databases.get_writer_batch()
+        flush_policy = databases.get_flush_policy()
 
+        if databases.is_file_dsn(database_dsn):
+            return databases.file_writer_from_dsn(
+                database_dsn, write_queue, banch_size,
+                stop_event=self.stop_event, fingerprints=fingerprints, flush_policy=flush_policy, frontier=frontier
+            )
         # if string database_dsn contains "postgresql" create writer to work with PostgreSQL otherwise SQLite
         if "postgresql" in database_dsn:
-            self.db_writer: databases.AWriter = databases.PostgresWriter(
-                database_dsn, self.write_queue, banch_size, stop_event=self.stop_event
+            return databases.PostgresWriter(
+                database_dsn, write_queue, banch_size,
+                stop_event=self.stop_event, fingerprints=fingerprints, flush_policy=flush_policy,
+                frontier=frontier,
+                bulk=databases.get_postgres_bulk(), bulk_chunk_size=databases.get_postgres_bulk_chunk()
             )
-        else:
-            dsn_path = Path(database_dsn)
+        dsn_path = Path(database_dsn)
 
-            # if parent dir for database in dsn_path not exist or it's not a dir create default path
-            if not (dsn_path.parent.exists() and dsn_path.parent.is_dir()):
-                self.logger.exception("Wrong dsn_path(%s), generage default dsn_path")
-                database_dsn = databases.get_db_dsn(use_env=False)
+        # if parent dir for database in dsn_path not exist or it's not a dir create default path
+        if not (dsn_path.parent.exists() and dsn_path.parent.is_dir()):
+            self.logger.exception("Wrong dsn_path(%s), generage default dsn_path")
+            database_dsn = databases.get_db_dsn(use_env=False)
 
-            self.db_writer: databases.AWriter = databases.SqliteWriter(
-                database_dsn, self.write_queue, banch_size, stop_event=self.stop_event
-            )
-
-        self.logger = get_logger("ScraperApp")
+        return databases.SqliteWriter(
+            database_dsn, write_queue, banch_size,
+            stop_event=self.stop_event, fingerprints=fingerprints, flush_policy=flush_policy,
+            frontier=frontier,
+            bulk=databases.get_sqlite_bulk(), bulk_commit_rows=databases.get_sqlite_commit_rows(),
+            defer_index=databases.get_sqlite_defer_index()
+        )
 
     def start(self):
-        self.logger.info("ScraperApp starting.")
+        self.logger.info("ScraperApp starting with %d worker thread(s).", len(self.workers))
+        self.db_writer.load_fingerprints()
+        if isinstance(self.producer, SitemapProducer) and self.discover:
+            self.producer.set_known_categories(self.db_writer.read_product_categories())
+        self.metrics_reporter.start()
         # start DB writer
         self.db_writer.start()
+        for writer in self.export_writers:
+            writer.start()
+        if self.fanout:
+            self.fanout.start()
         # start worker threads
         for w in self.workers:
             w.start()
+        # workers already run, so a bounded task_queue can not block the resumed tasks forever
+        self._prepare_frontier()
+        if self.lease_fetcher:
+            self.lease_fetcher.start()
         # producer runs in main thread here (could be a separate thread if desired)
         try:
-            self.producer.produce()
+            if self.discover:
+                self.producer.produce()
+                if self.work_queue is not None and not self.stop_event.is_set():
+                    self.work_queue.set_discovery_done()
+            if self.lease_fetcher:
+                self.logger.info("Waiting for the shared work queue to drain...")
+                self.lease_fetcher.drained.wait()
             # Wait for all enqueued tasks to be processed
             self.logger.info("Producer done. Waiting for task queue to drain...")
             self.task_queue.join()
+            if self.parse_pool:
+                self.logger.info("Waiting for parse pool to finish...")
+                self.parse_pool.join()
             self.logger.info("Task queue drained. Waiting for write queue to finish...")
             self.write_queue.join() 
+            if self.fanout:
+                self.fanout.join_queues()
             # signal writer to flush and stop
             self.stop_event.set()
             # Wait for writer to finish
             self.db_writer.join(timeout=30)
+            for writer in self.export_writers:
+                writer.join(timeout=30)
         except KeyboardInterrupt:
             self.logger.info("Interrupted by user, shutting down...")
             self.stop_event.set()
+            if self.parse_pool:
+                self.parse_pool.shutdown()
         finally:
             # ensure stop event set
             self.stop_event.set()
+            self.http_client.close()
+            if self.response_cache:
+                self.response_cache.close()
+            for queue in [self.task_queue, self.write_queue] + (self.fanout.writer_queues if self.fanout else []):
+                if isinstance(queue, SpillQueue):
+                    queue.close()
+            if self.lease_fetcher:
+                self.lease_fetcher.join(timeout=5)
+                # tasks not written by this node go back to the other nodes
+                self.work_queue.release()
+            if self.frontier:
+                self.logger.info("Frontier: %s", self.frontier.summary())
+                self.frontier.close()
+            if self.fingerprints is not None:
+                self.logger.info("Products: %s", self.fingerprints.summary())
+            self.metrics_reporter.join(timeout=5)
+            self.logger.info("HTTP connections: %s", connection_stats())
+            if log_stats():
+                self.logger.info("Log records dropped by sampling and rate limits: %s", log_stats())
+            self.logger.info("Pipeline metrics:\n%s", metrics.summary_table())
             self.logger.info("ScraperApp finished.")
+
+    @staticmethod
+    def _make_queue(maxsize: int, spill_dir: Optional[str]) -> Queue:
+        if maxsize and spill_dir:
+            return SpillQueue(maxsize, spill_dir)
+        return Queue(maxsize)
+
+    def _prepare_frontier(self) -> None:
+        """Clear the frontier for a fresh run or enqueue the pending product URLs of the previous one."""
+        if self.frontier is None:
+            return
+        # only the discovering node owns the shared work queue's lifecycle
+        if self.work_queue is not None:
+            if not self.discover:
+                return
+            # published before discovery, a discovery_done flag of the previous run no longer drains anyone
+            self.logger.info("Starting run %d of the shared work queue.", self.work_queue.start_run())
+        if not self.resume:
+            self.frontier.reset()
+            return
+        pending = self.frontier.resume()
+        for task in pending:
+            self.task_queue.put(task)
+        self.logger.info("Resuming crawl with %d pending product(s).", len(pending))
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from typing import Optional
+import aiohttp
+from .http_cache import ResponseCache
+from .http_client import (
+    CACHE_REVALIDATED, FETCH_ERRORS, FETCH_SECONDS, REQUESTS_TIMEOUT, REQUESTS_RETRIES, RETRY_STATUS_CODES, USER_AGENT,
+    RawPage, declared_encoding
+)
+from .logger import FETCH_FAILED, get_logger
+from .rate_controller import THROTTLE_STATUS_CODES, AdaptiveConcurrencyController
+
+
+class AsyncHttpClient:
+    """
+    asyncio counterpart of HttpClient.
+
+    Shares one aiohttp session between all coroutines and limits the number
+    of requests in flight with a semaphore. Must be opened inside the running
+    event loop (``async with client:``) before calling ``fetch``.
+    aiohttp negotiates br and zstd itself when their decoders are installed.
+    With an AdaptiveConcurrencyController (shared with the HttpClient of the producer),
+    requests also wait for a controller slot, and 429/503 are not backed off here since
+    the controller already pauses every request for their Retry-After.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 200,
+        timeout: float = REQUESTS_TIMEOUT,
+        retries: int = REQUESTS_RETRIES,
+        backoff_factor: float = 0.5,
+        cache: Optional[ResponseCache] = None,
+        controller: Optional[AdaptiveConcurrencyController] = None
+    ):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.cache = cache
+        self.controller = controller
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.logger = get_logger("AsyncHttpClient")
+
+    async def open(self) -> None:
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": USER_AGENT},
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def close(self) -> None:
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self) -> "AsyncHttpClient":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def fetch(self, url: str) -> Optional[str]:
+        """Return page text or None, prefer fetch_bytes for pages handed to lxml."""
+        page = await self.fetch_bytes(url)
+        return page.text() if page is not None else None
+
+    async def fetch_bytes(self, url: str) -> Optional[RawPage]:
+        """Return page body and declared charset or None, retrying on RETRY_STATUS_CODES with exponential backoff."""
+        with FETCH_SECONDS.time():
+            page = await self._fetch(url)
+        if page is None:
+            FETCH_ERRORS.inc()
+        return page
+
+    async def _fetch(self, url: str) -> Optional[RawPage]:
+        cached = self.cache.get(url) if self.cache else None
+        headers = self.cache.conditional_headers(cached) if self.cache else None
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            status = None
+            try:
+                async with self._semaphore:
+                    if self.controller:
+                        await self.controller.acquire_async()
+                    started = time.perf_counter()
+                    retry_after = None
+                    try:
+                        async with self.session.get(url, headers=headers) as resp:
+                            status, retry_after = resp.status, resp.headers.get("Retry-After")
+                            if resp.status == 304 and cached:
+                                CACHE_REVALIDATED.inc()
+                                self.cache.touch(url)
+                                return RawPage(cached.body, cached.encoding)
+                            if resp.status not in RETRY_STATUS_CODES or last_attempt:
+                                resp.raise_for_status()
+                                page = RawPage(await resp.read(), declared_encoding(resp.headers.get("Content-Type")))
+                                if self.cache:
+                                    self.cache.store(url, page.body, resp.headers, page.encoding)
+                                return page
+                    finally:
+                        if self.controller:
+                            self.controller.release(time.perf_counter() - started, status, retry_after)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if last_attempt:
+                    self.logger.warning("HTTP fetch failed for %s: %s", url, e, extra=FETCH_FAILED)
+                    return None
+            except Exception as e:
+                self.logger.warning("HTTP fetch failed for %s: %s", url, e, extra=FETCH_FAILED)
+                return None
+            if self.controller and status in THROTTLE_STATUS_CODES:
+                continue
+            # sleep outside the semaphore so the slot can be used by other requests
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+        return None
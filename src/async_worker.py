@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from queue import Full, Queue, Empty
+from typing import Optional, Tuple
+from .async_http_client import AsyncHttpClient
+from .fingerprints import FingerprintStore
+from .frontier import FAILED, IN_FLIGHT, CrawlFrontier
+from .parse_pool import ParsePool
+from .parser import ProductParser
+from .product import Product
+from .worker import ProductPageHandler
+from .logger import PRODUCT_PARSED, get_logger
+
+
+class AsyncProductWorker(ProductPageHandler, threading.Thread):
+    """
+    Single thread running an asyncio event loop that replaces a pool of ProductWorker threads.
+
+    Takes the same (url, category_hint) tasks from task_queue, keeps up to
+    `concurrency` product fetches in flight and pushes parsed Product objects
+    into write_queue, so the existing AWriter subclasses work unchanged.
+    """
+
+    def __init__(
+        self,
+        http_client: AsyncHttpClient,
+        parser: ProductParser,
+        task_queue: Queue,
+        write_queue: Queue,
+        concurrency: int = 200,
+        stop_event: threading.Event = None,
+        fingerprints: Optional[FingerprintStore] = None,
+        parse_pool: Optional[ParsePool] = None,
+        frontier: Optional[CrawlFrontier] = None
+    ):
+        super().__init__(name="AsyncProductWorker", daemon=True)
+        self.http_client = http_client
+        self.parser = parser
+        self.task_queue = task_queue
+        self.write_queue = write_queue
+        self.concurrency = concurrency
+        self.stop_event = stop_event or threading.Event()
+        self.fingerprints = fingerprints
+        self.parse_pool = parse_pool
+        self.frontier = frontier
+        self.logger = get_logger("AsyncProductWorker")
+
+    def run(self):
+        asyncio.run(self._main())
+
+    async def _main(self) -> None:
+        """Pump tasks from the thread-safe task_queue into `concurrency` consumer coroutines."""
+        pending: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        loop = asyncio.get_running_loop()
+        async with self.http_client:
+            consumers = [asyncio.create_task(self._consume(pending)) for _ in range(self.concurrency)]
+            while not (self.stop_event.is_set() and self.task_queue.empty()):
+                # blocking get runs in the default executor so the loop keeps serving fetches
+                task = await loop.run_in_executor(None, self._get_task)
+                if task is not None:
+                    await pending.put(task)
+            for _ in consumers:
+                await pending.put(None)
+            await asyncio.gather(*consumers)
+
+    def _get_task(self) -> Optional[Tuple[str, str]]:
+        try:
+            return self.task_queue.get(timeout=0.5)  # task is tuple (url, category_hint)
+        except Empty:
+            return None
+
+    async def _consume(self, pending: asyncio.Queue) -> None:
+        while True:
+            task = await pending.get()
+            if task is None:
+                return
+            try:
+                await self._process(task)
+            except Exception as e:
+                self.logger.exception("Error processing task %s: %s", task, e)
+                self._checkpoint(*task, FAILED)
+            finally:
+                self._task_done(task)
+
+    async def _process(self, task: Tuple[str, str]) -> None:
+        url, category_hint = task
+        self._checkpoint(url, category_hint, IN_FLIGHT)
+        page = await self.http_client.fetch_bytes(url)
+        current_page_hash = self._page_to_parse(url, category_hint, page)
+        if current_page_hash is None:
+            return
+        if self.parse_pool:
+            # a full pool must not stall the loop and every fetch in flight
+            await self.parse_pool.submit_async(page.body, url, category_hint, current_page_hash, page.encoding)
+            return
+        product = self._parse_product(url, category_hint, page, current_page_hash)
+        if product:
+            await self._put_product(product)
+            self.logger.info("Parsed product: %s", product.name, extra=PRODUCT_PARSED)
+
+    async def _put_product(self, product: Product) -> None:
+        """Hand product to the writer, a full write_queue is waited on in the default executor, not on the loop."""
+        try:
+            self.write_queue.put_nowait(product)
+        except Full:
+            await asyncio.get_running_loop().run_in_executor(None, self.write_queue.put, product)
@@ -1,15 +1,29 @@
 import os
 from pathlib import Path
+from typing import List
 
 
 from .awriter import AWriter
+from .fanout import WriteFanOut
+from .file_writers import CsvWriter, FileWriter, NdjsonWriter, ParquetWriter, file_writer_from_dsn, is_file_dsn
+from .flush_policy import AdaptiveFlushPolicy, FixedFlushPolicy, FlushPolicy
 from .postgre_writer import PostgresWriter
 from .sqlite_writer import SqliteWriter
 
 __all__ = [
     "AWriter",
+    "AdaptiveFlushPolicy",
+    "CsvWriter",
+    "FileWriter",
+    "FixedFlushPolicy",
+    "FlushPolicy",
+    "NdjsonWriter",
+    "ParquetWriter",
     "PostgresWriter",
     "SqliteWriter",
+    "WriteFanOut",
+    "file_writer_from_dsn",
+    "is_file_dsn",
 ]
 
 
@@ -17,10 +31,59 @@ def get_writer_batch():
     return int(os.environ.get("DB_WRITER_BATCH", "20"))
 
 
+def get_flush_policy() -> FlushPolicy:
+    """
+    Return writer flush policy from env:
+    - WRITER_FLUSH_POLICY=adaptive (default): batch size follows WRITER_TARGET_LATENCY per commit
+    - WRITER_FLUSH_POLICY=fixed: always DB_WRITER_BATCH
+    Both flush a partial batch after WRITER_MAX_LINGER seconds.
+    """
+    max_linger = float(os.environ.get("WRITER_MAX_LINGER", "1.0"))
+    if os.environ.get("WRITER_FLUSH_POLICY", "adaptive") == "fixed":
+        return FixedFlushPolicy(get_writer_batch(), max_linger=max_linger)
+    return AdaptiveFlushPolicy(
+        initial_batch=get_writer_batch(),
+        target_latency=float(os.environ.get("WRITER_TARGET_LATENCY", "0.5")),
+        max_linger=max_linger,
+        max_batch=int(os.environ.get("WRITER_MAX_BATCH", "10000")),
+    )
+
+
+def get_postgres_bulk() -> bool:
+    """Stream batches with COPY and merge them in large chunks instead of per-batch upserts."""
+    return os.environ.get("POSTGRES_BULK", "0") == "1"
+
+
+def get_postgres_bulk_chunk() -> int:
+    return int(os.environ.get("POSTGRES_BULK_CHUNK", "10000"))
+
+
+def get_sqlite_bulk() -> bool:
+    """Tune SQLite for loading (WAL, relaxed sync, big cache) and group batches into large transactions."""
+    return os.environ.get("SQLITE_BULK", "0") == "1"
+
+
+def get_sqlite_commit_rows() -> int:
+    return int(os.environ.get("SQLITE_COMMIT_ROWS", "50000"))
+
+
+def get_sqlite_defer_index() -> bool:
+    """In bulk mode, stage rows without index and upsert them into vendr_products at the end of the run."""
+    return os.environ.get("SQLITE_DEFER_INDEX", "0") == "1"
+
+
+def get_export_dsns() -> List[str]:
+    """
+    Return comma separated EXPORT_DSNS, extra writers fed with the same products as DB_DSN,
+    e.g. "parquet:///var/exports,ndjson:///var/exports?compression=gzip".
+    """
+    return [dsn.strip() for dsn in os.environ.get("EXPORT_DSNS", "").split(",") if dsn.strip()]
+
+
 def get_db_dsn(use_env=True) -> str:
     """
     return DSN:
-    - If env have DSN return it.
+    - If env have DSN return it, a ndjson://, csv:// or parquet:// DSN selects a file writer.
     - Else create sql lite database.
     """
     dsn = None
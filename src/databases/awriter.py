@@ -1,9 +1,19 @@
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
 import threading
+import time
 from queue import Empty, Queue
 from abc import ABC, abstractmethod
+from src.databases.flush_policy import FixedFlushPolicy, FlushPolicy
+from src.fingerprints import FingerprintStore
+from src.frontier import CrawlFrontier
 from src.logger import get_logger
+from src.metrics import metrics
 from src.product import Product
+from src.product_batch import ProductBatch
+
+
+WRITE_SECONDS = metrics.histogram("writer_write_seconds", "Duration of AWriter._write per batch")
+ROWS_WRITTEN = metrics.counter("writer_rows_total", "Rows passed to AWriter._write")
 
 
 class AWriter(ABC, threading.Thread):
@@ -16,73 +26,152 @@ class AWriter(ABC, threading.Thread):
 
     Provides:
     - Standardized interface for writing data from a queue
-    - Optional buffering or batching mechanisms
+    - Buffering into a columnar ProductBatch, deduplicated on (name, category),
+      with a pluggable FlushPolicy deciding batch size and max linger time
     - Error handling and logging support
+    - Skipping products whose content fingerprint did not change (when a FingerprintStore is given)
+    - Marking product pages done in a CrawlFrontier once their rows are durable (when one is given),
+      writers that keep rows uncommitted across batches call _mark_written() after committing them
     """
 
     def __init__(
         self, write_queue: Queue,
         batch_size: int = 20,
         stop_event: threading.Event = None,
-        name: str = "Writer"
+        name: str = "Writer",
+        fingerprints: Optional[FingerprintStore] = None,
+        flush_policy: Optional[FlushPolicy] = None,
+        frontier: Optional[CrawlFrontier] = None
     ):
         super().__init__(name=name, daemon=True)
         self.queue = write_queue
         self.batch_size = batch_size
+        self.flush_policy = flush_policy or FixedFlushPolicy(batch_size)
         self.stop_event = stop_event or threading.Event()
-        self._buffer: List[Product] = []
+        self._buffer = ProductBatch()
+        self._buffer_started = 0.0
+        self._unacked = 0
+        self.fingerprints = fingerprints
+        self.frontier = frontier
+        # URLs of flushed batches whose rows are not committed yet
+        self._unmarked_urls: List[str] = []
         self.logger = get_logger(name)
 
+    def load_fingerprints(self) -> None:
+        """Load fingerprints of already stored products into the FingerprintStore, call before start()."""
+        if self.fingerprints is None:
+            return
+        self.fingerprints.load(self._read_fingerprints())
+        self.logger.info("Loaded %d product fingerprints.", len(self.fingerprints))
+
+    def read_product_categories(self) -> Dict[str, str]:
+        """Return {url: category} of stored products, lets sitemap discovery categorize product URLs."""
+        return {url: category for _, category, url, _, _ in self._read_fingerprints() if url}
+
     def run(self):
-        """Main writer loop. Check queue for new products and add to _buffer
-        when _buffer size more or eq batch_size size call _flush for write"""
+        """Main writer loop. Wait for products up to the policy's max linger time, drain everything
+        already queued with get_nowait and flush when the policy's batch size or max linger is reached.
+        Products are acknowledged with task_done only after they were flushed."""
         self.logger.info(f"{self.name} starting.")
         try:
             while not (self.stop_event.is_set() and self.queue.empty()):
                 try:
-                    item: Product = self.queue.get(timeout=0.5)
-                    self._buffer.append(item)
-                    if len(self._buffer) >= self.batch_size:
-                        self._flush()
-                    self.queue.task_done()
-                except Empty:
-                    if self._buffer:
-                        self._flush()
+                    self._fill_buffer()
+                    if self._should_flush():
+                        self._flush_and_ack()
                 except Exception as e:
                     self.logger.exception("Unexpected error in writer loop: %s", e)
 
             # final flush
-            if self._buffer:
-                self._flush()
+            self._flush_and_ack()
         finally:
             self.logger.info(f"{self.name} stopped.")
 
+    def _fill_buffer(self) -> None:
+        timeout = 0.5
+        if self._buffer:
+            timeout = max(0.0, self._buffer_started + self.flush_policy.max_linger - time.monotonic())
+        try:
+            self._append(self.queue.get(timeout=timeout))
+            while len(self._buffer) < self.flush_policy.batch_size():
+                self._append(self.queue.get_nowait())
+        except Empty:
+            pass
+
+    def _append(self, item: Product) -> None:
+        if not self._buffer:
+            self._buffer_started = time.monotonic()
+        self._buffer.append(item)
+        self._unacked += 1
+
+    def _should_flush(self) -> bool:
+        if not self._buffer:
+            return False
+        return (
+            len(self._buffer) >= self.flush_policy.batch_size()
+            or time.monotonic() - self._buffer_started >= self.flush_policy.max_linger
+        )
+
+    def _flush_and_ack(self) -> None:
+        try:
+            self._flush()
+        finally:
+            for _ in range(self._unacked):
+                self.queue.task_done()
+            self._unacked = 0
+
     def _flush(self):
         if not self._buffer:
             return
 
-        # delete duplicate by key
-        seen = set()
-        unique_rows = []
-        for p in self._buffer:
-            key = self._get_unique_key(p)
-            if key not in seen:
-                seen.add(key)
-                unique_rows.append(p)
+        # the buffer is already deduplicated on (name, category)
+        batch = self._buffer
+        if self.fingerprints is not None:
+            batch, rehashed = self.fingerprints.filter_changed(batch)
+            if rehashed:
+                self._update_page_hashes(rehashed)
+        if batch:
+            started = time.perf_counter()
+            self._write(batch)
+            seconds = time.perf_counter() - started
+            WRITE_SECONDS.observe(seconds)
+            ROWS_WRITTEN.inc(len(batch))
+            self.flush_policy.record(len(batch), seconds)
+        if self.frontier:
+            self._unmarked_urls.extend(url for url in self._buffer.urls if url)
+            if not self._defers_commit():
+                self._mark_written()
+        self._buffer = ProductBatch()
+
+    def _defers_commit(self) -> bool:
+        """True when _write may leave rows uncommitted, the writer then calls _mark_written() once they are durable."""
+        return False
 
-        self._write(unique_rows)
-        self._buffer.clear()
+    def _mark_written(self) -> None:
+        """Mark the product pages of every batch flushed so far done in the frontier."""
+        if self.frontier and self._unmarked_urls:
+            self.frontier.mark_written(self._unmarked_urls)
+        self._unmarked_urls = []
 
     @abstractmethod
-    def _write(self, items: List[Product]):
+    def _write(self, batch: ProductBatch):
         """
         This method writes data to your database using the appropriate library.
+        batch.rows() yields rows in Product.as_tuple() order.
+        """
+        pass
+
+    def _update_page_hashes(self, rows: List[Tuple[str, str, str]]) -> None:
+        """
+        Store the new page hash of unchanged products from (page_hash, name, category) rows,
+        so their pages are not parsed again next run. Writers without page hashes ignore them.
         """
         pass
 
     @abstractmethod
-    def _get_unique_key(self, item: Product):
+    def _read_fingerprints(self) -> Iterable[Tuple]:
         """
-        Return unique key for filter duplicate in buffer
+        Return (name, category, url, page_hash, fingerprint) rows of stored products.
+        Called from the main thread before the writer thread starts.
         """
         pass
@@ -0,0 +1,37 @@
+import threading
+from queue import Empty, Queue
+from typing import List
+from src.logger import get_logger
+
+
+class WriteFanOut(threading.Thread):
+    """
+    Copies every product from the pipeline's write_queue into the queue of each writer,
+    so a database writer and file writers consume one fetch/parse pipeline.
+
+    Products are shared, not copied: writers only read them.
+    """
+
+    def __init__(self, write_queue: Queue, writer_queues: List[Queue], stop_event: threading.Event = None):
+        super().__init__(name="WriteFanOut", daemon=True)
+        self.write_queue = write_queue
+        self.writer_queues = writer_queues
+        self.stop_event = stop_event or threading.Event()
+        self.logger = get_logger("WriteFanOut")
+
+    def run(self):
+        while not (self.stop_event.is_set() and self.write_queue.empty()):
+            try:
+                item = self.write_queue.get(timeout=0.5)
+            except Empty:
+                continue
+            try:
+                for queue in self.writer_queues:
+                    queue.put(item)
+            finally:
+                self.write_queue.task_done()
+
+    def join_queues(self) -> None:
+        """Wait until every writer acknowledged every product, call after write_queue.join()."""
+        for queue in self.writer_queues:
+            queue.join()
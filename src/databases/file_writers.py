@@ -0,0 +1,255 @@
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+import bz2
+import csv
+import gzip
+import json
+import lzma
+import os
+import threading
+import time
+from abc import abstractmethod
+from pathlib import Path
+from queue import Queue
+from urllib.parse import parse_qs, urlparse
+from src.databases.awriter import AWriter
+from src.databases.flush_policy import FlushPolicy
+from src.fingerprints import FingerprintStore
+from src.frontier import CrawlFrontier
+from src.product_batch import ProductBatch
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:  # only ParquetWriter needs pyarrow
+    pyarrow = None
+
+
+# compression of text files: name -> (open function, file suffix)
+TEXT_COMPRESSION: Dict[Optional[str], Tuple[Callable[..., Any], str]] = {
+    None: (open, ""),
+    "gzip": (gzip.open, ".gz"),
+    "bz2": (bz2.open, ".bz2"),
+    "xz": (lzma.open, ".xz"),
+}
+
+PARQUET_COMPRESSION = ("snappy", "gzip", "brotli", "zstd", "lz4", "none")
+
+
+class FileWriter(AWriter):
+    """
+    Writer thread streaming batches into rotating files in a directory.
+
+    Files are named <prefix>-<run start>-<part>.<extension>[.<compression suffix>],
+    a part is closed once a batch brings it to rotate_rows rows. Parts are written under
+    a ".part" name and renamed when closed, so readers never see half-written files.
+    File writers have no stored fingerprints, with incremental on they receive every
+    product parsed in this run. Product pages are marked written once their part is closed.
+    """
+
+    extension = ""
+
+    def __init__(
+        self, directory: str,
+        write_queue: Queue,
+        batch_size: int = 20,
+        stop_event: threading.Event = None,
+        fingerprints: Optional[FingerprintStore] = None,
+        flush_policy: Optional[FlushPolicy] = None,
+        frontier: Optional[CrawlFrontier] = None,
+        compression: Optional[str] = None,
+        rotate_rows: int = 100000,
+        prefix: str = "vendr_products",
+        name: str = "FileWriter"
+    ):
+        super().__init__(
+            write_queue, batch_size, stop_event, name=name,
+            fingerprints=fingerprints, flush_policy=flush_policy, frontier=frontier
+        )
+        self.directory = Path(directory)
+        self.compression = compression
+        self.rotate_rows = rotate_rows
+        self.prefix = prefix
+        self._run_started = time.strftime("%Y%m%dT%H%M%S")
+        self._part = 0
+        self._path: Optional[Path] = None
+        self._file_rows = 0
+
+    def run(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        try:
+            super().run()
+        finally:
+            self._rotate()
+
+    def _write(self, batch: ProductBatch):
+        if self._path is None:
+            self._part += 1
+            self._path = self.directory / (
+                f"{self.prefix}-{self._run_started}-{self._part:04d}{self.extension}{self._suffix()}"
+            )
+            self._open(self._partial_path())
+            self._file_rows = 0
+        self._write_batch(batch)
+        self._file_rows += len(batch)
+        self.logger.info("Wrote %d products to %s.", len(batch), self._path.name)
+        if self._file_rows >= self.rotate_rows:
+            self._rotate()
+
+    def _defers_commit(self) -> bool:
+        return True
+
+    def _rotate(self) -> None:
+        """Close the current part and give it its final name."""
+        if self._path is not None:
+            self._close()
+            os.replace(self._partial_path(), self._path)
+            self.logger.info("Closed %s with %d products.", self._path.name, self._file_rows)
+            self._path = None
+        self._mark_written()
+
+    def _partial_path(self) -> Path:
+        return self._path.with_name(self._path.name + ".part")
+
+    def _suffix(self) -> str:
+        return ""
+
+    def _read_fingerprints(self) -> Iterable[Tuple]:
+        return []
+
+    @abstractmethod
+    def _open(self, path: Path) -> None:
+        pass
+
+    @abstractmethod
+    def _write_batch(self, batch: ProductBatch) -> None:
+        pass
+
+    @abstractmethod
+    def _close(self) -> None:
+        pass
+
+
+class TextFileWriter(FileWriter):
+    """FileWriter for line based formats, compressed with gzip, bz2 or xz when compression is set."""
+
+    def __init__(self, directory: str, write_queue: Queue, *args, **kwargs):
+        super().__init__(directory, write_queue, *args, **kwargs)
+        if self.compression not in TEXT_COMPRESSION:
+            raise ValueError(f"Unknown compression: {self.compression}")
+        self._file = None
+
+    def _suffix(self) -> str:
+        return TEXT_COMPRESSION[self.compression][1]
+
+    def _open(self, path: Path) -> None:
+        open_function = TEXT_COMPRESSION[self.compression][0]
+        self._file = open_function(path, "wt", encoding="utf-8", newline="")
+
+    def _close(self) -> None:
+        self._file.close()
+        self._file = None
+
+
+class NdjsonWriter(TextFileWriter):
+    """One JSON object per product and line."""
+
+    extension = ".ndjson"
+
+    def __init__(self, directory: str, write_queue: Queue, *args, **kwargs):
+        kwargs.setdefault("name", "NdjsonWriter")
+        super().__init__(directory, write_queue, *args, **kwargs)
+
+    def _write_batch(self, batch: ProductBatch) -> None:
+        self._file.writelines(
+            json.dumps(dict(zip(ProductBatch.FIELDS, row)), ensure_ascii=False) + "\n"
+            for row in batch.rows()
+        )
+
+
+class CsvWriter(TextFileWriter):
+    """CSV with a header row in every part."""
+
+    extension = ".csv"
+
+    def __init__(self, directory: str, write_queue: Queue, *args, **kwargs):
+        kwargs.setdefault("name", "CsvWriter")
+        super().__init__(directory, write_queue, *args, **kwargs)
+        self._csv = None
+
+    def _open(self, path: Path) -> None:
+        super()._open(path)
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(ProductBatch.FIELDS)
+
+    def _write_batch(self, batch: ProductBatch) -> None:
+        self._csv.writerows(batch.rows())
+
+
+class ParquetWriter(FileWriter):
+    """
+    Parquet file per part, every batch becomes a row group built straight from the batch columns.
+    compression is the Parquet codec (snappy by default), requires pyarrow.
+    """
+
+    extension = ".parquet"
+
+    def __init__(self, directory: str, write_queue: Queue, *args, **kwargs):
+        kwargs.setdefault("name", "ParquetWriter")
+        super().__init__(directory, write_queue, *args, **kwargs)
+        if pyarrow is None:
+            raise RuntimeError("ParquetWriter requires pyarrow: pip install pyarrow")
+        self.compression = self.compression or "snappy"
+        if self.compression not in PARQUET_COMPRESSION:
+            raise ValueError(f"Unknown parquet compression: {self.compression}")
+        self._schema = pyarrow.schema([
+            ("name", pyarrow.string()),
+            ("description", pyarrow.string()),
+            ("category", pyarrow.string()),
+            ("min_price", pyarrow.int64()),
+            ("max_price", pyarrow.int64()),
+            ("median_price", pyarrow.int64()),
+            ("url", pyarrow.string()),
+            ("page_hash", pyarrow.string()),
+            ("fingerprint", pyarrow.string()),
+        ])
+        self._parquet = None
+
+    def _open(self, path: Path) -> None:
+        self._parquet = parquet.ParquetWriter(str(path), self._schema, compression=self.compression)
+
+    def _write_batch(self, batch: ProductBatch) -> None:
+        self._parquet.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(batch.columns(), self._schema)],
+            schema=self._schema
+        ))
+
+    def _close(self) -> None:
+        self._parquet.close()
+        self._parquet = None
+
+
+FILE_WRITERS = {
+    "ndjson": NdjsonWriter,
+    "csv": CsvWriter,
+    "parquet": ParquetWriter,
+}
+
+
+def is_file_dsn(dsn: str) -> bool:
+    return urlparse(dsn).scheme in FILE_WRITERS
+
+
+def file_writer_from_dsn(dsn: str, write_queue: Queue, batch_size: int = 20, **kwargs) -> FileWriter:
+    """
+    Create the file writer for a DSN like ndjson:///var/exports?compression=gzip&rotate_rows=50000,
+    the scheme selects the format and the path is the output directory.
+    """
+    parsed = urlparse(dsn)
+    options = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+    if "compression" in options:
+        kwargs["compression"] = options["compression"]
+    if "rotate_rows" in options:
+        kwargs["rotate_rows"] = int(options["rotate_rows"])
+    if "prefix" in options:
+        kwargs["prefix"] = options["prefix"]
+    return FILE_WRITERS[parsed.scheme](parsed.netloc + parsed.path, write_queue, batch_size, **kwargs)
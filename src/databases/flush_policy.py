@@ -0,0 +1,78 @@
+from abc import ABC, abstractmethod
+
+
+class FlushPolicy(ABC):
+    """
+    Strategy deciding when AWriter commits its buffer.
+
+    The writer flushes when the buffer holds batch_size() products or when the
+    oldest buffered product waited max_linger seconds, and reports every
+    commit back through record().
+    """
+
+    def __init__(self, max_linger: float = 1.0):
+        self.max_linger = max_linger
+
+    @abstractmethod
+    def batch_size(self) -> int:
+        """Number of buffered products that triggers a flush."""
+        pass
+
+    def record(self, rows: int, seconds: float) -> None:
+        """Called after every commit with its size and duration."""
+        pass
+
+
+class FixedFlushPolicy(FlushPolicy):
+    """Always flush at the same batch size."""
+
+    def __init__(self, batch_size: int = 20, max_linger: float = 1.0):
+        super().__init__(max_linger)
+        self._batch_size = batch_size
+
+    def batch_size(self) -> int:
+        return self._batch_size
+
+
+class AdaptiveFlushPolicy(FlushPolicy):
+    """
+    Sizes batches so a commit takes about target_latency seconds.
+
+    Keeps an exponentially weighted estimate of rows written per second and
+    sets the batch size to target_latency * rows_per_sec, growing at most
+    max_growth times per commit and clamped to [min_batch, max_batch].
+    """
+
+    def __init__(
+        self,
+        initial_batch: int = 20,
+        target_latency: float = 0.5,
+        max_linger: float = 1.0,
+        min_batch: int = 1,
+        max_batch: int = 10000,
+        max_growth: float = 2.0,
+        smoothing: float = 0.3
+    ):
+        super().__init__(max_linger)
+        self.target_latency = target_latency
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.max_growth = max_growth
+        self.smoothing = smoothing
+        self._batch_size = initial_batch
+        self._rows_per_sec = None
+
+    def batch_size(self) -> int:
+        return self._batch_size
+
+    def record(self, rows: int, seconds: float) -> None:
+        if rows <= 0 or seconds <= 0:
+            return
+        rate = rows / seconds
+        if self._rows_per_sec is None:
+            self._rows_per_sec = rate
+        else:
+            self._rows_per_sec += self.smoothing * (rate - self._rows_per_sec)
+        wanted = int(self.target_latency * self._rows_per_sec)
+        wanted = min(wanted, int(self._batch_size * self.max_growth))
+        self._batch_size = max(self.min_batch, min(self.max_batch, wanted))
@@ -1,60 +1,164 @@
 
-from typing import List
+from typing import Iterable, List, Optional, Tuple
+import io
 import threading
 from queue import Queue
 import psycopg2
-from psycopg2.extras import execute_values
-from src.product import Product
+from psycopg2.extras import execute_batch, execute_values
+from src.databases.flush_policy import FlushPolicy
+from src.fingerprints import FingerprintStore
+from src.frontier import CrawlFrontier
+from src.product_batch import ProductBatch
 from src.databases.awriter import AWriter
 
 
+# columns in Product.as_tuple() order
+PRODUCT_COLUMNS = "name, description, category, min_price, max_price, median_price, url, page_hash, fingerprint"
+
+UPSERT_SET = """
+    ON CONFLICT (name, category) DO UPDATE SET
+        description = EXCLUDED.description,
+        min_price = EXCLUDED.min_price,
+        max_price = EXCLUDED.max_price,
+        median_price = EXCLUDED.median_price,
+        url = EXCLUDED.url,
+        page_hash = EXCLUDED.page_hash,
+        fingerprint = EXCLUDED.fingerprint,
+        scraped_at = now()
+    WHERE (vendr_products.fingerprint, vendr_products.url, vendr_products.page_hash)
+        IS DISTINCT FROM (EXCLUDED.fingerprint, EXCLUDED.url, EXCLUDED.page_hash)
+"""
+
+# a row for every new product and every change of its prices, written by triggers on vendr_products
+HISTORY_TABLE = "vendr_price_history"
+
+STAGING_TABLE = "vendr_products_staging"
+
+
 class PostgresWriter(AWriter):
     """
     Dedicated DB writer thread which consumes Product items from a queue and writes them to Postgres.
     Uses batched insert for efficiency.
+
+    Rows whose fingerprint, url and page_hash are unchanged are skipped by the
+    upsert, so they leave no dead tuples and scraped_at is the time of the last
+    change. Price changes are appended to HISTORY_TABLE.
+
+    In bulk mode batches are streamed with COPY into a staging table and merged
+    into vendr_products with a single upsert every bulk_chunk_size rows and at
+    the end of the run. The staging table is a temporary table of the writer's
+    connection, so writers of several nodes never merge or truncate each other's rows.
     """
 
     def __init__(
         self, dsn: str,
         write_queue: Queue,
         batch_size: int = 20,
-        stop_event: threading.Event = None
+        stop_event: threading.Event = None,
+        fingerprints: Optional[FingerprintStore] = None,
+        flush_policy: Optional[FlushPolicy] = None,
+        frontier: Optional[CrawlFrontier] = None,
+        bulk: bool = False,
+        bulk_chunk_size: int = 10000
     ):
-        super().__init__(write_queue, batch_size, stop_event, name="PostgresWriter")
+        super().__init__(
+            write_queue, batch_size, stop_event, name="PostgresWriter",
+            fingerprints=fingerprints, flush_policy=flush_policy, frontier=frontier
+        )
         self.dsn = dsn
+        self.bulk = bulk
+        self.bulk_chunk_size = bulk_chunk_size
+        self._staged_rows = 0
         self._conn = None
 
     def run(self):
         # connect to database and run loop
         self._conn = psycopg2.connect(self.dsn)
         self._ensure_table()
+        if self.bulk:
+            self._ensure_staging_table()
         super().run()
+        if self.bulk:
+            self._merge_staging()
         if self._conn:
             self._conn.close()
 
-    def _write(self, items: List[Product]):
-        rows = [p.as_tuple() for p in items]
+    def _write(self, batch: ProductBatch):
+        if self.bulk:
+            self._copy_to_staging(batch)
+            return
         with self._conn.cursor() as cur:
-            query = """
-            INSERT INTO vendr_products (name, description, category, min_price, max_price, median_price)
-            VALUES %s
-            ON CONFLICT (name, category) DO UPDATE SET
-                description = EXCLUDED.description,
-                min_price = EXCLUDED.min_price,
-                max_price = EXCLUDED.max_price,
-                median_price = EXCLUDED.median_price,
-                scraped_at = now()
-            ;
-            """
-            execute_values(cur, query, rows)
+            query = f"INSERT INTO vendr_products ({PRODUCT_COLUMNS}) VALUES %s {UPSERT_SET};"
+            execute_values(cur, query, batch.rows(), page_size=len(batch))
             self._conn.commit()
-        self.logger.info("Wrote %d products to DB.", len(rows))
+        self.logger.info("Wrote %d products to DB.", len(batch))
 
-    def _get_unique_key(self, item: Product):
-        return (item.name, item.category)
+    def _update_page_hashes(self, rows: List[Tuple[str, str, str]]) -> None:
+        with self._conn.cursor() as cur:
+            execute_batch(cur, "UPDATE vendr_products SET page_hash = %s WHERE name = %s AND category = %s", rows)
+        self._conn.commit()
+
+    def _defers_commit(self) -> bool:
+        return self.bulk
+
+    def _copy_to_staging(self, batch: ProductBatch):
+        """Stream rows into the staging table, merge once bulk_chunk_size rows are staged."""
+        buffer = io.StringIO()
+        for row in batch.rows():
+            buffer.write("\t".join(_copy_value(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        with self._conn.cursor() as cur:
+            cur.copy_expert(f"COPY {STAGING_TABLE} ({PRODUCT_COLUMNS}) FROM STDIN", buffer)
+        self._conn.commit()
+        self._staged_rows += len(batch)
+        self.logger.debug("Staged %d products.", len(batch))
+        if self._staged_rows >= self.bulk_chunk_size:
+            self._merge_staging()
+
+    def _merge_staging(self):
+        """Upsert staged rows into vendr_products in one statement, the latest staged row wins."""
+        if not self._staged_rows:
+            self._mark_written()
+            return
+        with self._conn.cursor() as cur:
+            cur.execute(
+                f"""
+                INSERT INTO vendr_products ({PRODUCT_COLUMNS})
+                SELECT DISTINCT ON (name, category) {PRODUCT_COLUMNS}
+                FROM {STAGING_TABLE}
+                ORDER BY name, category, staged_id DESC
+                {UPSERT_SET};
+                TRUNCATE {STAGING_TABLE};
+                """
+            )
+        self._conn.commit()
+        self.logger.info("Wrote %d products to DB.", self._staged_rows)
+        self._staged_rows = 0
+        self._mark_written()
+
+    def _read_fingerprints(self) -> Iterable[Tuple]:
+        conn = psycopg2.connect(self.dsn)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT count(*) FROM information_schema.columns
+                    WHERE table_name = 'vendr_products' AND column_name = 'fingerprint'
+                    """
+                )
+                # no table yet, or it was created before fingerprints were introduced
+                if not cur.fetchone()[0]:
+                    return []
+                cur.execute("SELECT name, category, url, page_hash, fingerprint FROM vendr_products")
+                return cur.fetchall()
+        finally:
+            conn.close()
 
     def _ensure_table(self):
         with self._conn.cursor() as cur:
+            # writers of several scraper nodes may race on CREATE TABLE IF NOT EXISTS
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('vendr_products'))")
             cur.execute(
                 """
                 CREATE TABLE IF NOT EXISTS vendr_products (
@@ -65,10 +169,102 @@ class PostgresWriter(AWriter):
                     min_price INTEGER,
                     max_price INTEGER,
                     median_price INTEGER,
+                    url TEXT,
+                    page_hash TEXT,
+                    fingerprint TEXT,
                     scraped_at TIMESTAMP DEFAULT now(),
                     CONSTRAINT unique_product UNIQUE (name, category)
                 );
                 """
             )
+            # tables created before fingerprints were introduced
+            cur.execute(
+                """
+                ALTER TABLE vendr_products
+                    ADD COLUMN IF NOT EXISTS url TEXT,
+                    ADD COLUMN IF NOT EXISTS page_hash TEXT,
+                    ADD COLUMN IF NOT EXISTS fingerprint TEXT;
+                """
+            )
+            self._ensure_history_table(cur)
+            self._conn.commit()
+        self.logger.debug("Ensured vendr_products and %s tables exist.", HISTORY_TABLE)
+
+    def _ensure_history_table(self, cur):
+        """Create the history table and its triggers, inside the locked transaction of _ensure_table."""
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (HISTORY_TABLE,))
+        history_exists = cur.fetchone()[0]
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {HISTORY_TABLE} (
+                id BIGSERIAL PRIMARY KEY,
+                product_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                category TEXT,
+                min_price INTEGER,
+                max_price INTEGER,
+                median_price INTEGER,
+                recorded_at TIMESTAMP DEFAULT now()
+            );
+            CREATE INDEX IF NOT EXISTS {HISTORY_TABLE}_product ON {HISTORY_TABLE} (product_id, recorded_at);
+            CREATE OR REPLACE FUNCTION {HISTORY_TABLE}_record() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO {HISTORY_TABLE} (product_id, name, category, min_price, max_price, median_price)
+                VALUES (NEW.id, NEW.name, NEW.category, NEW.min_price, NEW.max_price, NEW.median_price);
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+            DROP TRIGGER IF EXISTS {HISTORY_TABLE}_insert ON vendr_products;
+            CREATE TRIGGER {HISTORY_TABLE}_insert AFTER INSERT ON vendr_products
+                FOR EACH ROW EXECUTE FUNCTION {HISTORY_TABLE}_record();
+            DROP TRIGGER IF EXISTS {HISTORY_TABLE}_update ON vendr_products;
+            CREATE TRIGGER {HISTORY_TABLE}_update AFTER UPDATE OF min_price, max_price, median_price ON vendr_products
+                FOR EACH ROW
+                WHEN ((OLD.min_price, OLD.max_price, OLD.median_price)
+                    IS DISTINCT FROM (NEW.min_price, NEW.max_price, NEW.median_price))
+                EXECUTE FUNCTION {HISTORY_TABLE}_record();
+            """
+        )
+        # products stored before the history existed start with their current prices
+        if not history_exists:
+            cur.execute(
+                f"""
+                INSERT INTO {HISTORY_TABLE} (product_id, name, category, min_price, max_price, median_price)
+                SELECT id, name, category, min_price, max_price, median_price FROM vendr_products
+                """
+            )
+
+    def _ensure_staging_table(self):
+        with self._conn.cursor() as cur:
+            cur.execute(
+                f"""
+                CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+                    staged_id BIGSERIAL,
+                    name TEXT NOT NULL,
+                    description TEXT,
+                    category TEXT,
+                    min_price INTEGER,
+                    max_price INTEGER,
+                    median_price INTEGER,
+                    url TEXT,
+                    page_hash TEXT,
+                    fingerprint TEXT
+                );
+                TRUNCATE {STAGING_TABLE};
+                """
+            )
             self._conn.commit()
-        self.logger.debug("Ensured vendr_products table exists.")
+        self.logger.debug("Ensured temporary %s table exists.", STAGING_TABLE)
+
+
+def _copy_value(value) -> str:
+    """Format a value for COPY text format."""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
@@ -0,0 +1,263 @@
+"""
+Indexed queries over vendr_products.
+
+Create the indexes once, they are maintained by the database afterwards
+(FTS5 triggers in SQLite, a generated tsvector column in Postgres):
+    python -m src.databases.query index
+
+Products in a category with median price in a range matching a text:
+    python -m src.databases.query search --category "DevOps - Monitoring" --min-price 10000 --max-price 50000 \
+        --text "log monitoring"
+
+DB_DSN selects the database like in ScraperApp. Results are printed as JSON lines.
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+import psycopg2
+from src.logger import get_logger
+
+
+RESULT_COLUMNS = ("name", "category", "min_price", "max_price", "median_price", "url")
+
+FTS_TABLE = "vendr_products_fts"
+
+# B-tree indexes shared by both databases: name -> columns
+PRICE_INDEXES = {
+    "vendr_products_category_median": "category, median_price",
+    "vendr_products_median_price": "median_price",
+    "vendr_products_min_price": "min_price",
+    "vendr_products_max_price": "max_price",
+}
+
+
+class ProductSearch(ABC):
+    """
+    Filters products by category, median price range and full text of name and description.
+    Subclasses create the indexes and build the database specific query.
+    """
+
+    placeholder = "?"
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.logger = get_logger("ProductSearch")
+
+    @abstractmethod
+    def ensure_indexes(self) -> None:
+        """Create missing B-tree and full-text indexes on vendr_products."""
+        pass
+
+    def search(
+        self,
+        category: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        text: Optional[str] = None,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """Return products matching every given filter, best text matches first, otherwise by median price."""
+        conditions, params = self._price_conditions(category, min_price, max_price)
+        query, params = self._build_query(conditions, params, text, limit)
+        return [dict(zip(RESULT_COLUMNS, row)) for row in self._fetch(query, params)]
+
+    def _price_conditions(
+        self, category: Optional[str], min_price: Optional[int], max_price: Optional[int]
+    ) -> Tuple[List[str], List[Any]]:
+        conditions, params = [], []
+        if category is not None:
+            conditions.append(f"p.category = {self.placeholder}")
+            params.append(category)
+        if min_price is not None:
+            conditions.append(f"p.median_price >= {self.placeholder}")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append(f"p.median_price <= {self.placeholder}")
+            params.append(max_price)
+        return conditions, params
+
+    @abstractmethod
+    def _build_query(
+        self, conditions: List[str], params: List[Any], text: Optional[str], limit: int
+    ) -> Tuple[str, List[Any]]:
+        pass
+
+    @abstractmethod
+    def _fetch(self, query: str, params: List[Any]) -> List[Tuple]:
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+
+class SqliteProductSearch(ProductSearch):
+    """ProductSearch over SQLite, full text through an external content FTS5 table kept in sync by triggers."""
+
+    def __init__(self, dsn: str):
+        super().__init__(dsn)
+        self._conn = sqlite3.connect(dsn)
+
+    def ensure_indexes(self) -> None:
+        with self._conn:
+            for name, columns in PRICE_INDEXES.items():
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON vendr_products ({columns})")
+            fts_exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+            ).fetchone()
+            self._conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+                USING fts5(name, description, content='vendr_products', content_rowid='id')
+            """)
+            self._conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON vendr_products BEGIN
+                    INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (new.id, new.name, new.description);
+                END
+            """)
+            self._conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON vendr_products BEGIN
+                    INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, description)
+                    VALUES ('delete', old.id, old.name, old.description);
+                END
+            """)
+            # only reindex when an indexed column is assigned
+            self._conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF name, description ON vendr_products
+                BEGIN
+                    INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, description)
+                    VALUES ('delete', old.id, old.name, old.description);
+                    INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (new.id, new.name, new.description);
+                END
+            """)
+            if not fts_exists:
+                self._conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+                self.logger.info("Built full-text index %s.", FTS_TABLE)
+        self._conn.execute("PRAGMA optimize")
+
+    def _build_query(
+        self, conditions: List[str], params: List[Any], text: Optional[str], limit: int
+    ) -> Tuple[str, List[Any]]:
+        columns = ", ".join(f"p.{column}" for column in RESULT_COLUMNS)
+        if text:
+            query = f"SELECT {columns} FROM {FTS_TABLE} JOIN vendr_products p ON p.id = {FTS_TABLE}.rowid"
+            conditions = [f"{FTS_TABLE} MATCH ?"] + conditions
+            params = [self._match_expression(text)] + params
+            order = f"{FTS_TABLE}.rank"
+        else:
+            query = f"SELECT {columns} FROM vendr_products p"
+            order = "p.median_price"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return f"{query} ORDER BY {order} LIMIT ?", params + [limit]
+
+    @staticmethod
+    def _match_expression(text: str) -> str:
+        """Every word as a quoted FTS5 string, so user input can not inject query syntax."""
+        return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+    def _fetch(self, query: str, params: List[Any]) -> List[Tuple]:
+        return self._conn.execute(query, params).fetchall()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class PostgresProductSearch(ProductSearch):
+    """ProductSearch over Postgres, full text through a generated tsvector column with a GIN index."""
+
+    placeholder = "%s"
+
+    def __init__(self, dsn: str):
+        super().__init__(dsn)
+        self._conn = psycopg2.connect(dsn)
+
+    def ensure_indexes(self) -> None:
+        with self._conn.cursor() as cur:
+            # name weighs more than description in ts_rank
+            cur.execute(
+                """
+                ALTER TABLE vendr_products ADD COLUMN IF NOT EXISTS search_vector tsvector
+                GENERATED ALWAYS AS (
+                    setweight(to_tsvector('english', coalesce(name, '')), 'A')
+                    || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+                ) STORED;
+                CREATE INDEX IF NOT EXISTS vendr_products_search ON vendr_products USING GIN (search_vector);
+                """
+            )
+            for name, columns in PRICE_INDEXES.items():
+                cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON vendr_products ({columns})")
+            cur.execute("ANALYZE vendr_products")
+        self._conn.commit()
+
+    def _build_query(
+        self, conditions: List[str], params: List[Any], text: Optional[str], limit: int
+    ) -> Tuple[str, List[Any]]:
+        columns = ", ".join(f"p.{column}" for column in RESULT_COLUMNS)
+        if text:
+            query = f"SELECT {columns} FROM vendr_products p, websearch_to_tsquery('english', %s) text_query"
+            conditions = ["p.search_vector @@ text_query"] + conditions
+            params = [text] + params
+            order = "ts_rank(p.search_vector, text_query) DESC"
+        else:
+            query = f"SELECT {columns} FROM vendr_products p"
+            order = "p.median_price"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return f"{query} ORDER BY {order} LIMIT %s", params + [limit]
+
+    def _fetch(self, query: str, params: List[Any]) -> List[Tuple]:
+        with self._conn.cursor() as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+        self._conn.rollback()
+        return rows
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def product_search_from_dsn(dsn: str) -> ProductSearch:
+    # same rule as ScraperApp: "postgresql" in the DSN selects Postgres, otherwise a SQLite file
+    if "postgresql" in dsn:
+        return PostgresProductSearch(dsn)
+    return SqliteProductSearch(dsn)
+
+
+def main():
+    from dotenv import load_dotenv
+    from src.databases import get_db_dsn
+
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("index", help="create missing indexes")
+    search_parser = commands.add_parser("search", help="query products")
+    search_parser.add_argument("--category")
+    search_parser.add_argument("--min-price", type=int, help="lowest median price")
+    search_parser.add_argument("--max-price", type=int, help="highest median price")
+    search_parser.add_argument("--text", help="words that must appear in name or description")
+    search_parser.add_argument("--limit", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    load_dotenv()
+    product_search = product_search_from_dsn(get_db_dsn())
+    try:
+        started = time.perf_counter()
+        if args.command == "index":
+            product_search.ensure_indexes()
+            print(f"Indexes ready in {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+            return
+        products = product_search.search(args.category, args.min_price, args.max_price, args.text, args.limit)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for product in products:
+            print(json.dumps(product, ensure_ascii=False))
+        print(f"{len(products)} product(s) in {elapsed_ms:.1f} ms", file=sys.stderr)
+    finally:
+        product_search.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,195 @@
-from typing import List
+from typing import Iterable, List, Optional, Tuple
 import threading
 from queue import Queue
 import sqlite3
-from src.product import Product
+from src.databases.flush_policy import FlushPolicy
+from src.fingerprints import FingerprintStore
+from src.frontier import CrawlFrontier
+from src.product_batch import ProductBatch
 from src.databases.awriter import AWriter
 
 
+FINGERPRINT_COLUMNS = ("url", "page_hash", "fingerprint")
+
+# columns in Product.as_tuple() order
+PRODUCT_COLUMNS = "name, description, category, min_price, max_price, median_price, url, page_hash, fingerprint"
+
+UPSERT_SET = """
+    ON CONFLICT(name, category) DO UPDATE SET
+        description=excluded.description,
+        min_price=excluded.min_price,
+        max_price=excluded.max_price,
+        median_price=excluded.median_price,
+        url=excluded.url,
+        page_hash=excluded.page_hash,
+        fingerprint=excluded.fingerprint,
+        scraped_at=CURRENT_TIMESTAMP
+    WHERE (vendr_products.fingerprint, vendr_products.url, vendr_products.page_hash)
+        IS NOT (excluded.fingerprint, excluded.url, excluded.page_hash)
+"""
+
+# a row for every new product and every change of its prices, written by triggers on vendr_products
+HISTORY_TABLE = "vendr_price_history"
+
+STAGING_TABLE = "vendr_products_staging"
+
+# WAL with synchronous=NORMAL only fsyncs on checkpoints, cache and mmap sizes are in KiB / bytes
+BULK_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-262144",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
 class SqliteWriter(AWriter):
     """
     Dedicated DB writer thread which consumes Product items from a queue and writes them to SQLite.
     Uses batched insert for efficiency.
+
+    Rows whose fingerprint, url and page_hash are unchanged are skipped by the
+    upsert, scraped_at is the time of the last change. Price changes are
+    appended to HISTORY_TABLE.
+
+    Bulk mode tunes the connection with BULK_PRAGMAS and groups batches into
+    transactions of at least bulk_commit_rows rows. With defer_index it also
+    appends rows to an index-free staging table and upserts them into
+    vendr_products (and its unique index) once, at the end of the run.
     """
 
     def __init__(
         self, dsn: str,
         write_queue: Queue,
         batch_size: int = 20,
-        stop_event: threading.Event = None
+        stop_event: threading.Event = None,
+        fingerprints: Optional[FingerprintStore] = None,
+        flush_policy: Optional[FlushPolicy] = None,
+        frontier: Optional[CrawlFrontier] = None,
+        bulk: bool = False,
+        bulk_commit_rows: int = 50000,
+        defer_index: bool = False
     ):
-        super().__init__(write_queue, batch_size, stop_event, name="SQLiteWriter")
+        super().__init__(
+            write_queue, batch_size, stop_event, name="SQLiteWriter",
+            fingerprints=fingerprints, flush_policy=flush_policy, frontier=frontier
+        )
         self.dsn = dsn
+        self.bulk = bulk
+        self.bulk_commit_rows = bulk_commit_rows
+        self.defer_index = bulk and defer_index
+        self._uncommitted_rows = 0
         self._conn = None
 
     def run(self):
         # connect to database and run loop
         self._conn = sqlite3.connect(self.dsn, check_same_thread=False)
         self._conn.row_factory = sqlite3.Row
+        if self.bulk:
+            for pragma in BULK_PRAGMAS:
+                self._conn.execute(pragma)
         self._ensure_table()
-        super().run()
-        if self._conn:
-            self._conn.close()
+        if self.defer_index:
+            self._ensure_staging_table()
+        try:
+            super().run()
+        finally:
+            if self.bulk:
+                self._commit()
+            if self.defer_index:
+                self._merge_staging()
+            if self._conn:
+                self._conn.close()
+
+    def _write(self, batch: ProductBatch):
+        rows = batch.rows()
+        if not self.bulk:
+            with self._conn:
+                self._conn.executemany(self._upsert_query(), rows)
+            self.logger.info("Wrote %d products to DB.", len(batch))
+            return
+        # bulk: keep the transaction open across batches
+        if self.defer_index:
+            self._conn.executemany(
+                f"INSERT INTO {STAGING_TABLE} ({PRODUCT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        else:
+            self._conn.executemany(self._upsert_query(), rows)
+        self._uncommitted_rows += len(batch)
+        if self._uncommitted_rows >= self.bulk_commit_rows:
+            self._commit()
 
-    def _write(self, items: List[Product]):
-        rows = [p.as_tuple() for p in items]
+    def _update_page_hashes(self, rows: List[Tuple[str, str, str]]) -> None:
+        query = "UPDATE vendr_products SET page_hash = ? WHERE name = ? AND category = ?"
+        if self.bulk:
+            # rides along the open bulk transaction
+            self._conn.executemany(query, rows)
+            return
         with self._conn:
-            self._conn.executemany("""
-                INSERT INTO vendr_products (name, description, category, min_price, max_price, median_price, scraped_at)
-                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                ON CONFLICT(name, category) DO UPDATE SET
-                    description=excluded.description,
-                    min_price=excluded.min_price,
-                    max_price=excluded.max_price,
-                    median_price=excluded.median_price,
-                    scraped_at=CURRENT_TIMESTAMP
-            """, rows)
-        self.logger.info("Wrote %d products to DB.", len(rows))
-
-    def _get_unique_key(self, item: Product):
-        return (item.name, item.category)
+            self._conn.executemany(query, rows)
+
+    def _defers_commit(self) -> bool:
+        return self.bulk
+
+    def _upsert_query(self) -> str:
+        return f"""
+            INSERT INTO vendr_products ({PRODUCT_COLUMNS}, scraped_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            {UPSERT_SET}
+        """
+
+    def _commit(self):
+        # page hash updates ride the transaction too, commit even without new rows
+        self._conn.commit()
+        if self._uncommitted_rows:
+            self.logger.info("Wrote %d products to DB.", self._uncommitted_rows)
+            self._uncommitted_rows = 0
+        # staged rows only count once they are merged
+        if not self.defer_index:
+            self._mark_written()
+
+    def _merge_staging(self):
+        """Upsert staged rows into vendr_products in one transaction, the latest staged row wins."""
+        with self._conn:
+            cursor = self._conn.execute(f"""
+                INSERT INTO vendr_products ({PRODUCT_COLUMNS}, scraped_at)
+                SELECT {PRODUCT_COLUMNS}, CURRENT_TIMESTAMP FROM {STAGING_TABLE}
+                WHERE rowid IN (SELECT max(rowid) FROM {STAGING_TABLE} GROUP BY name, category)
+                {UPSERT_SET}
+            """)
+            self._conn.execute(f"DELETE FROM {STAGING_TABLE}")
+        self.logger.info("Merged %d staged products into vendr_products.", cursor.rowcount)
+        self._mark_written()
+
+    def _read_fingerprints(self) -> Iterable[Tuple]:
+        conn = sqlite3.connect(self.dsn)
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(vendr_products)")}
+            # no table yet, or it was created before fingerprints were introduced
+            if not columns.issuperset(FINGERPRINT_COLUMNS):
+                return []
+            return conn.execute(
+                "SELECT name, category, url, page_hash, fingerprint FROM vendr_products"
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def _ensure_staging_table(self):
+        with self._conn:
+            self._conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {STAGING_TABLE} (
+                    name TEXT NOT NULL,
+                    description TEXT,
+                    category TEXT,
+                    min_price INTEGER,
+                    max_price INTEGER,
+                    median_price INTEGER,
+                    url TEXT,
+                    page_hash TEXT,
+                    fingerprint TEXT
+                );
+            """)
+        self.logger.debug("Ensured %s table exists.", STAGING_TABLE)
 
     def _ensure_table(self):
         with self._conn:
@@ -60,8 +202,61 @@ class SqliteWriter(AWriter):
                     min_price INTEGER,
                     max_price INTEGER,
                     median_price INTEGER,
+                    url TEXT,
+                    page_hash TEXT,
+                    fingerprint TEXT,
                     scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     CONSTRAINT unique_product UNIQUE (name, category)
                 );
             """)
-        self.logger.debug("Ensured vendr_products table exists.")
\ No newline at end of file
+            # tables created before fingerprints were introduced
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(vendr_products)")}
+            for column in FINGERPRINT_COLUMNS:
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE vendr_products ADD COLUMN {column} TEXT")
+        self.logger.debug("Ensured vendr_products table exists.")
+        self._ensure_history_table()
+
+    def _ensure_history_table(self):
+        with self._conn:
+            history_exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (HISTORY_TABLE,)
+            ).fetchone()
+            self._conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {HISTORY_TABLE} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    product_id INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    category TEXT,
+                    min_price INTEGER,
+                    max_price INTEGER,
+                    median_price INTEGER,
+                    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {HISTORY_TABLE}_product ON {HISTORY_TABLE} (product_id, recorded_at)"
+            )
+            self._conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {HISTORY_TABLE}_insert AFTER INSERT ON vendr_products BEGIN
+                    INSERT INTO {HISTORY_TABLE} (product_id, name, category, min_price, max_price, median_price)
+                    VALUES (new.id, new.name, new.category, new.min_price, new.max_price, new.median_price);
+                END
+            """)
+            self._conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {HISTORY_TABLE}_update
+                AFTER UPDATE OF min_price, max_price, median_price ON vendr_products
+                WHEN (old.min_price, old.max_price, old.median_price)
+                    IS NOT (new.min_price, new.max_price, new.median_price)
+                BEGIN
+                    INSERT INTO {HISTORY_TABLE} (product_id, name, category, min_price, max_price, median_price)
+                    VALUES (new.id, new.name, new.category, new.min_price, new.max_price, new.median_price);
+                END
+            """)
+            # products stored before the history existed start with their current prices
+            if not history_exists:
+                self._conn.execute(f"""
+                    INSERT INTO {HISTORY_TABLE} (product_id, name, category, min_price, max_price, median_price)
+                    SELECT id, name, category, min_price, max_price, median_price FROM vendr_products
+                """)
+        self.logger.debug("Ensured %s table exists.", HISTORY_TABLE)
@@ -0,0 +1,114 @@
+import json
+import re
+from typing import Any, Iterator, List, Optional, Union
+from .logger import get_logger
+from .product import Product
+
+
+# extraction paths reported per page
+JSON_PATH = "json"
+XPATH_PATH = "xpath"
+
+# <script type="application/ld+json"> payloads, found on the raw page without building a tree
+JSON_LD_SCRIPT = re.compile(
+    rb'<script[^>]*\stype\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>', re.S | re.I
+)
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+class EmbeddedJsonExtractor:
+    """
+    Reads products and listing card URLs from the schema.org JSON-LD blobs pages
+    embed for search engines, not from the framework's hydration state. Only the
+    script payloads are decoded, no DOM is built. Returns None when a page has no
+    usable blob, so callers can fall back to the XPath selectors.
+
+    Product: name, description and offers.lowPrice / highPrice as min / max price.
+    schema.org has no median price, ProductParser takes it from the XPath selectors.
+    Listing: the url (or item) of every ItemList.itemListElement.
+    """
+
+    def __init__(self) -> None:
+        self.logger = get_logger("EmbeddedJsonExtractor")
+
+    def product(
+        self,
+        page_html: Union[str, bytes],
+        product_url: str,
+        category_hint: str,
+        encoding: Optional[str] = None
+    ) -> Optional[Product]:
+        node = self._find_node(page_html, encoding, "Product")
+        if node is None:
+            return None
+        name = _text(node.get("name"))
+        if not name:
+            return None
+        offers = node.get("offers")
+        if isinstance(offers, list):
+            offers = offers[0] if offers else None
+        if not isinstance(offers, dict):
+            offers = {}
+        return Product(
+            name=name,
+            category=category_hint.strip(),
+            median_price=None,
+            min_price=_price(offers.get("lowPrice")),
+            max_price=_price(offers.get("highPrice")),
+            description=_text(node.get("description")),
+            url=product_url,
+        )
+
+    def listing_urls(self, page_html: Union[str, bytes], encoding: Optional[str] = None) -> Optional[List[str]]:
+        """Return the product URLs (possibly relative) of a listing page in list order."""
+        node = self._find_node(page_html, encoding, "ItemList")
+        if node is None:
+            return None
+        urls = []
+        for element in node.get("itemListElement") or []:
+            if not isinstance(element, dict):
+                continue
+            item = element.get("item")
+            url = element.get("url") or (item.get("url") or item.get("@id") if isinstance(item, dict) else item)
+            if isinstance(url, str) and url:
+                urls.append(url)
+        return urls
+
+    def _find_node(self, page_html: Union[str, bytes], encoding: Optional[str], node_type: str) -> Optional[dict]:
+        """Return the first JSON-LD node of node_type, top-level arrays and @graph included."""
+        if isinstance(page_html, str):
+            page_html, encoding = page_html.encode("utf-8"), "utf-8"
+        for match in JSON_LD_SCRIPT.finditer(page_html):
+            try:
+                data = json.loads(match.group(1).decode(encoding or "utf-8", errors="replace"))
+            except ValueError as e:
+                self.logger.debug("Skipping invalid JSON-LD blob: %s", e)
+                continue
+            for node in _nodes(data):
+                types = node.get("@type")
+                if types == node_type or (isinstance(types, list) and node_type in types):
+                    return node
+        return None
+
+
+def _nodes(data: Any) -> Iterator[dict]:
+    if isinstance(data, list):
+        for item in data:
+            yield from _nodes(item)
+    elif isinstance(data, dict):
+        yield data
+        yield from _nodes(data.get("@graph"))
+
+
+def _text(value: Any) -> str:
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _price(value: Any) -> Optional[int]:
+    """Whole currency units from a JSON number or a text like "$12,000"."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = NUMBER.search(str(value).replace(",", ""))
+    return int(float(match.group())) if match else None
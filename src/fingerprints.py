@@ -0,0 +1,80 @@
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from .product_batch import ProductBatch
+
+
+def page_hash(page_html: Union[str, bytes]) -> str:
+    """Hash of the raw product page, lets workers skip parsing byte-identical pages."""
+    if isinstance(page_html, str):
+        page_html = page_html.encode("utf-8")
+    return hashlib.sha1(page_html).hexdigest()
+
+
+class FingerprintStore:
+    """
+    In-memory view of the fingerprints already stored in vendr_products.
+
+    Loaded once at startup, then shared by workers (skip parsing pages that
+    did not change) and the writer (skip writing products whose content
+    fingerprint did not change). Also counts new, updated and unchanged products.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._page_hashes: Dict[str, str] = {}
+        self._fingerprints: Dict[Tuple[str, str], str] = {}
+        self.new = 0
+        self.updated = 0
+        self.unchanged = 0
+
+    def load(self, rows: Iterable[Tuple[str, str, Optional[str], Optional[str], Optional[str]]]) -> None:
+        """Fill the store from (name, category, url, page_hash, fingerprint) rows."""
+        with self._lock:
+            for name, category, url, stored_page_hash, fingerprint in rows:
+                if fingerprint:
+                    self._fingerprints[(name, category)] = fingerprint
+                if url and stored_page_hash:
+                    self._page_hashes[url] = stored_page_hash
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def is_page_unchanged(self, url: str, current_page_hash: str) -> bool:
+        """Return True if the page is byte-identical to the stored one, counted as an unchanged product."""
+        with self._lock:
+            unchanged = self._page_hashes.get(url) == current_page_hash
+            if unchanged:
+                self.unchanged += 1
+        return unchanged
+
+    def filter_changed(self, batch: ProductBatch) -> Tuple[ProductBatch, List[Tuple[str, str, str]]]:
+        """
+        Return only new or updated products and remember their fingerprints, plus
+        (page_hash, name, category) of unchanged products whose page changed anyway
+        (markup only), so the writer can store the new page hash without rewriting the row.
+        """
+        changed = []
+        rehashed = []
+        with self._lock:
+            rows = zip(batch.keys(), batch.fingerprints, batch.urls, batch.page_hashes)
+            for i, (key, fingerprint, url, stored_page_hash) in enumerate(rows):
+                known = self._fingerprints.get(key)
+                if known == fingerprint:
+                    self.unchanged += 1
+                    if url and stored_page_hash and self._page_hashes.get(url) != stored_page_hash:
+                        self._page_hashes[url] = stored_page_hash
+                        rehashed.append((stored_page_hash,) + key)
+                    continue
+                if known is None:
+                    self.new += 1
+                else:
+                    self.updated += 1
+                self._fingerprints[key] = fingerprint
+                if url and stored_page_hash:
+                    self._page_hashes[url] = stored_page_hash
+                changed.append(i)
+        return batch.select(changed), rehashed
+
+    def summary(self) -> str:
+        return f"new={self.new}, updated={self.updated}, unchanged={self.unchanged}"
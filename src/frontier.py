@@ -0,0 +1,167 @@
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .logger import get_logger
+
+
+PENDING = "pending"
+IN_FLIGHT = "in-flight"
+DONE = "done"
+FAILED = "failed"
+
+# a product task is (url, category_hint), same as task_queue items
+Task = Tuple[str, str]
+
+
+class CrawlFrontier:
+    """
+    Persistent crawl frontier stored in a SQLite file, lets an interrupted run resume.
+
+    - frontier_products: every discovered (url, category_hint) with its state,
+      pending -> in-flight (taken by a worker) -> done (written by the writer) or failed
+    - frontier_listings: listing pages whose product cards are already in
+      frontier_products, with the page count of first listing pages, so the
+      producer does not fetch them again
+    - frontier_lastmod: sitemap <lastmod> of product URLs, seen in this run and
+      processed (written, or found unchanged) in an earlier one. Kept across runs,
+      so sitemap discovery only enqueues pages modified since they were last processed
+
+    resume() turns tasks left in-flight by a crashed run back into pending and returns every pending task.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._ensure_tables()
+        self.logger = get_logger("CrawlFrontier")
+
+    def reset(self) -> None:
+        """Forget the previous run, called when a run starts without resume."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM frontier_products")
+            self._conn.execute("DELETE FROM frontier_listings")
+
+    def resume(self) -> List[Task]:
+        """Return tasks still pending, including the ones in flight when the previous run stopped."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE frontier_products SET state = ? WHERE state = ?", (PENDING, IN_FLIGHT))
+            rows = self._conn.execute(
+                "SELECT url, category_hint FROM frontier_products WHERE state = ?", (PENDING,)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def add(self, tasks: Iterable[Task]) -> List[Task]:
+        """Record discovered tasks as pending and return the ones not seen before."""
+        added = []
+        with self._lock, self._conn:
+            for url, category_hint in tasks:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO frontier_products (url, category_hint, state) VALUES (?, ?, ?)",
+                    (url, category_hint, PENDING)
+                )
+                if cursor.rowcount:
+                    added.append((url, category_hint))
+        return added
+
+    def mark(self, url: str, category_hint: str, state: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE frontier_products SET state = ? WHERE url = ? AND category_hint = ?",
+                (state, url, category_hint)
+            )
+            if state == DONE:
+                self._conn.execute("UPDATE frontier_lastmod SET processed = seen WHERE url = ?", (url,))
+
+    def mark_written(self, urls: Iterable[str]) -> None:
+        """Mark product pages done once their products were handed to the database."""
+        urls = list(urls)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE frontier_products SET state = ? WHERE url = ?", [(DONE, url) for url in urls]
+            )
+            self._conn.executemany(
+                "UPDATE frontier_lastmod SET processed = seen WHERE url = ?", [(url,) for url in urls]
+            )
+
+    def filter_modified(self, entries: Iterable[Tuple[str, Optional[str]]]) -> Set[str]:
+        """
+        Record the sitemap lastmod of (url, lastmod) entries and return the URLs
+        without a lastmod or whose lastmod differs from the one last processed.
+        """
+        entries = list(entries)
+        modified = set()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO frontier_lastmod (url, seen) VALUES (?, ?)
+                ON CONFLICT(url) DO UPDATE SET seen = excluded.seen
+                """,
+                entries
+            )
+            for url, lastmod in entries:
+                if lastmod is None:
+                    modified.add(url)
+                    continue
+                processed = self._conn.execute(
+                    "SELECT processed FROM frontier_lastmod WHERE url = ?", (url,)
+                ).fetchone()[0]
+                if processed != lastmod:
+                    modified.add(url)
+        return modified
+
+    def listing_page(self, url: str) -> Optional[Tuple[str, int]]:
+        """Return (full category, page count) of a listing page finished in a previous run."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT category, page_count FROM frontier_listings WHERE url = ?", (url,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def mark_listing_done(self, url: str, category: str, page_count: int = 1) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO frontier_listings (url, category, page_count) VALUES (?, ?, ?)",
+                (url, category, page_count)
+            )
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM frontier_products GROUP BY state").fetchall()
+        return dict(rows)
+
+    def summary(self) -> str:
+        counts = self.counts()
+        return ", ".join(f"{state}={counts.get(state, 0)}" for state in (PENDING, IN_FLIGHT, DONE, FAILED))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _ensure_tables(self) -> None:
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS frontier_products (
+                    url TEXT NOT NULL,
+                    category_hint TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    PRIMARY KEY (url, category_hint)
+                );
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS frontier_products_state ON frontier_products (state)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS frontier_listings (
+                    url TEXT PRIMARY KEY,
+                    category TEXT NOT NULL,
+                    page_count INTEGER NOT NULL
+                );
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS frontier_lastmod (
+                    url TEXT PRIMARY KEY,
+                    seen TEXT,
+                    processed TEXT
+                );
+            """)
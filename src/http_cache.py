@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional
+from .logger import get_logger
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    encoding: Optional[str] = None
+
+
+class ResponseCache:
+    """
+    Persistent HTTP response cache keyed by URL, stored in a SQLite file.
+
+    Only responses carrying a validator (ETag or Last-Modified) are stored, so
+    they can be revalidated with a conditional request on the next run.
+    Total body size is capped at max_bytes, least recently used entries are evicted first.
+    Bodies are kept as the bytes received, with the charset declared by the response.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._ensure_table()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM http_cache"
+        ).fetchone()[0]
+        self.logger = get_logger("ResponseCache")
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, encoding FROM http_cache WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return CachedResponse(url, *row)
+
+    def conditional_headers(self, entry: Optional[CachedResponse]) -> Dict[str, str]:
+        """Return If-None-Match/If-Modified-Since headers for a cached entry."""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def touch(self, url: str) -> None:
+        """Mark entry as recently used after a successful revalidation."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE http_cache SET last_access = ? WHERE url = ?", (time.time(), url))
+
+    def store(self, url: str, body: bytes, headers: Mapping[str, str], encoding: Optional[str] = None) -> None:
+        """Store body with validators taken from response headers, then evict over the size cap."""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not (etag or last_modified):
+            return
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock, self._conn:
+            old = self._conn.execute("SELECT size FROM http_cache WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                """
+                INSERT INTO http_cache (url, body, etag, last_modified, encoding, size, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    body=excluded.body,
+                    etag=excluded.etag,
+                    last_modified=excluded.last_modified,
+                    encoding=excluded.encoding,
+                    size=excluded.size,
+                    last_access=excluded.last_access
+                """,
+                (url, body, etag, last_modified, encoding, size, time.time()),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until total size fits max_bytes. Caller holds the lock."""
+        if self._total_bytes <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT url, size FROM http_cache ORDER BY last_access")
+        evicted = []
+        for url, size in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            evicted.append((url,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM http_cache WHERE url = ?", evicted)
+        self.logger.debug("Evicted %d cached responses.", len(evicted))
+
+    def _ensure_table(self) -> None:
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    url TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    encoding TEXT,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                );
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS http_cache_last_access ON http_cache (last_access)")
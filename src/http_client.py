@@ -1,39 +1,287 @@
+import codecs
 import os
-from typing import Optional
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
 import requests
 from requests.adapters import HTTPAdapter, Retry
-from .logger import get_logger
+from urllib3.util import make_headers
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from .http_cache import ResponseCache
+from .logger import FETCH_FAILED, get_logger
+from .metrics import metrics
+from .rate_controller import MAX_RETRY_AFTER, THROTTLE_STATUS_CODES, AdaptiveConcurrencyController, parse_retry_after
+
+try:
+    import httpx
+except ImportError:  # only Http2Client needs httpx (and h2)
+    httpx = None
 
 
 REQUESTS_TIMEOUT = float(os.environ.get("REQUESTS_TIMEOUT", "10"))
 REQUESTS_RETRIES = int(os.environ.get("REQUESTS_RETRIES", "3"))
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+RETRY_BACKOFF = 0.5
+# urllib3 keeps 10 connections per host unless told otherwise
+DEFAULT_POOL_SIZE = 10
+# gzip and deflate plus br and zstd when their decoders (brotli, backports.zstd) are installed
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+# response bodies are streamed in chunks of BODY_CHUNK_BYTES
+BODY_CHUNK_BYTES = 64 * 1024
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+
+FETCH_SECONDS = metrics.histogram("http_fetch_seconds", "Duration of page fetches including retries")
+FETCH_ERRORS = metrics.counter("http_fetch_errors_total", "Page fetches that returned no body")
+CACHE_REVALIDATED = metrics.counter("http_cache_revalidated_total", "Pages served from cache after 304")
+CONNECTIONS_OPENED = metrics.counter("http_connections_opened_total", "Connections opened, TCP and TLS handshakes")
+REQUESTS_SENT = metrics.counter("http_requests_sent_total", "Requests sent over pooled connections, retries included")
+
+
+class CountingHTTPConnection(HTTPConnection):
+    """urllib3 connection counting every connect, including reconnects of pooled connections the server closed."""
+
+    def connect(self):
+        CONNECTIONS_OPENED.inc()
+        super().connect()
+
+
+class CountingHTTPSConnection(HTTPSConnection):
+    connect = CountingHTTPConnection.connect
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    """urllib3 pool counting sent requests, with CONNECTIONS_OPENED their ratio is the connection reuse."""
+
+    ConnectionCls = CountingHTTPConnection
+
+    def _make_request(self, *args, **kwargs):
+        REQUESTS_SENT.inc()
+        return super()._make_request(*args, **kwargs)
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CountingHTTPSConnection
+    _make_request = CountingHTTPConnectionPool._make_request
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose host pools count connections and requests."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+
+@dataclass(slots=True)
+class RawPage:
+    """Decompressed response body and the charset declared in its Content-Type, if any."""
+    body: bytes
+    encoding: Optional[str] = None
+
+    def text(self) -> str:
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+
+def declared_encoding(content_type: Optional[str]) -> Optional[str]:
+    """Return the charset parameter of a Content-Type header when Python knows the codec."""
+    for param in (content_type or "").split(";")[1:]:
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "charset":
+            encoding = value.strip().strip('"\'')
+            try:
+                return codecs.lookup(encoding).name
+            except LookupError:
+                return None
+    return None
+
+
+def connection_stats() -> dict:
+    """Connections opened and requests sent so far by every HttpClient, with the share of reused connections."""
+    opened, sent = CONNECTIONS_OPENED.value, REQUESTS_SENT.value
+    return {
+        "connections_opened": opened,
+        "requests_sent": sent,
+        "reuse_ratio": round(1 - opened / sent, 3) if sent else None,
+    }
 
 
 class HttpClient:
-    """HTTP client with retries and session pooling."""
-    def __init__(self, timeout: float = REQUESTS_TIMEOUT, retries: int = REQUESTS_RETRIES):
+    """
+    HTTP client with retries and session pooling.
+    fetch_bytes() streams the decompressed body and returns it with the declared
+    charset, so parsers hand bytes straight to lxml instead of decoding the page
+    into a str first.
+    pool_size is the number of keep-alive connections per host, size it to the
+    threads sharing the client, otherwise urllib3 discards the extra connections
+    ("Connection pool is full") and every later request pays a new handshake.
+    With a ResponseCache, cached pages are revalidated with conditional requests
+    and served from the cache on 304 Not Modified.
+    With an AdaptiveConcurrencyController, requests in flight are limited by the
+    controller and 429/503 are retried here instead of inside urllib3, so the
+    controller sees them and can apply Retry-After to every thread.
+    """
+    def __init__(
+        self,
+        timeout: float = REQUESTS_TIMEOUT,
+        retries: int = REQUESTS_RETRIES,
+        cache: Optional[ResponseCache] = None,
+        controller: Optional[AdaptiveConcurrencyController] = None,
+        pool_size: int = DEFAULT_POOL_SIZE
+    ):
         self.timeout = timeout
-        self.session = requests.Session()
+        self.retries = retries
+        self.cache = cache
+        self.controller = controller
+        self.pool_size = pool_size
+        # statuses retried by _fetch, the others are retried by the transport
+        self.retry_status_codes = THROTTLE_STATUS_CODES if controller else ()
+        self.session = self._make_session()
+        self.logger = get_logger("HttpClient")
+
+    def _make_session(self):
+        session = requests.Session()
+        status_forcelist = RETRY_STATUS_CODES
+        if self.controller:
+            status_forcelist = [code for code in RETRY_STATUS_CODES if code not in self.retry_status_codes]
         retry_strategy = Retry(
-            total=retries,
-            backoff_factor=0.5,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["GET", "POST"]
+            total=self.retries,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=status_forcelist,
+            allowed_methods=["GET", "POST"],
+            # urllib3 retries 429/503 carrying Retry-After even outside status_forcelist
+            respect_retry_after_header=self.controller is None
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("https://", adapter)
-        self.session.mount("http://", adapter)
-        self.session.headers.update({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
-        })
-        self.logger = get_logger("HttpClient")
+        adapter = CountingHTTPAdapter(max_retries=retry_strategy, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": ACCEPT_ENCODING})
+        return session
 
     def fetch(self, url: str) -> Optional[str]:
+        """Return the page decoded to text, prefer fetch_bytes for pages handed to lxml."""
+        page = self.fetch_bytes(url)
+        return page.text() if page is not None else None
+
+    def fetch_bytes(self, url: str) -> Optional[RawPage]:
+        with FETCH_SECONDS.time():
+            page = self._fetch(url)
+        if page is None:
+            FETCH_ERRORS.inc()
+        return page
+
+    def _fetch(self, url: str) -> Optional[RawPage]:
+        cached = self.cache.get(url) if self.cache else None
+        headers = self.cache.conditional_headers(cached) if self.cache else None
         try:
-            resp = self.session.get(url, timeout=self.timeout)
-            resp.raise_for_status()
-            return resp.text
+            resp = self._get(url, headers)
+            for attempt in range(self.retries):
+                if resp.status_code not in self.retry_status_codes:
+                    break
+                resp.close()
+                self._backoff(attempt, resp)
+                resp = self._get(url, headers)
+            try:
+                if resp.status_code == 304 and cached:
+                    CACHE_REVALIDATED.inc()
+                    self.cache.touch(url)
+                    return RawPage(cached.body, cached.encoding)
+                resp.raise_for_status()
+                page = RawPage(self._read_body(resp), declared_encoding(resp.headers.get("Content-Type")))
+            finally:
+                resp.close()
+            if self.cache:
+                self.cache.store(url, page.body, resp.headers, page.encoding)
+            return page
         except Exception as e:
-            self.logger.warning("HTTP fetch failed for %s: %s", url, e)
+            self.logger.warning("HTTP fetch failed for %s: %s", url, e, extra=FETCH_FAILED)
             return None
+
+    def _read_body(self, resp) -> bytes:
+        """
+        Join the streamed chunks, the body is copied once into the returned bytes.
+        A reused buffer would still need that copy, lxml, the cache and page_hash keep immutable bytes.
+        """
+        return b"".join(self._iter_body(resp))
+
+    def _iter_body(self, resp) -> Iterable[bytes]:
+        return resp.iter_content(BODY_CHUNK_BYTES)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _backoff(self, attempt: int, resp) -> None:
+        """Wait before retrying resp, the controller already delays every thread after 429/503."""
+
+    def _get(self, url: str, headers: Optional[Dict[str, str]]) -> requests.Response:
+        if not self.controller:
+            return self._send(url, headers)
+        self.controller.acquire()
+        started = time.perf_counter()
+        resp = None
+        try:
+            resp = self._send(url, headers)
+            return resp
+        finally:
+            self.controller.release(
+                time.perf_counter() - started,
+                resp.status_code if resp is not None else None,
+                resp.headers.get("Retry-After") if resp is not None else None,
+            )
+
+    def _send(self, url: str, headers: Optional[Dict[str, str]]) -> requests.Response:
+        return self.session.get(url, timeout=self.timeout, headers=headers, stream=True)
+
+
+class Http2Client(HttpClient):
+    """
+    HttpClient over httpx with HTTP/2, requests to a host are multiplexed over
+    one connection (HTTP/1.1 pooling for servers without h2). Requires httpx[http2].
+    Status retries with exponential backoff happen in _fetch, connection errors
+    are retried by the transport. httpx negotiates br and zstd itself when
+    brotli and zstandard are installed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if httpx is None:
+            raise RuntimeError("Http2Client requires httpx: pip install 'httpx[http2]'")
+        super().__init__(*args, **kwargs)
+        self.retry_status_codes = tuple(RETRY_STATUS_CODES)
+
+    def _make_session(self):
+        limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+        return httpx.Client(
+            transport=httpx.HTTPTransport(http2=True, limits=limits, retries=self.retries),
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True
+        )
+
+    def _backoff(self, attempt: int, resp) -> None:
+        if self.controller and resp.status_code in THROTTLE_STATUS_CODES:
+            return
+        max_delay = self.controller.max_pause if self.controller else MAX_RETRY_AFTER
+        retry_after = parse_retry_after(resp.headers.get("Retry-After"), max_delay)
+        time.sleep(retry_after if retry_after is not None else RETRY_BACKOFF * 2 ** attempt)
+
+    def _iter_body(self, resp) -> Iterable[bytes]:
+        return resp.iter_bytes(BODY_CHUNK_BYTES)
+
+    def _send(self, url: str, headers: Optional[Dict[str, str]]):
+        request = self.session.build_request(
+            "GET", url, headers=headers, timeout=self.timeout, extensions={"trace": _count_trace}
+        )
+        return self.session.send(request, stream=True)
+
+
+def _count_trace(event: str, info: dict) -> None:
+    """httpcore trace callback feeding the same connection counters as the urllib3 pools."""
+    if event == "connection.connect_tcp.complete":
+        CONNECTIONS_OPENED.inc()
+    elif event.endswith(".send_request_headers.started"):
+        REQUESTS_SENT.inc()
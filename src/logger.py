@@ -1,22 +1,205 @@
+import atexit
+import json
 import logging
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
 
 
-def get_logger(module_name: str):
-    logger = logging.getLogger(module_name)
-    logger.setLevel(logging.INFO)
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(threadName)s: %(message)s"
+LOG_PATH = "app.log"
+TEXT_FORMAT = "text"
+JSON_FORMAT = "json"
+
+# message types of hot-path records, passed as extra= so sampling and rate limits can target them
+PRODUCT_PARSED = {"log_type": "product_parsed"}
+FETCH_FAILED = {"log_type": "fetch_failed"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the log_type of typed records."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        log_type = getattr(record, "log_type", None)
+        if log_type:
+            entry["log_type"] = log_type
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drops records by message type: the log_type given in extra, otherwise the unformatted message.
+    sample_rates keeps that share of a type's records, rate_limits lets through at most that many
+    records of a type per second (token bucket with one second of burst).
+    Dropped records are counted per type.
+    """
+
+    def __init__(
+        self, sample_rates: Optional[Dict[str, float]] = None, rate_limits: Optional[Dict[str, float]] = None
+    ):
+        super().__init__()
+        self.sample_rates = dict(sample_rates or {})
+        self.rate_limits = dict(rate_limits or {})
+        self.dropped: Dict[str, int] = {}
+        # type -> (tokens, last refill)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.sample_rates and not self.rate_limits:
+            return True
+        log_type = getattr(record, "log_type", None) or str(record.msg)
+        rate = self.sample_rates.get(log_type)
+        if rate is not None and random.random() >= rate:
+            return self._drop(log_type)
+        limit = self.rate_limits.get(log_type)
+        if limit is not None and not self._take_token(log_type, limit):
+            return self._drop(log_type)
+        return True
+
+    def _take_token(self, log_type: str, limit: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            tokens, refilled = self._buckets.get(log_type, (limit, now))
+            tokens = min(limit, tokens + (now - refilled) * limit)
+            if tokens < 1:
+                self._buckets[log_type] = (tokens, now)
+                return False
+            self._buckets[log_type] = (tokens - 1, now)
+            return True
+
+    def _drop(self, log_type: str) -> bool:
+        with self._lock:
+            self.dropped[log_type] = self.dropped.get(log_type, 0) + 1
+        return False
+
+
+# every logger puts records on _queue, one listener thread formats them and writes stdout and the log file
+_queue: queue.SimpleQueue = queue.SimpleQueue()
+_queue_handler = QueueHandler(_queue)
+_sampling = SamplingFilter()
+_queue_handler.addFilter(_sampling)
+_listener: Optional[QueueListener] = None
+_handlers: List[logging.Handler] = []
+_level = logging.INFO
+_loggers: List[logging.Logger] = []
+_lock = threading.RLock()
+# records of child processes (the parse pool) arrive on _process_queue and join _queue through _queue_handler
+_process_queue: Any = None
+_process_listener: Optional[QueueListener] = None
+# set in a child process, its records go to the parent instead of a listener of its own
+_forwarding = False
 
-    formatter = logging.Formatter(
-        "%(asctime)s [%(levelname)s] %(threadName)s: %(message)s"
-    )
 
-    ch = logging.StreamHandler()
-    ch.setFormatter(formatter)
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = TEXT_FORMAT,
+    path: Optional[str] = LOG_PATH,
+    sample_rates: Optional[Dict[str, float]] = None,
+    rate_limits: Optional[Dict[str, float]] = None
+) -> None:
+    """
+    (Re)start the listener thread writing records to stdout and path (no file when empty),
+    as text or as JSON lines with log_format="json". get_logger configures the defaults
+    on first use, call this before to change them.
+    """
+    global _listener, _handlers, _level
+    if log_format not in (TEXT_FORMAT, JSON_FORMAT):
+        raise ValueError(f"Unknown log format: {log_format}")
+    formatter = JsonFormatter() if log_format == JSON_FORMAT else logging.Formatter(LOG_FORMAT)
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if path:
+        handlers.append(logging.FileHandler(path, mode="a"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    with _lock:
+        stop_logging()
+        _level = logging.getLevelName(level.upper())
+        for logger in _loggers:
+            logger.setLevel(_level)
+        _sampling.sample_rates = dict(sample_rates or {})
+        _sampling.rate_limits = dict(rate_limits or {})
+        _handlers = handlers
+        _listener = QueueListener(_queue, *handlers, respect_handler_level=True)
+        _listener.start()
 
-    fh = logging.FileHandler("app.log", mode="a")
-    fh.setFormatter(formatter)
 
-    if not logger.handlers: 
-        logger.addHandler(ch)
-        logger.addHandler(fh)
+def stop_logging() -> None:
+    """Write out the queued records and stop the listener thread, runs at exit."""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+        for handler in _handlers:
+            handler.close()
 
+
+def log_stats() -> Dict[str, int]:
+    """Records dropped so far by sampling and rate limits, per message type."""
+    with _sampling._lock:
+        return dict(_sampling.dropped)
+
+
+def process_logging_args(mp_context) -> Tuple[Any, int]:
+    """
+    Arguments of forward_logging for processes started with mp_context, their records are
+    written by this process's listener with its format, path, level and sampling.
+    """
+    global _process_queue, _process_listener
+    with _lock:
+        if _process_queue is None:
+            _process_queue = mp_context.Queue()
+            _process_listener = QueueListener(_process_queue, _queue_handler)
+            _process_listener.start()
+            # registered after stop_logging, so it runs first and the forwarded records are written out
+            atexit.register(_stop_process_logging)
+        return _process_queue, _level
+
+
+def forward_logging(log_queue: Any, level: int) -> None:
+    """Send the records of this child process to the parent's log_queue, call it from the pool initializer."""
+    global _level, _forwarding
+    with _lock:
+        stop_logging()
+        _forwarding = True
+        _level = level
+        for logger in _loggers:
+            logger.setLevel(level)
+        # the parent samples, its filter counts the dropped records
+        _queue_handler.removeFilter(_sampling)
+        _queue_handler.queue = log_queue
+
+
+def _stop_process_logging() -> None:
+    global _process_listener
+    with _lock:
+        if _process_listener is not None:
+            _process_listener.stop()
+            _process_listener = None
+
+
+def get_logger(module_name: str):
+    logger = logging.getLogger(module_name)
+    with _lock:
+        if _listener is None and not _forwarding:
+            configure_logging()
+        logger.setLevel(_level)
+        if not logger.handlers:
+            logger.addHandler(_queue_handler)
+            _loggers.append(logger)
     return logger
+
+
+atexit.register(stop_logging)
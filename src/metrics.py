@@ -0,0 +1,253 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence
+from .logger import get_logger
+
+
+# latency buckets in seconds, from 1 ms to 30 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def prometheus(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.value}",
+        ]
+
+    def snapshot(self) -> dict:
+        return {"value": self.value}
+
+
+class Gauge:
+    """Gauge read from a callback (e.g. Queue.qsize), remembers the highest sampled value."""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.max = 0
+
+    def sample(self) -> float:
+        value = self.read()
+        self.max = max(self.max, value)
+        return value
+
+    def prometheus(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.sample()}",
+        ]
+
+    def snapshot(self) -> dict:
+        return {"value": self.sample(), "max": self.max}
+
+
+class Histogram:
+    """Cumulative bucket histogram of observed durations in seconds."""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile, None without observations."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def prometheus(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """Process-wide set of named metrics, get-or-create like logging.getLogger."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str = "") -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help_text))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]) -> Gauge:
+        """Register (or re-bind) a gauge reading its value from read()."""
+        gauge = self._get_or_create(name, lambda: Gauge(name, help_text, read))
+        gauge.read = read
+        return gauge
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def sample(self) -> None:
+        for metric in list(self._metrics.values()):
+            if isinstance(metric, Gauge):
+                metric.sample()
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.prometheus())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in list(self._metrics.items())}
+
+    def summary_table(self) -> str:
+        """Human readable table of all metrics, for the end-of-run log."""
+        rows = [f"{'metric':<32}{'count':>10}{'total s':>10}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'max':>8}"]
+        for name, metric in sorted(self._metrics.items()):
+            if isinstance(metric, Histogram):
+                rows.append(
+                    f"{name:<32}{metric.count:>10}{metric.sum:>10.2f}"
+                    f"{_fmt(metric.quantile(0.5)):>9}{_fmt(metric.quantile(0.95)):>9}{_fmt(metric.quantile(0.99)):>9}"
+                    f"{'':>8}"
+                )
+            elif isinstance(metric, Counter):
+                rows.append(f"{name:<32}{metric.value:>10}")
+            elif isinstance(metric, Gauge):
+                rows.append(f"{name:<32}{metric.sample():>10}{'':>37}{metric.max:>8}")
+        return "\n".join(rows)
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:g}"
+
+
+metrics = MetricsRegistry()
+
+
+class MetricsReporter(threading.Thread):
+    """
+    Samples queue depth gauges every interval seconds, optionally writes a JSON
+    snapshot to snapshot_path and serves Prometheus text on http://host:port/metrics.
+    host defaults to the loopback interface, set it to 0.0.0.0 to let other hosts scrape it.
+    """
+
+    def __init__(
+        self,
+        registry: MetricsRegistry = metrics,
+        interval: float = 5.0,
+        snapshot_path: Optional[str] = None,
+        port: int = 0,
+        host: str = "127.0.0.1",
+        stop_event: threading.Event = None
+    ):
+        super().__init__(name="MetricsReporter", daemon=True)
+        self.registry = registry
+        self.interval = interval
+        self.snapshot_path = snapshot_path
+        self.port = port
+        self.host = host
+        self.stop_event = stop_event or threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.logger = get_logger("MetricsReporter")
+
+    def run(self):
+        if self.port:
+            self._start_server()
+        try:
+            while not self.stop_event.wait(self.interval):
+                self.registry.sample()
+                self._write_snapshot()
+            self._write_snapshot()
+        finally:
+            if self._server:
+                self._server.shutdown()
+
+    def _write_snapshot(self) -> None:
+        if not self.snapshot_path:
+            return
+        try:
+            with open(self.snapshot_path, "w", encoding="utf-8") as f:
+                json.dump({"timestamp": time.time(), "metrics": self.registry.snapshot()}, f)
+        except OSError as e:
+            self.logger.warning("Failed to write metrics snapshot %s: %s", self.snapshot_path, e)
+
+    def _start_server(self) -> None:
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True).start()
+        self.logger.info("Serving metrics on %s:%d", self.host, self.port)
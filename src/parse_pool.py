@@ -0,0 +1,146 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from queue import Queue
+from typing import Optional, Tuple, Union
+from .frontier import FAILED, CrawlFrontier
+from .parser import PARSE_PATHS, PARSE_SECONDS, ProductParser
+from .product import Product
+from .logger import PRODUCT_PARSED, forward_logging, get_logger, process_logging_args
+
+
+# one parser per pool process, created by the pool initializer
+_process_parser: Optional[ProductParser] = None
+
+
+def _init_process(log_queue, log_level: int) -> None:
+    global _process_parser
+    forward_logging(log_queue, log_level)
+    _process_parser = ProductParser()
+
+
+def _parse_page(
+    page_html: Union[str, bytes], url: str, category_hint: str, encoding: Optional[str] = None
+) -> Tuple[Optional[Product], float, str]:
+    """
+    Return parsed product, parse duration and extraction path,
+    metrics of pool processes are not visible to the parent.
+    """
+    started = time.perf_counter()
+    product, path = _process_parser.extract(page_html, url, category_hint, encoding)
+    return product, time.perf_counter() - started, path
+
+
+class ParsePool:
+    """
+    Parse stage backed by a process pool, so lxml parsing does not serialise on the GIL
+    of the fetch threads.
+
+    Fetch threads hand off raw pages with submit(), parsed Product objects are
+    pushed into write_queue from the pool's result thread. At most max_pending
+    pages wait for parsing; submit() blocks when the limit is reached, event loops
+    use submit_async() which waits for a free slot on a helper thread instead.
+    Pages that fail to parse are checkpointed as failed in the frontier when one is given.
+    """
+
+    def __init__(
+        self,
+        write_queue: Queue,
+        processes: int,
+        max_pending: Optional[int] = None,
+        frontier: Optional[CrawlFrontier] = None
+    ):
+        self.write_queue = write_queue
+        self.frontier = frontier
+        # spawn: fork from a process already running fetch threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=context,
+            initializer=_init_process,
+            # pool processes log through this process, a spawned child would otherwise use the default config
+            initargs=process_logging_args(context),
+        )
+        self._pending = threading.BoundedSemaphore(max_pending or processes * 4)
+        # one thread waits for free slots on behalf of every coroutine
+        self._slot_waiter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ParsePoolSlots")
+        self._closed = threading.Event()
+        self.logger = get_logger("ParsePool")
+
+    def submit(
+        self,
+        page_html: Union[str, bytes],
+        url: str,
+        category_hint: str,
+        page_hash: Optional[str] = None,
+        encoding: Optional[str] = None
+    ) -> None:
+        self._pending.acquire()
+        self._submit(page_html, url, category_hint, page_hash, encoding)
+
+    async def submit_async(
+        self,
+        page_html: Union[str, bytes],
+        url: str,
+        category_hint: str,
+        page_hash: Optional[str] = None,
+        encoding: Optional[str] = None
+    ) -> None:
+        """submit() for an event loop thread, the loop keeps running while the pool is full."""
+        if not self._pending.acquire(blocking=False):
+            if not await asyncio.get_running_loop().run_in_executor(self._slot_waiter, self._wait_for_slot):
+                self.logger.debug("Parse pool shut down, dropping %s", url)
+                return
+        self._submit(page_html, url, category_hint, page_hash, encoding)
+
+    def _wait_for_slot(self) -> bool:
+        while not self._closed.is_set():
+            if self._pending.acquire(timeout=0.5):
+                return True
+        return False
+
+    def _submit(
+        self,
+        page_html: Union[str, bytes],
+        url: str,
+        category_hint: str,
+        page_hash: Optional[str],
+        encoding: Optional[str]
+    ) -> None:
+        future = self._executor.submit(_parse_page, page_html, url, category_hint, encoding)
+        future.add_done_callback(lambda f: self._on_parsed(f, url, category_hint, page_hash))
+
+    def join(self) -> None:
+        """Wait until every submitted page is parsed and pushed into write_queue."""
+        self._executor.shutdown(wait=True)
+        self._slot_waiter.shutdown(wait=True)
+
+    def shutdown(self) -> None:
+        """Stop the pool processes without waiting for pages not parsed yet, e.g. after an interrupt."""
+        self._closed.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._slot_waiter.shutdown(wait=False, cancel_futures=True)
+
+    def _on_parsed(self, future: Future, url: str, category_hint: str, page_hash: Optional[str]) -> None:
+        try:
+            product, seconds, path = future.result()
+            PARSE_SECONDS.observe(seconds)
+            PARSE_PATHS[path].inc()
+            if product:
+                product.page_hash = page_hash
+                self.write_queue.put(product)
+                self.logger.info("Parsed product: %s", product.name, extra=PRODUCT_PARSED)
+            else:
+                self.logger.debug("Parser returned None for %s", url)
+                self._mark_failed(url, category_hint)
+        except Exception as e:
+            self.logger.exception("Error parsing page %s: %s", url, e)
+            self._mark_failed(url, category_hint)
+        finally:
+            self._pending.release()
+
+    def _mark_failed(self, url: str, category_hint: str) -> None:
+        if self.frontier:
+            self.frontier.mark(url, category_hint, FAILED)
@@ -1,45 +1,94 @@
 import re
-from typing import Iterable, Optional, Tuple
-from lxml import html
+from typing import Iterable, Optional, Tuple, Union
+from src.embedded_json import JSON_PATH, XPATH_PATH, EmbeddedJsonExtractor
 from src.logger import get_logger
+from src.metrics import metrics
 from src.product import Product
+from src.xpath_selectors import XPathSelectors, content_root, parse_html
 
 
 # from .http_client import HttpClient
 
+PARSE_SECONDS = metrics.histogram("parse_seconds", "Duration of ProductParser.parse_product_page")
+PARSE_PATHS = {
+    JSON_PATH: metrics.counter("product_pages_json_total", "Product pages extracted from embedded JSON"),
+    XPATH_PATH: metrics.counter("product_pages_xpath_total", "Product pages parsed with XPath selectors"),
+}
+
+
 class ProductParser:
-    """Parses HTML strings into Product dataclasses using lxml and heuristics."""
+    """
+    Parses HTML into Product dataclasses using lxml and heuristics.
+    Pages may be str or the fetched bytes with their declared encoding.
+    The embedded JSON-LD blob is read first, the DOM is only built for pages without one
+    or whose blob lacks a price (always the median), the missing fields are then taken
+    from the XPath selectors.
+    """
     def __init__(self) -> None:
+        self.json_extractor = EmbeddedJsonExtractor()
         self.logger = get_logger("ProductParser")
 
     def parse_product_page(
         self,
-        page_html: str,
+        page_html: Union[str, bytes],
         product_url: str,
-        category_hint: str
+        category_hint: str,
+        encoding: Optional[str] = None
     ) -> Optional[Product]:
         """Parse product fields from product detail HTML."""
+        with PARSE_SECONDS.time():
+            product, path = self.extract(page_html, product_url, category_hint, encoding)
+        PARSE_PATHS[path].inc()
+        return product
+
+    def extract(
+        self,
+        page_html: Union[str, bytes],
+        product_url: str,
+        category_hint: str,
+        encoding: Optional[str] = None
+    ) -> Tuple[Optional[Product], str]:
+        """Return the product and the path its fields came from, JSON_PATH or XPATH_PATH."""
+        product = self.json_extractor.product(page_html, product_url, category_hint, encoding)
+        path = JSON_PATH
+        if product is None:
+            product = self._parse_product_page(page_html, product_url, category_hint, encoding)
+            path = XPATH_PATH
+        elif None in (product.median_price, product.min_price, product.max_price):
+            # NULL prices would overwrite the stored ones on upsert
+            parsed = self._parse_product_page(page_html, product_url, category_hint, encoding)
+            if parsed is not None:
+                self._fill_missing(product, parsed)
+                path = XPATH_PATH
+        self.logger.debug("Parsed %s with the %s path", product_url, path)
+        return product, path
+
+    def _parse_product_page(
+        self,
+        page_html: Union[str, bytes],
+        product_url: str,
+        category_hint: str,
+        encoding: Optional[str] = None
+    ) -> Optional[Product]:
         try:
-            doc = html.fromstring(page_html)
+            doc = content_root(parse_html(page_html, encoding))
         except Exception as e: 
             self.logger.debug("Failed to parse HTML for %s: %s", product_url, e)
             raise
 
-        product_name_element = doc.xpath('//h1[contains(@class, "rt-Heading")]')
+        product_name_element = XPathSelectors.HEADING(doc)
         name = self._first_text(product_name_element)
 
-        description = (
-            self._first_text(doc.xpath('//div[contains(@class, "_read-more-box'
-                                       '__content_122o3_1")]//p[contains(@class, "rt-Text")]'))
-            or self._first_text(product_name_element[0].xpath('.//../..//p'))
-        )
+        description = self._first_text(XPathSelectors.DESCRIPTION(doc))
+        if not description and product_name_element:
+            description = self._first_text(XPathSelectors.FALLBACK_DESCRIPTION(product_name_element[0]))
 
         # finding price range
         median_price, min_price, max_price = self._find_price_text(doc)
 
         # Trim
-        name = name.strip()
-        description = description.strip()
+        name = (name or "").strip()
+        description = (description or "").strip()
         if not name:
             # If no name found, skip
             self.logger.debug("No name parsed for %s; skipping", product_url)
@@ -52,8 +101,18 @@ class ProductParser:
             min_price=min_price,
             max_price=max_price,
             description=description,
+            url=product_url,
         )
 
+    @staticmethod
+    def _fill_missing(product: Product, parsed: Product) -> None:
+        """Copy the prices and description product lacks from parsed."""
+        for field in ("median_price", "min_price", "max_price"):
+            if getattr(product, field) is None:
+                setattr(product, field, getattr(parsed, field))
+        if not product.description:
+            product.description = parsed.description
+
     def _first_text(self, elements: Iterable) -> Optional[str]:
         for el in elements:
             if el is None:
@@ -70,13 +129,10 @@ class ProductParser:
     def _find_price_text(self, doc) -> Tuple[Optional[int], Optional[int], Optional[int]]:
         # search elements that may contain pricing-related keywords
         try:
-            mediana_elements = doc.xpath('//div[contains(@class, "_rangeAverage_118fo_42")]'
-                                         '/text()[normalize-space()]')
+            mediana_elements = XPathSelectors.PRICE_AVERAGE(doc)
             if mediana_elements:
                 median_price_text = mediana_elements[0]
-                min_price_text, max_price_text = doc.xpath(
-                    '//div[contains(@class, "_rangeSlider_118fo_13")]//span/text()'
-                )
+                min_price_text, max_price_text = XPathSelectors.PRICE_RANGE(doc)
                 median_price = self._parse_number(median_price_text)
                 min_price = self._parse_number(min_price_text)
                 max_price = self._parse_number(max_price_text)
@@ -1,17 +1,48 @@
+import gzip
 import re
 import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from io import BytesIO
 from queue import Queue
-from typing import Optional, List
-from urllib.parse import urlparse, urlunparse
+from typing import Any, Dict, Optional, List, Tuple
+from urllib.parse import urljoin, urlparse, urlunparse
 from lxml import html, etree
-from src.http_client import HttpClient
+from src.embedded_json import JSON_PATH, XPATH_PATH, EmbeddedJsonExtractor
+from src.frontier import CrawlFrontier
+from src.http_client import HttpClient, RawPage
 from src.logger import get_logger
+from src.metrics import metrics
+from src.scheduler import LISTING_TASK, PRODUCT_TASK, REFRESH_TASK, TaskScheduler, category_of
+from src.xpath_selectors import XPathSelectors, content_root, parse_html
+
+
+# a producer job is (callable, *args), its callable returns the follow-up jobs
+Job = Tuple[Any, ...]
+
+LISTING_PATHS = {
+    JSON_PATH: metrics.counter("listing_pages_json_total", "Listing pages read from embedded JSON"),
+    XPATH_PATH: metrics.counter("listing_pages_xpath_total", "Listing pages read with XPath selectors"),
+}
+SITEMAP_URLS = metrics.counter("sitemap_urls_total", "Product URLs read from sitemaps")
+SITEMAP_ENQUEUED = metrics.counter("sitemap_enqueued_total", "Sitemap product URLs enqueued as new or modified")
+SITEMAP_UNCHANGED = metrics.counter("sitemap_unchanged_total", "Sitemap product URLs skipped, lastmod unchanged")
+SITEMAP_UNMATCHED = metrics.counter("sitemap_unmatched_total", "Sitemap product URLs outside the configured categories")
+
+# sitemap product URLs are checked against the frontier and enqueued in batches of SITEMAP_BATCH
+SITEMAP_BATCH = 500
+GZIP_MAGIC = b"\x1f\x8b"
 
 
 class CategoryProducer:
     """
     Collects product URLs from category pages and enqueues them into the task queue.
-    Designed to be simple: iterate listing pages until no new links found or a safe max page cap.
+    Category, subcategory and listing page fetches run on a pool of producer_threads threads.
+    With a CrawlFrontier, only product URLs not seen before are enqueued and
+    listing pages finished in a previous run are not fetched again.
+    Product URLs of listing pages come from their embedded JSON-LD ItemList when
+    present, the following listing pages are then never parsed into a DOM.
+    With shared_pool, task_queue is a TaskScheduler and the fetches run as listing
+    jobs on its consumers (the product workers) instead of on producer_threads threads.
     """
 
     def __init__(
@@ -19,13 +50,23 @@ class CategoryProducer:
         http_client: HttpClient,
         category_urls: List[str],
         task_queue: Queue,
-        stop_event: threading.Event = None
+        stop_event: threading.Event = None,
+        producer_threads: int = 4,
+        frontier: Optional[CrawlFrontier] = None,
+        shared_pool: bool = False
     ) -> None:
+        if shared_pool and not isinstance(task_queue, TaskScheduler):
+            raise ValueError("shared_pool needs a TaskScheduler task queue")
         self.http_client = http_client
         self.category_urls = category_urls
         self.task_queue = task_queue
         self.stop_event = stop_event or threading.Event()
-        self.sub_category_urls = Queue()
+        self.producer_threads = producer_threads
+        self.frontier = frontier
+        self.shared_pool = shared_pool
+        self.json_extractor = EmbeddedJsonExtractor()
+        self._pending_jobs = 0
+        self._jobs_done = threading.Condition()
         self.logger = get_logger("CategoryProducer")
 
     def produce(self) -> None:
@@ -33,32 +74,71 @@ class CategoryProducer:
         Orchestrates the scraping workflow for product links.
 
         Workflow:
-            1. Iterates over the configured category URLs.
-            2. For each category, scrapes subcategory links.
-            3. If a stop event is set, the process stops early.
-            4. Collects subcategory URLs from the queue and scrapes
-            their listing pages to extract product links.
+            1. Fetches the configured category URLs concurrently.
+            2. Each category page yields its subcategory links, which are
+            crawled concurrently as soon as they are found.
+            3. The first listing page of a subcategory reports the page count,
+            the remaining listing pages are fanned out across the pool.
+            4. If a stop event is set, no new fetches are scheduled.
             5. Logs the start and finish of the producer workflow.
 
-        This method does not return anything but enqueues product-related tasks
-        discovered during the scraping process.
+        Every job returns its follow-up jobs, the main thread submits them to
+        the pool until nothing is pending. This method does not return anything
+        but enqueues product-related tasks discovered during the scraping process.
         """
         self.logger.info("Producer starting for categories: %s", self.category_urls)
-        for category_url in self.category_urls:
-
-            self._scrap_subcategory_links(category_url)
-            if self.stop_event.is_set():
-                break
-        while not self.sub_category_urls.empty():
-            link, category_hint = self.sub_category_urls.get()
-            self._scrape_listing_pages(link, category_hint)
+        self._run_jobs([(self._scrap_subcategory_links, url) for url in self.category_urls])
         self.logger.info("Producer finished enqueuing tasks.")
 
-    def _scrap_subcategory_links(self, category_url: str) -> None:
-        html_text = self.http_client.fetch(category_url)
-        if not html_text:
+    def _run_jobs(self, jobs: List[Job]) -> None:
+        """Run jobs on the producer pool, submitting their follow-up jobs until nothing is pending."""
+        if self.shared_pool:
+            for job in jobs:
+                self._schedule_job(job)
+            with self._jobs_done:
+                self._jobs_done.wait_for(lambda: self._pending_jobs == 0)
             return
-        doc = html.fromstring(html_text)
+        with ThreadPoolExecutor(max_workers=self.producer_threads, thread_name_prefix="Producer") as pool:
+            pending = {pool.submit(job, *args) for job, *args in jobs}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        follow_up_jobs = future.result()
+                    except Exception as ex:
+                        self.logger.exception("Unexpected error in producer job: %s", ex)
+                        continue
+                    if self.stop_event.is_set():
+                        continue
+                    for job, *args in follow_up_jobs:
+                        pending.add(pool.submit(job, *args))
+
+    def _schedule_job(self, job: Job) -> None:
+        """Schedule job as a listing task, its category hint (when it has one) picks the fairness lane."""
+        with self._jobs_done:
+            self._pending_jobs += 1
+        category_hint = job[2] if len(job) > 2 and isinstance(job[2], str) else ""
+        self.task_queue.submit((self._run_scheduled_job, job), LISTING_TASK, category_of(category_hint))
+
+    def _run_scheduled_job(self, job: Job) -> None:
+        follow_up_jobs = []
+        try:
+            follow_up_jobs = job[0](*job[1:])
+        except Exception as ex:
+            self.logger.exception("Unexpected error in producer job: %s", ex)
+        if not self.stop_event.is_set():
+            for follow_up_job in follow_up_jobs:
+                self._schedule_job(follow_up_job)
+        with self._jobs_done:
+            self._pending_jobs -= 1
+            self._jobs_done.notify_all()
+
+    def _scrap_subcategory_links(self, category_url: str) -> List[Job]:
+        """Return jobs scraping the listing pages of every subcategory of category_url."""
+        page = self.http_client.fetch_bytes(category_url)
+        if page is None or not page.body:
+            return []
+        doc = content_root(parse_html(page.body, page.encoding))
         parsed_url = urlparse(category_url)
         main_url = urlunparse((parsed_url.scheme, parsed_url.netloc, '', '', '', ''))
         category_hint = None
@@ -71,23 +151,19 @@ class CategoryProducer:
             category_hint = parsed_url.path.split('/')[-1].capitalize()
 
         try:
-            links_elements = doc.xpath('//div[contains(@class, "rt-BaseCard")]'
-                                       '//span[contains(text(), "View more")]/..')
-            if not links_elements:
-                return
-            for element in links_elements:
-                # creating task for scraping subcategory
-                self.sub_category_urls.put(
-                    (main_url + element.get('href'), category_hint)
-                )
+            links_elements = XPathSelectors.SUBCATEGORY_LINKS(doc)
+            # creating task for scraping subcategory
+            return [
+                (self._scrape_listing_pages, main_url + element.get('href'), category_hint)
+                for element in links_elements
+            ]
         except Exception as ex:
-
-            print("Error extracting subcategories links: %s", ex)
-            return
+            self.logger.exception("Error extracting subcategories links: %s", ex)
+            return []
 
     def _get_category_text(self, doc) -> Optional[str]:
         try:
-            elements = doc.xpath('//h1[contains(@class, "rt-Heading")]')
+            elements = XPathSelectors.HEADING(doc)
             for el in elements:
                 element_text = el.text
                 if not element_text:
@@ -101,67 +177,280 @@ class CategoryProducer:
             self.logger.exception("Unexpected error while extracting category text: %s", ex)
         return None
 
-    def _scrape_listing_pages(self, first_url: str, category_hint: str):
-        """Scraping listing pages"""       
-        def scrap_paggination(doc):
-            pagination_element = doc.xpath(
-                '//div[contains(@class, "rt-r-ai-center")]//'
-                'span[contains(string(), "Page") and contains(string(), "of")]'
-            )[0]
-            pagination_text = pagination_element.xpath('string()').strip()
-            current_page_text, max_page_text = re.findall(r'\d+', pagination_text)
-            _page = int(current_page_text)
-            _max_pages = int(max_page_text)
-            return _page, _max_pages
-            
-        page = 1
-        page_count = 0  # safety cap
-        page_count_set = False
-        url = first_url
-        sub_category = ''
-        parsed_url = urlparse(first_url)
+    def _scrape_listing_pages(self, first_url: str, category_hint: str) -> List[Job]:
+        """Scrape the first listing page and return jobs for the remaining pages."""
+        checkpoint = self.frontier.listing_page(first_url) if self.frontier else None
+        if checkpoint:
+            self.logger.debug("Listing page %s done in a previous run", first_url)
+            full_category, page_count = checkpoint
+            return self._listing_page_jobs(first_url, full_category, 1, page_count)
+        page = self._fetch_listing_page(first_url)
+        doc = self._parse_listing_doc(first_url, page) if page is not None else None
+        if doc is None:
+            return []
+        sub_category = self._get_category_text(doc)
+        full_category = f"{category_hint} - {sub_category}"
+        self._enqueue_listing_products(page, doc, first_url, full_category)
+        try:
+            page, page_count = self._scrap_paggination(doc)
+        except (IndexError, ValueError):
+            self.logger.debug("No pagination found on %s, single listing page", first_url)
+            page, page_count = 1, 1
+        if self.frontier:
+            self.frontier.mark_listing_done(first_url, full_category, page_count)
+        return self._listing_page_jobs(first_url, full_category, page, page_count)
+
+    def _listing_page_jobs(self, first_url: str, full_category: str, page: int, page_count: int) -> List[Job]:
+        return [
+            (self._scrape_listing_page, self._set_page_param(first_url, next_page), full_category)
+            for next_page in range(page + 1, page_count + 1)
+        ]
+
+    def _scrape_listing_page(self, url: str, full_category: str) -> List[Job]:
+        """Scrape one of the following listing pages, it has no follow-up jobs."""
+        if self.frontier and self.frontier.listing_page(url):
+            self.logger.debug("Listing page %s done in a previous run", url)
+            return []
+        page = self._fetch_listing_page(url)
+        if page is not None and self._enqueue_listing_products(page, None, url, full_category):
+            if self.frontier:
+                self.frontier.mark_listing_done(url, full_category)
+        return []
+
+    def _fetch_listing_page(self, url: str) -> Optional[RawPage]:
+        if self.stop_event.is_set():
+            return None
+        self.logger.debug("Scraping listing page %s", url)
+        page = self.http_client.fetch_bytes(url)
+        if page is None or not page.body:
+            return None
+        return page
+
+    def _parse_listing_doc(self, url: str, page: RawPage) -> Optional[html.HtmlElement]:
+        try:
+            return content_root(parse_html(page.body, page.encoding))
+        except Exception as e:
+            self.logger.warning("Error parsing listing page %s: %s", url, e)
+            return None
+
+    def _enqueue_listing_products(
+        self, page: RawPage, doc: Optional[html.HtmlElement], url: str, full_category: str
+    ) -> bool:
+        """
+        Enqueue the products of a listing page from its embedded JSON, or from the product
+        cards of doc (parsed here when not given). Return False if the page could not be parsed.
+        """
+        product_urls = self.json_extractor.listing_urls(page.body, page.encoding)
+        if product_urls is not None:
+            LISTING_PATHS[JSON_PATH].inc()
+            self.logger.debug("Read %d product URLs of %s from embedded JSON", len(product_urls), url)
+            self._enqueue_tasks([(urljoin(url, product_url), full_category) for product_url in product_urls])
+            return True
+        if doc is None:
+            doc = self._parse_listing_doc(url, page)
+            if doc is None:
+                return False
+        LISTING_PATHS[XPATH_PATH].inc()
+        self.logger.debug("Reading product cards of %s with XPath", url)
+        self._enqueue_product_cards(doc, url, full_category)
+        return True
+
+    def _enqueue_product_cards(self, doc, url: str, full_category: str) -> None:
+        parsed_url = urlparse(url)
         main_url = urlunparse((parsed_url.scheme, parsed_url.netloc, '', '', '', ''))
-        # scraping subcategory pages one by o
-        while (page <= page_count or not page_count_set) and not self.stop_event.is_set():
-            html_text = self.http_client.fetch(url)
-            print(url)
-            if not html_text:
-                continue
-            try:
-                doc = html.fromstring(html_text)
-                product_cards = doc.xpath('//a[contains(@class,'
-                                          ' "_card_1u7u9_1 _cardLink_1q928_1")]')
-            except Exception as e:
-
-                print(f"Error parsing product cards page: {e}")
-                return
-            if not page_count_set:
-                sub_category = self._get_category_text(doc)
-                # scraping current page and page count
-                page, page_count = scrap_paggination(doc)
-                page_count_set = True      
-            if not product_cards:
-                return None
+        try:
+            product_cards = XPathSelectors.PRODUCT_CARDS(doc)
+            # creating task for scraping product
+            self._enqueue_tasks([
+                (main_url + product_card.get('href'), full_category) for product_card in product_cards
+            ])
+        except Exception as ex:
+            self.logger.exception("Unexpected error while create task: %s", ex)
+
+    def _enqueue_tasks(self, tasks: List[Tuple[str, str]], task_class: str = PRODUCT_TASK) -> None:
+        if self.frontier:
+            tasks = self.frontier.add(tasks)
+        for task in tasks:
+            if isinstance(self.task_queue, TaskScheduler):
+                self.task_queue.submit(task, task_class)
+            else:
+                self.task_queue.put(task)
+
+    def _scrap_paggination(self, doc) -> Tuple[int, int]:
+        """Return (current page, page count) from the listing pagination label."""
+        pagination_element = XPathSelectors.PAGINATION(doc)[0]
+        pagination_text = XPathSelectors.STRING(pagination_element).strip()
+        current_page_text, max_page_text = re.findall(r'\d+', pagination_text)
+        return int(current_page_text), int(max_page_text)
 
+    def _set_page_param(self, url: str, page: int) -> str:
+        """Return url pointing to the given listing page"""
+        if re.search(r"page=\d+", url):
+            return re.sub(r"page=\d+", f"page={page}", url)
+        sep = "&" if "?" in url else "?"
+        return url + f"{sep}page={page}"
+
+
+class SitemapProducer(CategoryProducer):
+    """
+    Discovers product URLs from the sitemap index (default <site>/sitemap.xml) and its
+    child sitemaps instead of crawling category and listing pages. Sitemaps, gzipped
+    or not, are read with iterparse and every <url> entry is dropped once read, so no
+    full tree is built and product URLs reach the task queue while a sitemap is still read.
+
+    Sitemap URLs carry no category, so a product URL (path matching product_pattern) is
+    kept when a previous run stored it under one of the configured categories (see
+    set_known_categories). Categories are never derived from URL slugs, the crawl names
+    them after the page headings.
+    With a frontier, only URLs whose <lastmod> changed since they were last processed
+    (or that have none) are enqueued. When the sitemap yields no product of the configured
+    categories and none are known yet, produce() falls back to the category crawl. When
+    only some product URLs are unmatched (e.g. products added since the last run), the
+    category crawl runs to categorize them and enqueues those URLs only.
+    Modified products stored by a previous run are scheduled as refresh tasks.
+    """
+
+    def __init__(
+        self,
+        http_client: HttpClient,
+        category_urls: List[str],
+        task_queue: Queue,
+        sitemap_url: Optional[str] = None,
+        product_pattern: str = "/marketplace/",
+        stop_event: threading.Event = None,
+        producer_threads: int = 4,
+        frontier: Optional[CrawlFrontier] = None,
+        shared_pool: bool = False
+    ) -> None:
+        super().__init__(
+            http_client, category_urls, task_queue,
+            stop_event=stop_event, producer_threads=producer_threads, frontier=frontier, shared_pool=shared_pool
+        )
+        if not sitemap_url and not category_urls:
+            raise ValueError("SitemapProducer needs a sitemap URL or category URLs")
+        parsed_url = urlparse(sitemap_url or category_urls[0])
+        self.sitemap_url = sitemap_url or urlunparse((parsed_url.scheme, parsed_url.netloc, "/sitemap.xml", "", "", ""))
+        self.product_pattern = re.compile(product_pattern)
+        self.category_slugs = {urlparse(url).path.rstrip("/").split("/")[-1] for url in category_urls}
+        self.known_categories: Dict[str, str] = {}
+        self._matched = 0
+        # {url: lastmod} of sitemap product URLs without a category, until the category crawl finds them
+        self._unmatched: Dict[str, Optional[str]] = {}
+        self._categorizing = False
+        self._lock = threading.Lock()
+        self.logger = get_logger("SitemapProducer")
+
+    def set_known_categories(self, categories: Dict[str, str]) -> None:
+        """Keep the {url: category} of stored products whose top category is one of the configured ones."""
+        self.known_categories = {
+            url: category for url, category in categories.items()
+            if _slugify(category.split(" - ")[0]) in self.category_slugs
+        }
+        self.logger.info("Known product categories: %d URL(s)", len(self.known_categories))
+
+    def produce(self) -> None:
+        self.logger.info("Sitemap producer starting from %s", self.sitemap_url)
+        if self.frontier is None:
+            self.logger.warning("No frontier to keep sitemap lastmod in, every product URL is enqueued.")
+        self._matched = 0
+        self._unmatched = {}
+        self._run_jobs([(self._read_sitemap, self.sitemap_url)])
+        self.logger.info(
+            "Sitemap producer matched %d product URL(s), %d without a category.", self._matched, len(self._unmatched)
+        )
+        if self.stop_event.is_set():
+            return
+        if not self._matched and not self.known_categories:
+            self.logger.warning("No sitemap product URL matches the configured categories, crawling them instead.")
+            super().produce()
+        elif self._unmatched:
+            self.logger.info("Crawling the categories to categorize %d product URL(s).", len(self._unmatched))
+            self._categorizing = True
             try:
-                full_category = f"{category_hint} - {sub_category}"
-                for product_card in product_cards:
-                    # scrating task for scraping product
-                    self.task_queue.put(
-                        (main_url + product_card.get('href'), full_category)
-                    )
-            except Exception as ex:
-                self.logger.exception("Unexpected error while create task: %s", ex)
-
-            url = self._increment_page_param(url)
-            page += 1
-
-    def _increment_page_param(self, url: str) -> str:
-        """Increment page"""
-        m = re.search(r"page=(\d+)", url)
-        if m:
-            cur = int(m.group(1))
-            return url.replace(f"page={cur}", f"page={cur+1}")
-        else:
-            sep = "&" if "?" in url else "?"
-            return url + f"{sep}page=2"
+                super().produce()
+            finally:
+                self._categorizing = False
+            self.logger.info("%d sitemap product URL(s) are in no configured category.", len(self._unmatched))
+        self._unmatched = {}
+
+    def _read_sitemap(self, url: str) -> List[Job]:
+        """Enqueue the product URLs of a urlset and return jobs reading the child sitemaps of an index."""
+        if self.stop_event.is_set():
+            return []
+        self.logger.debug("Reading sitemap %s", url)
+        page = self.http_client.fetch_bytes(url)
+        if page is None or not page.body:
+            return []
+        source = BytesIO(page.body)
+        if page.body.startswith(GZIP_MAGIC):
+            source = gzip.GzipFile(fileobj=source)
+        jobs, entries = [], []
+        try:
+            for _, element in etree.iterparse(
+                source, events=("end",), tag=("{*}url", "{*}sitemap"), resolve_entities=False, no_network=True
+            ):
+                loc = (element.findtext("{*}loc") or "").strip()
+                lastmod = (element.findtext("{*}lastmod") or "").strip() or None
+                if loc and etree.QName(element).localname == "sitemap":
+                    jobs.append((self._read_sitemap, urljoin(url, loc)))
+                elif loc:
+                    entries.append((urljoin(url, loc), lastmod))
+                    if len(entries) >= SITEMAP_BATCH:
+                        self._enqueue_entries(entries)
+                        entries = []
+                # drop the entry and the ones before it, the tree never grows past a single entry
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+                if self.stop_event.is_set():
+                    break
+        except (etree.XMLSyntaxError, OSError, EOFError) as e:
+            self.logger.warning("Error parsing sitemap %s: %s", url, e)
+        self._enqueue_entries(entries)
+        return jobs
+
+    def _enqueue_entries(self, entries: List[Tuple[str, Optional[str]]]) -> None:
+        """Enqueue the (url, lastmod) product entries of the configured categories modified since the last run."""
+        products, unmatched = {}, {}
+        for url, lastmod in entries:
+            if not self.product_pattern.search(urlparse(url).path):
+                continue
+            SITEMAP_URLS.inc()
+            category = self._category(url)
+            if category is None:
+                SITEMAP_UNMATCHED.inc()
+                unmatched[url] = lastmod
+                continue
+            products[url] = (category, lastmod)
+        with self._lock:
+            self._unmatched.update(unmatched)
+        if not products:
+            return
+        with self._lock:
+            self._matched += len(products)
+        modified = set(products)
+        if self.frontier:
+            modified = self.frontier.filter_modified((url, lastmod) for url, (_, lastmod) in products.items())
+        SITEMAP_UNCHANGED.inc(len(products) - len(modified))
+        SITEMAP_ENQUEUED.inc(len(modified))
+        tasks = [(url, category) for url, (category, _) in products.items() if url in modified]
+        self._enqueue_tasks([task for task in tasks if task[0] in self.known_categories], REFRESH_TASK)
+        self._enqueue_tasks([task for task in tasks if task[0] not in self.known_categories])
+
+    def _enqueue_tasks(self, tasks: List[Tuple[str, str]], task_class: str = PRODUCT_TASK) -> None:
+        if self._categorizing:
+            # the category crawl only adds the sitemap URLs it is run for, the others are enqueued already
+            with self._lock:
+                lastmods = {url: self._unmatched.pop(url) for url, _ in tasks if url in self._unmatched}
+            tasks = [task for task in tasks if task[0] in lastmods]
+            if self.frontier and tasks:
+                self.frontier.filter_modified(lastmods.items())
+        super()._enqueue_tasks(tasks, task_class)
+
+    def _category(self, url: str) -> Optional[str]:
+        """Stored category of a product URL, None leaves the URL to the category crawl."""
+        return self.known_categories.get(url) or None
+
+
+def _slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
@@ -1,19 +1,41 @@
 
+import hashlib
+import sys
 from dataclasses import dataclass
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Product:
+    """Scraped product, slots keep per-instance memory small while items wait in the queues."""
     name: str
     description: str
     category: str
     min_price: Optional[int]
     max_price: Optional[int] 
     median_price: Optional[int]
+    url: Optional[str] = None
+    page_hash: Optional[str] = None
+
+    def __post_init__(self):
+        # thousands of products share a handful of categories
+        if self.category is not None:
+            self.category = sys.intern(self.category)
+
     def __str__(self):
         return f"Product(name={self.name}, description={self.description}, min_price={self.min_price}, max_price={self.max_price}, median_price={self.median_price})"
 
+    def fingerprint(self) -> str:
+        """Stable hash of the scraped content fields, used to detect unchanged products between runs."""
+        content = "\x1f".join(
+            "" if value is None else str(value)
+            for value in (
+                self.name, self.description, self.category,
+                self.min_price, self.max_price, self.median_price,
+            )
+        )
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
     def as_tuple(self):
         return (
             self.name,
@@ -22,4 +44,7 @@ class Product:
             self.min_price,
             self.max_price,
             self.median_price,
+            self.url,
+            self.page_hash,
+            self.fingerprint(),
         )
\ No newline at end of file
@@ -0,0 +1,91 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .product import Product
+
+
+class ProductBatch:
+    """
+    Columnar buffer of products on their way from the write_queue to a database.
+
+    Each field of Product.as_tuple() is kept in its own list. Products whose
+    (name, category) is already buffered are dropped through a key -> row index,
+    the first one wins. rows() zips the columns into the tuples executemany
+    and execute_values expect, without building a tuple per Product.
+    """
+
+    # column names in Product.as_tuple() order
+    FIELDS = (
+        "name", "description", "category", "min_price", "max_price", "median_price",
+        "url", "page_hash", "fingerprint",
+    )
+
+    __slots__ = (
+        "names", "descriptions", "categories", "min_prices", "max_prices", "median_prices",
+        "urls", "page_hashes", "fingerprints", "_index",
+    )
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self.descriptions: List[str] = []
+        self.categories: List[str] = []
+        self.min_prices: List[Optional[int]] = []
+        self.max_prices: List[Optional[int]] = []
+        self.median_prices: List[Optional[int]] = []
+        self.urls: List[Optional[str]] = []
+        self.page_hashes: List[Optional[str]] = []
+        self.fingerprints: List[str] = []
+        self._index: Dict[Tuple[str, str], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def append(self, product: Product) -> bool:
+        """Add product unless its (name, category) is already in the batch, return True if added."""
+        key = (product.name, product.category)
+        if key in self._index:
+            return False
+        self._index[key] = len(self.names)
+        self.names.append(product.name)
+        self.descriptions.append(product.description)
+        self.categories.append(product.category)
+        self.min_prices.append(product.min_price)
+        self.max_prices.append(product.max_price)
+        self.median_prices.append(product.median_price)
+        self.urls.append(product.url)
+        self.page_hashes.append(product.page_hash)
+        self.fingerprints.append(product.fingerprint())
+        return True
+
+    def extend(self, products: Iterable[Product]) -> None:
+        for product in products:
+            self.append(product)
+
+    def keys(self) -> Iterator[Tuple[str, str]]:
+        return zip(self.names, self.categories)
+
+    def columns(self) -> Tuple[List, ...]:
+        """Column lists in FIELDS order."""
+        return (
+            self.names, self.descriptions, self.categories,
+            self.min_prices, self.max_prices, self.median_prices,
+            self.urls, self.page_hashes, self.fingerprints,
+        )
+
+    def rows(self) -> Iterator[Tuple]:
+        """Rows in Product.as_tuple() order."""
+        return zip(*self.columns())
+
+    def select(self, indices: Iterable[int]) -> "ProductBatch":
+        """Return a new batch holding only the given rows."""
+        selected = ProductBatch()
+        for i in indices:
+            selected._index[(self.names[i], self.categories[i])] = len(selected.names)
+            selected.names.append(self.names[i])
+            selected.descriptions.append(self.descriptions[i])
+            selected.categories.append(self.categories[i])
+            selected.min_prices.append(self.min_prices[i])
+            selected.max_prices.append(self.max_prices[i])
+            selected.median_prices.append(self.median_prices[i])
+            selected.urls.append(self.urls[i])
+            selected.page_hashes.append(self.page_hashes[i])
+            selected.fingerprints.append(self.fingerprints[i])
+        return selected
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from .logger import get_logger
+from .metrics import metrics
+
+
+THROTTLE_STATUS_CODES = (429, 503)
+# longest Retry-After honoured, a server asking for more (e.g. a day) pauses us this long
+MAX_RETRY_AFTER = 60.0
+# how often async callers check for a free slot while the limit is reached
+ASYNC_POLL_INTERVAL = 0.05
+
+THROTTLED = metrics.counter("http_throttled_total", "Responses with 429/503 seen by the rate controller")
+
+
+def parse_retry_after(value: Optional[str], max_delay: float = MAX_RETRY_AFTER) -> Optional[float]:
+    """Return Retry-After header value (delta seconds or HTTP date) as seconds from now, at most max_delay."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), max_delay)
+    try:
+        return min(max(0.0, parsedate_to_datetime(value).timestamp() - time.time()), max_delay)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveConcurrencyController:
+    """
+    Limits requests in flight across all threads sharing an HttpClient with AIMD.
+
+    - every response faster than latency_target adds additive_increase / limit
+      to the limit, so it grows by about additive_increase per full window
+    - a 429/503 or a response slower than latency_target multiplies the limit
+      by decrease_factor, at most once per cooldown seconds
+    - Retry-After (or default_pause when it is missing), capped at max_pause, pauses
+      every thread, not only the one that received the 429/503
+    Event loops use acquire_async(), which polls instead of blocking the loop.
+    """
+
+    def __init__(
+        self,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        initial_limit: Optional[int] = None,
+        latency_target: float = 2.0,
+        additive_increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+        default_pause: float = 0.5,
+        max_pause: float = MAX_RETRY_AFTER
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(initial_limit or max(min_limit, max_limit // 2))
+        self.latency_target = latency_target
+        self.additive_increase = additive_increase
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.default_pause = default_pause
+        self.max_pause = max_pause
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        metrics.gauge("http_concurrency_limit", "Current AIMD limit of requests in flight", lambda: int(self.limit))
+        self.logger = get_logger("AdaptiveConcurrencyController")
+
+    def acquire(self) -> None:
+        """Block until a request slot is free and no Retry-After pause is active."""
+        with self._condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self.in_flight >= int(self.limit):
+                    self._condition.wait()
+                else:
+                    self.in_flight += 1
+                    return
+
+    def try_acquire(self) -> float:
+        """Take a request slot and return 0, or return the seconds to wait before trying again."""
+        with self._condition:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                return pause
+            if self.in_flight >= int(self.limit):
+                return ASYNC_POLL_INTERVAL
+            self.in_flight += 1
+            return 0.0
+
+    async def acquire_async(self) -> None:
+        """acquire() for coroutines, waits with asyncio.sleep so the event loop keeps running."""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, latency: float, status: Optional[int] = None, retry_after: Optional[str] = None) -> None:
+        """Free the slot and adapt the limit to the response (status None for failed requests)."""
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if status in THROTTLE_STATUS_CODES:
+                THROTTLED.inc()
+                delay = parse_retry_after(retry_after, self.max_pause)
+                if delay is None:
+                    delay = self.default_pause
+                if now + delay > self.paused_until:
+                    self.paused_until = now + delay
+                    self.logger.info("Throttled (%s), pausing all requests for %.1fs", status, delay)
+                self._decrease(now)
+            elif status is not None and latency > self.latency_target:
+                self._decrease(now)
+            elif status is not None:
+                self.limit = min(self.max_limit, self.limit + self.additive_increase / self.limit)
+            self._condition.notify_all()
+
+    def _decrease(self, now: float) -> None:
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        self.logger.debug("Concurrency limit decreased to %.1f", self.limit)
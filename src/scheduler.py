@@ -0,0 +1,189 @@
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from queue import Full, Queue
+from typing import Any, Dict, Optional, Tuple
+from .logger import get_logger
+from .metrics import metrics
+
+
+# task classes, a lower priority number is served first
+RETRY_TASK = "retry"
+REFRESH_TASK = "refresh"
+LISTING_TASK = "listing"
+PRODUCT_TASK = "product"
+DEFAULT_PRIORITIES = {RETRY_TASK: 0, REFRESH_TASK: 1, LISTING_TASK: 2, PRODUCT_TASK: 3}
+# classes counted against maxsize, listing jobs and retries are scheduled by consumers and never block
+BOUNDED_TASKS = (REFRESH_TASK, PRODUCT_TASK)
+
+SCHEDULED = {
+    task_class: metrics.counter(f"scheduler_{task_class}_tasks_total", f"Tasks scheduled as {task_class}")
+    for task_class in DEFAULT_PRIORITIES
+}
+RETRIES_EXHAUSTED = metrics.counter("scheduler_retries_exhausted_total", "Product tasks failed after every retry")
+
+
+@dataclass(slots=True)
+class ScheduledTask:
+    item: Any
+    task_class: str
+    category: str
+
+
+class TaskScheduler(Queue):
+    """
+    Task queue serving task classes by priority (retry, refresh, listing, product by default)
+    and, within a class, the categories round-robin: a category is served up to its quota of
+    tasks in a row (category_quotas by top-level category name, default_quota otherwise)
+    before the next category gets its turn.
+
+    put() schedules (url, category_hint) product tasks, submit() any item with its class.
+    Items that are jobs, (callable, *args) like the producer's, are run by the consumer with
+    run_job(), so listing pages and product pages are fetched by the same pool of threads.
+
+    maxsize bounds the product and refresh tasks only: putting one blocks while that many
+    are queued, jobs included, so listing pages are not read faster than products are fetched.
+    At most max_jobs jobs run at once, keep it below the number of consumers so the others
+    keep draining the products; while the products are full no job is started either.
+    retry() gives a failed product task up to max_retries more attempts, consumers call
+    finished() when a product task ends so its attempts are forgotten.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        priorities: Optional[Dict[str, int]] = None,
+        category_quotas: Optional[Dict[str, int]] = None,
+        default_quota: int = 1,
+        max_retries: int = 1,
+        max_jobs: Optional[int] = None
+    ):
+        unknown = set(priorities or {}) - set(DEFAULT_PRIORITIES)
+        if unknown:
+            raise ValueError(f"Unknown task classes: {sorted(unknown)}")
+        self.priorities = dict(DEFAULT_PRIORITIES, **(priorities or {}))
+        self.category_quotas = {category.lower(): quota for category, quota in (category_quotas or {}).items()}
+        self.default_quota = default_quota
+        self.max_retries = max_retries
+        self.max_jobs = max_jobs
+        self._attempts: Dict[str, int] = {}
+        # url -> retries scheduled whose failed attempt has not called finished() yet
+        self._retried: Dict[str, int] = {}
+        self.logger = get_logger("TaskScheduler")
+        super().__init__(maxsize)
+
+    # the Queue hooks below run under the queue mutex
+
+    def _init(self, maxsize: int) -> None:
+        # class -> category -> items, classes ordered by priority, categories in round-robin order
+        self._lanes: Dict[str, "OrderedDict[str, deque]"] = {
+            task_class: OrderedDict() for task_class in sorted(self.priorities, key=self.priorities.get)
+        }
+        # (class, category) -> tasks served in the current turn
+        self._served: Dict[Tuple[str, str], int] = {}
+        self._counts = {task_class: 0 for task_class in self._lanes}
+        self._size = 0
+        self._jobs_running = 0
+
+    def _qsize(self) -> int:
+        # queued jobs wait while max_jobs run, get() must not wake up for them
+        if self._jobs_capped():
+            return self._size - self._counts[LISTING_TASK]
+        return self._size
+
+    def _put(self, item: ScheduledTask) -> None:
+        self._lanes[item.task_class].setdefault(item.category, deque()).append(item.item)
+        self._counts[item.task_class] += 1
+        self._size += 1
+        SCHEDULED[item.task_class].inc()
+
+    def _get(self) -> Any:
+        skip_jobs = self._jobs_capped() or self._products_full()
+        for task_class, lanes in self._lanes.items():
+            if not lanes or (task_class == LISTING_TASK and skip_jobs):
+                continue
+            category, items = next(iter(lanes.items()))
+            item = items.popleft()
+            self._counts[task_class] -= 1
+            self._size -= 1
+            if task_class == LISTING_TASK and self.is_job(item):
+                self._jobs_running += 1
+            key = (task_class, category)
+            served = self._served.get(key, 0) + 1
+            if not items:
+                del lanes[category]
+                self._served.pop(key, None)
+            elif served >= self.category_quotas.get(category, self.default_quota):
+                lanes.move_to_end(category)
+                self._served.pop(key, None)
+            else:
+                self._served[key] = served
+            return item
+        raise IndexError("get from an empty TaskScheduler")
+
+    def _jobs_capped(self) -> bool:
+        return self.max_jobs is not None and self._jobs_running >= self.max_jobs
+
+    def _products_full(self) -> bool:
+        return 0 < self.maxsize <= sum(self._counts[task_class] for task_class in BOUNDED_TASKS)
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None) -> None:
+        if not isinstance(item, ScheduledTask):
+            item = ScheduledTask(item, PRODUCT_TASK, category_of(item[1]))
+        with self.not_full:
+            if item.task_class in BOUNDED_TASKS and self.maxsize > 0:
+                if not self.not_full.wait_for(lambda: not self._products_full(), timeout if block else 0):
+                    raise Full
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def submit(self, item: Any, task_class: str = PRODUCT_TASK, category: Optional[str] = None) -> None:
+        """Schedule item as task_class, category defaults to the one of a product task's hint."""
+        if category is None:
+            category = category_of(item[1]) if task_class != LISTING_TASK else ""
+        self.put(ScheduledTask(item, task_class, category.lower()))
+
+    def retry(self, task: Tuple[str, str]) -> bool:
+        """Schedule a failed product task again, False once it used up its retries."""
+        url = task[0]
+        with self.mutex:
+            attempts = self._attempts.get(url, 0)
+            if attempts >= self.max_retries:
+                self._attempts.pop(url, None)
+                RETRIES_EXHAUSTED.inc()
+                return False
+            self._attempts[url] = attempts + 1
+            self._retried[url] = self._retried.get(url, 0) + 1
+        self.logger.debug("Retrying %s (attempt %d)", url, attempts + 1)
+        self.put(ScheduledTask(task, RETRY_TASK, category_of(task[1])))
+        return True
+
+    def finished(self, task: Tuple[str, str]) -> None:
+        """Forget the attempts of a product task taken from the queue, unless it was retried."""
+        url = task[0]
+        with self.mutex:
+            retried = self._retried.get(url, 0)
+            if retried > 1:
+                self._retried[url] = retried - 1
+            elif retried:
+                del self._retried[url]
+            else:
+                self._attempts.pop(url, None)
+
+    @staticmethod
+    def is_job(item: Any) -> bool:
+        return callable(item[0])
+
+    def run_job(self, job: Tuple[Any, ...]) -> None:
+        """Run a (callable, *args) job taken from the queue, freeing its max_jobs slot when it returns."""
+        try:
+            job[0](*job[1:])
+        finally:
+            with self.mutex:
+                self._jobs_running -= 1
+                self.not_empty.notify()
+
+
+def category_of(category_hint: str) -> str:
+    """Fairness key of a category hint, its top-level category ("DevOps - Monitoring" -> "devops")."""
+    return (category_hint or "").split(" - ")[0].strip().lower()
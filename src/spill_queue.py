@@ -0,0 +1,69 @@
+import pickle
+import tempfile
+from collections import deque
+from queue import Queue
+from typing import Any, Optional
+from .metrics import metrics
+
+
+SPILLED = metrics.counter("queue_spilled_total", "Items written to queue spill files")
+
+
+class SpillQueue(Queue):
+    """
+    FIFO queue keeping at most memory_items items in memory, the overflow is
+    pickled to an append-only temporary file in spill_dir and read back in order.
+
+    put() never blocks, so memory stays flat without backpressure. Once
+    something is spilled, new items go to the file until it is drained, which
+    keeps the in-memory items older than the spilled ones. The file is
+    truncated whenever it is drained.
+    """
+
+    def __init__(self, memory_items: int, spill_dir: Optional[str] = None):
+        self.memory_items = memory_items
+        self.spill_dir = spill_dir
+        super().__init__()
+
+    # the Queue hooks below run under the queue mutex
+
+    def _init(self, maxsize: int) -> None:
+        self.queue = deque()
+        self._file = tempfile.TemporaryFile(prefix="spill-", dir=self.spill_dir)
+        self._read_pos = 0
+        self._write_pos = 0
+        self._spilled = 0
+
+    def _qsize(self) -> int:
+        return len(self.queue) + self._spilled
+
+    def _put(self, item: Any) -> None:
+        if not self._spilled and len(self.queue) < self.memory_items:
+            self.queue.append(item)
+            return
+        self._file.seek(self._write_pos)
+        pickle.dump(item, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._write_pos = self._file.tell()
+        self._spilled += 1
+        SPILLED.inc()
+
+    def _get(self) -> Any:
+        if not self.queue:
+            self._load_spilled()
+        return self.queue.popleft()
+
+    def _load_spilled(self) -> None:
+        """Move up to memory_items of the oldest spilled items back to memory."""
+        self._file.seek(self._read_pos)
+        for _ in range(min(self._spilled, max(1, self.memory_items))):
+            self.queue.append(pickle.load(self._file))
+            self._spilled -= 1
+        self._read_pos = self._file.tell()
+        if not self._spilled:
+            self._file.seek(0)
+            self._file.truncate()
+            self._read_pos = self._write_pos = 0
+
+    def close(self) -> None:
+        with self.mutex:
+            self._file.close()
@@ -0,0 +1,566 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from queue import Queue
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import psycopg2
+from psycopg2.extras import execute_values
+from .frontier import DONE, FAILED, IN_FLIGHT, PENDING, Task
+from .logger import get_logger
+
+
+def default_owner() -> str:
+    """Lease owner id of this process."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeasedWorkQueue(ABC):
+    """
+    Product task queue shared by several scraper processes or hosts.
+
+    One node runs discovery and add()s product tasks, every node lease()s batches
+    of pending tasks for its own workers, renew()s its leases while it works on
+    them, and reclaim_expired() returns the tasks of dead nodes to pending (or
+    marks them failed after max_attempts leases).
+
+    It is used in place of CrawlFrontier: workers and writers checkpoint through
+    the same mark()/mark_written() calls. add() returns no tasks to enqueue
+    locally, tasks only reach workers through lease().
+
+    Every discovery starts a new run (a counter in work_queue_meta), discovery_done()
+    only reports the current run, so a flag left by a previous run never drains the
+    nodes of the next one.
+    """
+
+    def __init__(self, owner: Optional[str] = None, max_attempts: int = 3):
+        self.owner = owner or default_owner()
+        self.max_attempts = max_attempts
+        self.run: Optional[int] = None
+        self.logger = get_logger("LeasedWorkQueue")
+
+    def add(self, tasks: Iterable[Task]) -> List[Task]:
+        self._insert(list(tasks))
+        return []
+
+    def resume(self) -> List[Task]:
+        """Tasks left by a crashed run are reclaimed once their leases expire, nothing to enqueue here."""
+        self.reclaim_expired()
+        return []
+
+    def mark(self, url: str, category_hint: str, state: str) -> None:
+        # lease() already marked the task in-flight for this owner
+        if state != IN_FLIGHT:
+            self._set_state(url, category_hint, state)
+
+    def filter_modified(self, entries: Iterable[Tuple[str, Optional[str]]]) -> Set[str]:
+        """The shared queue keeps no sitemap lastmod, every entry counts as modified."""
+        return {url for url, _ in entries}
+
+    def summary(self) -> str:
+        counts = self.counts()
+        return ", ".join(f"{state}={counts.get(state, 0)}" for state in (PENDING, IN_FLIGHT, DONE, FAILED))
+
+    @abstractmethod
+    def reset(self) -> None:
+        """
+        Forget the previous run, only the discovering node calls it. Tasks in flight
+        stay, their nodes may still be working on them.
+        """
+        pass
+
+    @abstractmethod
+    def start_run(self) -> int:
+        """Publish a new run for this node's discovery and return its id, only the discovering node calls it."""
+        pass
+
+    @abstractmethod
+    def lease(self, count: int, lease_seconds: float) -> List[Task]:
+        """Mark up to count pending tasks in-flight for this owner and return them."""
+        pass
+
+    @abstractmethod
+    def renew(self, lease_seconds: float) -> None:
+        """Extend the leases of every task this owner has in flight."""
+        pass
+
+    @abstractmethod
+    def reclaim_expired(self) -> int:
+        """Return expired in-flight tasks to pending, or fail them after max_attempts, return their count."""
+        pass
+
+    @abstractmethod
+    def release(self) -> None:
+        """Return tasks this owner still has in flight to pending, called on shutdown."""
+        pass
+
+    @abstractmethod
+    def outstanding(self) -> int:
+        """Number of tasks pending or in flight on other nodes."""
+        pass
+
+    @abstractmethod
+    def mark_written(self, urls: Iterable[str]) -> None:
+        pass
+
+    @abstractmethod
+    def listing_page(self, url: str) -> Optional[Tuple[str, int]]:
+        pass
+
+    @abstractmethod
+    def mark_listing_done(self, url: str, category: str, page_count: int = 1) -> None:
+        pass
+
+    @abstractmethod
+    def set_discovery_done(self) -> None:
+        """Record that discovery of the run started by start_run() is done."""
+        pass
+
+    @abstractmethod
+    def discovery_done(self) -> Optional[int]:
+        """Id of the current run if its discovery is done, otherwise None."""
+        pass
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def _insert(self, tasks: List[Task]) -> None:
+        pass
+
+    @abstractmethod
+    def _set_state(self, url: str, category_hint: str, state: str) -> None:
+        pass
+
+
+class SqliteWorkQueue(LeasedWorkQueue):
+    """
+    LeasedWorkQueue in a SQLite file, a stand-in for PostgresWorkQueue when all
+    processes run on one host (local tests). Leasing is a single UPDATE ... RETURNING,
+    SQLite serialises writers, so two processes never lease the same task.
+    """
+
+    def __init__(self, path: str, owner: Optional[str] = None, max_attempts: int = 3):
+        super().__init__(owner, max_attempts)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._ensure_tables()
+
+    def reset(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM work_queue WHERE state <> ?", (IN_FLIGHT,))
+            self._conn.execute("DELETE FROM work_queue_listings")
+
+    def start_run(self) -> int:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM work_queue_meta WHERE key = 'discovery_done'")
+            row = self._conn.execute(
+                """
+                INSERT INTO work_queue_meta (key, value) VALUES ('run', '1')
+                ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+                RETURNING value
+                """
+            ).fetchone()
+        self.run = int(row[0])
+        return self.run
+
+    def lease(self, count: int, lease_seconds: float) -> List[Task]:
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                """
+                UPDATE work_queue SET state = ?, owner = ?, lease_until = ?, attempts = attempts + 1
+                WHERE rowid IN (SELECT rowid FROM work_queue WHERE state = ? LIMIT ?)
+                RETURNING url, category_hint
+                """,
+                (IN_FLIGHT, self.owner, time.time() + lease_seconds, PENDING, count)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def renew(self, lease_seconds: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE work_queue SET lease_until = ? WHERE owner = ? AND state = ?",
+                (time.time() + lease_seconds, self.owner, IN_FLIGHT)
+            )
+
+    def reclaim_expired(self) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                UPDATE work_queue
+                SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, owner = NULL, lease_until = NULL
+                WHERE state = ? AND lease_until < ?
+                """,
+                (self.max_attempts, FAILED, PENDING, IN_FLIGHT, time.time())
+            )
+        return cursor.rowcount
+
+    def release(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE work_queue SET state = ?, owner = NULL, lease_until = NULL WHERE owner = ? AND state = ?",
+                (PENDING, self.owner, IN_FLIGHT)
+            )
+
+    def outstanding(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM work_queue WHERE state = ? OR (state = ? AND owner <> ?)",
+                (PENDING, IN_FLIGHT, self.owner)
+            ).fetchone()[0]
+
+    def mark_written(self, urls: Iterable[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE work_queue SET state = ?, owner = NULL, lease_until = NULL WHERE url = ?",
+                [(DONE, url) for url in urls]
+            )
+
+    def listing_page(self, url: str) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT category, page_count FROM work_queue_listings WHERE url = ?", (url,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def mark_listing_done(self, url: str, category: str, page_count: int = 1) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO work_queue_listings (url, category, page_count) VALUES (?, ?, ?)",
+                (url, category, page_count)
+            )
+
+    def set_discovery_done(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO work_queue_meta (key, value) VALUES ('discovery_done', ?)", (str(self.run),)
+            )
+
+    def discovery_done(self) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT done.value FROM work_queue_meta done
+                JOIN work_queue_meta run ON run.key = 'run' AND run.value = done.value
+                WHERE done.key = 'discovery_done'
+                """
+            ).fetchone()
+        return int(row[0]) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM work_queue GROUP BY state").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _insert(self, tasks: List[Task]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO work_queue (url, category_hint, state) VALUES (?, ?, ?)",
+                [(url, category_hint, PENDING) for url, category_hint in tasks]
+            )
+
+    def _set_state(self, url: str, category_hint: str, state: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE work_queue SET state = ?, owner = NULL, lease_until = NULL WHERE url = ? AND category_hint = ?",
+                (state, url, category_hint)
+            )
+
+    def _ensure_tables(self) -> None:
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS work_queue (
+                    url TEXT NOT NULL,
+                    category_hint TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    owner TEXT,
+                    lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (url, category_hint)
+                );
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS work_queue_state ON work_queue (state, lease_until)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS work_queue_listings (
+                    url TEXT PRIMARY KEY,
+                    category TEXT NOT NULL,
+                    page_count INTEGER NOT NULL
+                );
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS work_queue_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            """)
+
+
+class PostgresWorkQueue(LeasedWorkQueue):
+    """
+    LeasedWorkQueue in Postgres tables. lease() picks pending rows with
+    FOR UPDATE SKIP LOCKED, so concurrent nodes lease disjoint batches without
+    waiting on each other.
+    """
+
+    def __init__(self, dsn: str, owner: Optional[str] = None, max_attempts: int = 3):
+        super().__init__(owner, max_attempts)
+        self.dsn = dsn
+        self._lock = threading.Lock()
+        self._conn = psycopg2.connect(dsn)
+        self._ensure_tables()
+
+    def reset(self) -> None:
+        self._execute(
+            "DELETE FROM work_queue WHERE state <> %s; TRUNCATE work_queue_listings", (IN_FLIGHT,)
+        )
+
+    def start_run(self) -> int:
+        self.run = int(self._execute(
+            """
+            DELETE FROM work_queue_meta WHERE key = 'discovery_done';
+            INSERT INTO work_queue_meta (key, value) VALUES ('run', '1')
+            ON CONFLICT (key) DO UPDATE SET value = (work_queue_meta.value::integer + 1)::text
+            RETURNING value
+            """,
+            fetch=True
+        )[0][0])
+        return self.run
+
+    def lease(self, count: int, lease_seconds: float) -> List[Task]:
+        return self._execute(
+            """
+            WITH leased AS (
+                SELECT url, category_hint FROM work_queue
+                WHERE state = %s
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE work_queue w
+            SET state = %s, owner = %s, lease_until = now() + make_interval(secs => %s), attempts = w.attempts + 1
+            FROM leased
+            WHERE w.url = leased.url AND w.category_hint = leased.category_hint
+            RETURNING w.url, w.category_hint
+            """,
+            (PENDING, count, IN_FLIGHT, self.owner, lease_seconds),
+            fetch=True
+        )
+
+    def renew(self, lease_seconds: float) -> None:
+        self._execute(
+            "UPDATE work_queue SET lease_until = now() + make_interval(secs => %s) WHERE owner = %s AND state = %s",
+            (lease_seconds, self.owner, IN_FLIGHT)
+        )
+
+    def reclaim_expired(self) -> int:
+        return self._execute(
+            """
+            UPDATE work_queue
+            SET state = CASE WHEN attempts >= %s THEN %s ELSE %s END, owner = NULL, lease_until = NULL
+            WHERE state = %s AND lease_until < now()
+            """,
+            (self.max_attempts, FAILED, PENDING, IN_FLIGHT)
+        )
+
+    def release(self) -> None:
+        self._execute(
+            "UPDATE work_queue SET state = %s, owner = NULL, lease_until = NULL WHERE owner = %s AND state = %s",
+            (PENDING, self.owner, IN_FLIGHT)
+        )
+
+    def outstanding(self) -> int:
+        return self._execute(
+            "SELECT COUNT(*) FROM work_queue WHERE state = %s OR (state = %s AND owner <> %s)",
+            (PENDING, IN_FLIGHT, self.owner),
+            fetch=True
+        )[0][0]
+
+    def mark_written(self, urls: Iterable[str]) -> None:
+        self._execute(
+            "UPDATE work_queue SET state = %s, owner = NULL, lease_until = NULL WHERE url = ANY(%s)",
+            (DONE, list(urls))
+        )
+
+    def listing_page(self, url: str) -> Optional[Tuple[str, int]]:
+        rows = self._execute(
+            "SELECT category, page_count FROM work_queue_listings WHERE url = %s", (url,), fetch=True
+        )
+        return rows[0] if rows else None
+
+    def mark_listing_done(self, url: str, category: str, page_count: int = 1) -> None:
+        self._execute(
+            """
+            INSERT INTO work_queue_listings (url, category, page_count) VALUES (%s, %s, %s)
+            ON CONFLICT (url) DO UPDATE SET category = EXCLUDED.category, page_count = EXCLUDED.page_count
+            """,
+            (url, category, page_count)
+        )
+
+    def set_discovery_done(self) -> None:
+        self._execute(
+            """
+            INSERT INTO work_queue_meta (key, value) VALUES ('discovery_done', %s)
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+            """,
+            (str(self.run),)
+        )
+
+    def discovery_done(self) -> Optional[int]:
+        rows = self._execute(
+            """
+            SELECT done.value FROM work_queue_meta done
+            JOIN work_queue_meta run ON run.key = 'run' AND run.value = done.value
+            WHERE done.key = 'discovery_done'
+            """,
+            fetch=True
+        )
+        return int(rows[0][0]) if rows else None
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self._execute("SELECT state, COUNT(*) FROM work_queue GROUP BY state", fetch=True))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _insert(self, tasks: List[Task]) -> None:
+        with self._lock:
+            with self._conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    "INSERT INTO work_queue (url, category_hint, state) VALUES %s ON CONFLICT DO NOTHING",
+                    [(url, category_hint, PENDING) for url, category_hint in tasks]
+                )
+            self._conn.commit()
+
+    def _set_state(self, url: str, category_hint: str, state: str) -> None:
+        self._execute(
+            "UPDATE work_queue SET state = %s, owner = NULL, lease_until = NULL WHERE url = %s AND category_hint = %s",
+            (state, url, category_hint)
+        )
+
+    def _execute(self, query: str, params: Tuple = (), fetch: bool = False):
+        """Run query in its own transaction, return fetched rows or the affected row count."""
+        with self._lock:
+            try:
+                with self._conn.cursor() as cur:
+                    cur.execute(query, params)
+                    result = [tuple(row) for row in cur.fetchall()] if fetch else cur.rowcount
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return result
+
+    def _ensure_tables(self) -> None:
+        # nodes starting together would race on CREATE TABLE IF NOT EXISTS
+        self._execute("""
+            SELECT pg_advisory_xact_lock(hashtext('work_queue'));
+            CREATE TABLE IF NOT EXISTS work_queue (
+                url TEXT NOT NULL,
+                category_hint TEXT NOT NULL,
+                state TEXT NOT NULL,
+                owner TEXT,
+                lease_until TIMESTAMPTZ,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (url, category_hint)
+            );
+            CREATE INDEX IF NOT EXISTS work_queue_state ON work_queue (state, lease_until);
+            CREATE TABLE IF NOT EXISTS work_queue_listings (
+                url TEXT PRIMARY KEY,
+                category TEXT NOT NULL,
+                page_count INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS work_queue_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+
+
+def work_queue_from_dsn(dsn: str, owner: Optional[str] = None, max_attempts: int = 3) -> LeasedWorkQueue:
+    """PostgresWorkQueue for a postgresql DSN, otherwise SqliteWorkQueue on the given file path."""
+    if "postgresql" in dsn:
+        return PostgresWorkQueue(dsn, owner, max_attempts)
+    return SqliteWorkQueue(dsn, owner, max_attempts)
+
+
+class LeaseFetcher(threading.Thread):
+    """
+    Feeds the local task_queue from a LeasedWorkQueue.
+
+    Leases lease_batch tasks whenever fewer than that are waiting locally, renews
+    this node's leases and reclaims expired ones every lease_seconds / 3. Sets
+    drained once discovery of the current run is done and no task is pending or in
+    flight on another node, then keeps renewing until stop_event so the local tail
+    does not expire. A run already drained when the fetcher starts is one that ended
+    before this node came up, the fetcher waits for the next run instead.
+    """
+
+    def __init__(
+        self,
+        work_queue: LeasedWorkQueue,
+        task_queue: Queue,
+        lease_batch: int = 50,
+        lease_seconds: float = 60.0,
+        poll_interval: float = 1.0,
+        stop_event: threading.Event = None
+    ):
+        super().__init__(name="LeaseFetcher", daemon=True)
+        self.work_queue = work_queue
+        self.task_queue = task_queue
+        self.lease_batch = lease_batch
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.stop_event = stop_event or threading.Event()
+        self.drained = threading.Event()
+        self.logger = get_logger("LeaseFetcher")
+
+    def run(self):
+        next_renew = 0.0
+        finished_run = None
+        try:
+            finished_run = self._drained_run()
+            if finished_run is not None:
+                self.logger.info("Run %d is already drained, waiting for the next run.", finished_run)
+        except Exception as e:
+            self.logger.exception("Error talking to the shared work queue: %s", e)
+        while not self.stop_event.is_set():
+            try:
+                if time.monotonic() >= next_renew:
+                    self.work_queue.renew(self.lease_seconds)
+                    reclaimed = self.work_queue.reclaim_expired()
+                    if reclaimed:
+                        self.logger.info("Reclaimed %d expired lease(s).", reclaimed)
+                    next_renew = time.monotonic() + self.lease_seconds / 3
+                if not self.drained.is_set() and self.task_queue.qsize() < self.lease_batch:
+                    tasks = self.work_queue.lease(self.lease_batch, self.lease_seconds)
+                    for task in tasks:
+                        self.task_queue.put(task)
+                    if tasks:
+                        self.logger.debug("Leased %d task(s).", len(tasks))
+                        continue
+                    run = self._drained_run()
+                    if run is not None and run != finished_run:
+                        self.logger.info("Shared work queue drained (run %d).", run)
+                        self.drained.set()
+            except Exception as e:
+                self.logger.exception("Error talking to the shared work queue: %s", e)
+            self.stop_event.wait(self.poll_interval)
+
+    def _drained_run(self) -> Optional[int]:
+        run = self.work_queue.discovery_done()
+        if run is None or self.work_queue.outstanding():
+            return None
+        return run
@@ -1,15 +1,90 @@
 import threading
 
 from queue import Queue, Empty
-from .http_client import HttpClient
+from typing import Optional, Tuple
+from .fingerprints import FingerprintStore, page_hash
+from .frontier import DONE, FAILED, IN_FLIGHT, CrawlFrontier
+from .http_client import HttpClient, RawPage
+from .parse_pool import ParsePool
 from .parser import ProductParser
-from .logger import get_logger
+from .product import Product
+from .logger import PRODUCT_PARSED, get_logger
+from .scheduler import TaskScheduler
 
 
-class ProductWorker(threading.Thread):
+class ProductPageHandler:
+    """
+    Shared product page handling for thread and asyncio workers:
+    skips pages whose fingerprint did not change, parses the rest (in place
+    or on the ParsePool when one is given) and pushes Product into write_queue.
+
+    With a CrawlFrontier, tasks are checkpointed as in-flight when taken and as
+    failed or done (nothing to write) here, the writer marks written products done.
+    With a TaskScheduler as task_queue, pages that could not be fetched are retried
+    before they are marked failed.
+    """
+    parser: ProductParser
+    task_queue: Queue
+    write_queue: Queue
+    fingerprints: Optional[FingerprintStore]
+    parse_pool: Optional[ParsePool]
+    frontier: Optional[CrawlFrontier]
+
+    def _task_done(self, task: Tuple[str, str]) -> None:
+        if isinstance(self.task_queue, TaskScheduler):
+            self.task_queue.finished(task)
+        self.task_queue.task_done()
+
+    def _checkpoint(self, url: str, category_hint: str, state: str) -> None:
+        if self.frontier:
+            self.frontier.mark(url, category_hint, state)
+
+    def _handle_page(self, url: str, category_hint: str, page: Optional[RawPage]) -> None:
+        current_page_hash = self._page_to_parse(url, category_hint, page)
+        if current_page_hash is None:
+            return
+        if self.parse_pool:
+            self.parse_pool.submit(page.body, url, category_hint, current_page_hash, page.encoding)
+            return
+        self._parse_page(url, category_hint, page, current_page_hash)
+
+    def _page_to_parse(self, url: str, category_hint: str, page: Optional[RawPage]) -> Optional[str]:
+        """Return the hash of a page that needs parsing, None when it is empty or unchanged."""
+        if page is None or not page.body:
+            self.logger.debug("Empty html for %s", url)
+            if isinstance(self.task_queue, TaskScheduler) and self.task_queue.retry((url, category_hint)):
+                return None
+            self._checkpoint(url, category_hint, FAILED)
+            return None
+        current_page_hash = page_hash(page.body)
+        if self.fingerprints and self.fingerprints.is_page_unchanged(url, current_page_hash):
+            self.logger.debug("Page unchanged since last run, skip parsing %s", url)
+            self._checkpoint(url, category_hint, DONE)
+            return None
+        return current_page_hash
+
+    def _parse_page(self, url: str, category_hint: str, page: RawPage, current_page_hash: str) -> None:
+        product = self._parse_product(url, category_hint, page, current_page_hash)
+        if product:
+            # blocks while the writer is behind, only thread workers may wait here
+            self.write_queue.put(product)
+            self.logger.info("Parsed product: %s", product.name, extra=PRODUCT_PARSED)
+
+    def _parse_product(self, url: str, category_hint: str, page: RawPage, current_page_hash: str) -> Optional[Product]:
+        product = self.parser.parse_product_page(page.body, url, category_hint, page.encoding)
+        if product:
+            product.page_hash = current_page_hash
+            return product
+        self.logger.debug("Parser returned None for %s", url)
+        self._checkpoint(url, category_hint, FAILED)
+        return None
+
+
+class ProductWorker(ProductPageHandler, threading.Thread):
     """
     Worker that takes product URLs from task_queue, fetches pages,
     parses them and pushes Product into write_queue.
+    Producer jobs scheduled on a TaskScheduler task_queue are run here as well.
     """
 
     def __init__(
@@ -18,7 +93,10 @@ class ProductWorker(threading.Thread):
         parser: ProductParser,
         task_queue: Queue,
         write_queue: Queue,
-        stop_event: threading.Event = None
+        stop_event: threading.Event = None,
+        fingerprints: Optional[FingerprintStore] = None,
+        parse_pool: Optional[ParsePool] = None,
+        frontier: Optional[CrawlFrontier] = None
     ):
         super().__init__(daemon=True)
         self.http_client = http_client
@@ -26,6 +104,9 @@ class ProductWorker(threading.Thread):
         self.task_queue = task_queue
         self.write_queue = write_queue
         self.stop_event = stop_event or threading.Event()
+        self.fingerprints = fingerprints
+        self.parse_pool = parse_pool
+        self.frontier = frontier
         self.logger = get_logger("ProductWorker")
 
     def run(self):
@@ -34,19 +115,18 @@ class ProductWorker(threading.Thread):
                 task = self.task_queue.get(timeout=0.5)  # task is tuple (url, category_hint)
             except Empty:
                 continue
+            if isinstance(self.task_queue, TaskScheduler) and self.task_queue.is_job(task):
+                try:
+                    self.task_queue.run_job(task)
+                finally:
+                    self.task_queue.task_done()
+                continue
+            url, category_hint = task
             try:
-                url, category_hint = task
-                html_text = self.http_client.fetch(url)
-                if not html_text:
-                    self.logger.debug("Empty html for %s", url)
-                else:
-                    product = self.parser.parse_product_page(html_text, url, category_hint)
-                    if product:
-                        self.write_queue.put(product)
-                        self.logger.info("Parsed product: %s", product.name)
-                    else:
-                        self.logger.debug("Parser returned None for %s", url)
+                self._checkpoint(url, category_hint, IN_FLIGHT)
+                self._handle_page(url, category_hint, self.http_client.fetch_bytes(url))
             except Exception as e:
                 self.logger.exception("Error processing task %s: %s", task, e)
+                self._checkpoint(url, category_hint, FAILED)
             finally:
-                self.task_queue.task_done()
+                self._task_done(task)
@@ -0,0 +1,73 @@
+import threading
+from typing import Optional, Union
+from lxml import etree, html
+
+
+class XPathSelectors:
+    """
+    Registry of XPath selectors used by ProductParser and CategoryProducer.
+
+    Every selector is compiled once at import time. They are relative, so they
+    scan only the main content subtree returned by content_root() instead of
+    the whole document.
+    """
+
+    STRING = etree.XPath('string()')
+
+    # shared by product, category and listing pages
+    HEADING = etree.XPath('.//h1[contains(@class, "rt-Heading")]')
+
+    # product page
+    DESCRIPTION = etree.XPath(
+        './/div[contains(@class, "_read-more-box__content_122o3_1")]//p[contains(@class, "rt-Text")]'
+    )
+    # relative to the HEADING element, used when the read-more box is missing
+    FALLBACK_DESCRIPTION = etree.XPath('../..//p')
+    PRICE_AVERAGE = etree.XPath('.//div[contains(@class, "_rangeAverage_118fo_42")]/text()[normalize-space()]')
+    PRICE_RANGE = etree.XPath('.//div[contains(@class, "_rangeSlider_118fo_13")]//span/text()')
+
+    # category page
+    SUBCATEGORY_LINKS = etree.XPath(
+        './/div[contains(@class, "rt-BaseCard")]//span[contains(text(), "View more")]/..'
+    )
+
+    # listing page
+    PRODUCT_CARDS = etree.XPath('.//a[contains(@class, "_card_1u7u9_1 _cardLink_1q928_1")]')
+    PAGINATION = etree.XPath(
+        './/div[contains(@class, "rt-r-ai-center")]//span[contains(string(), "Page") and contains(string(), "of")]'
+    )
+
+
+# lxml parsers must not be shared between threads
+_parsers = threading.local()
+
+
+def get_html_parser(encoding: Optional[str] = None) -> html.HTMLParser:
+    """
+    Return this thread's HTMLParser for encoding that drops comments, processing instructions
+    and blank text. Without an encoding libxml2 detects it from the BOM or <meta charset>.
+    """
+    parsers = getattr(_parsers, "html_parsers", None)
+    if parsers is None:
+        parsers = _parsers.html_parsers = {}
+    parser = parsers.get(encoding)
+    if parser is None:
+        parser = parsers[encoding] = html.HTMLParser(
+            encoding=encoding, remove_comments=True, remove_pis=True, remove_blank_text=True
+        )
+    return parser
+
+
+def parse_html(page_html: Union[str, bytes], encoding: Optional[str] = None) -> html.HtmlElement:
+    """
+    Parse a full HTML document, skipping the fragment detection done by html.fromstring.
+    Bytes are decoded by libxml2 with the declared encoding, str is parsed as is.
+    """
+    if isinstance(page_html, str):
+        encoding = None
+    return etree.fromstring(page_html, parser=get_html_parser(encoding))
+
+
+def content_root(doc: html.HtmlElement) -> html.HtmlElement:
+    """Return the first <main> element to anchor relative selectors to, or the document itself."""
+    return next(doc.iter("main"), doc)
@@ -0,0 +1,34 @@
+import asyncio
+import threading
+from queue import Queue
+import pytest
+from src.async_worker import AsyncProductWorker
+from src.logger import configure_logging
+from src.product import Product
+
+
+@pytest.fixture(autouse=True, scope="module")
+def no_log_file():
+    configure_logging(path=None)
+
+
+def test_full_write_queue_does_not_block_the_loop():
+    write_queue = Queue(maxsize=1)
+    write_queue.put("previous product")
+    worker = AsyncProductWorker(None, None, Queue(), write_queue)
+    product = Product(name="Jenkins", description="", category="DevOps", min_price=1, max_price=3, median_price=2)
+    ticks = []
+
+    async def tick():
+        for _ in range(5):
+            ticks.append(len(ticks))
+            await asyncio.sleep(0.01)
+        # the writer catches up only after the loop kept running
+        threading.Thread(target=write_queue.get).start()
+
+    async def main():
+        await asyncio.wait_for(asyncio.gather(worker._put_product(product), tick()), timeout=5)
+
+    asyncio.run(main())
+    assert ticks == [0, 1, 2, 3, 4]
+    assert write_queue.get_nowait() is product
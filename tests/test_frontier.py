@@ -0,0 +1,80 @@
+import sqlite3
+from queue import Queue
+import pytest
+from src.databases.sqlite_writer import SqliteWriter
+from src.frontier import DONE, FAILED, IN_FLIGHT, PENDING, CrawlFrontier
+from src.logger import configure_logging
+from src.product import Product
+
+
+@pytest.fixture(autouse=True, scope="module")
+def no_log_file():
+    configure_logging(path=None)
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = CrawlFrontier(str(tmp_path / "frontier.db"))
+    yield frontier
+    frontier.close()
+
+
+def product(url: str) -> Product:
+    return Product(
+        name=url.rsplit("/", 1)[-1], description="", category="DevOps",
+        min_price=1, max_price=3, median_price=2, url=url
+    )
+
+
+def test_add_returns_only_new_tasks(frontier):
+    assert frontier.add([("/a", "DevOps"), ("/b", "DevOps")]) == [("/a", "DevOps"), ("/b", "DevOps")]
+    assert frontier.add([("/a", "DevOps"), ("/c", "DevOps")]) == [("/c", "DevOps")]
+
+
+def test_resume_returns_pending_and_in_flight_tasks(frontier):
+    frontier.add([("/pending", "DevOps"), ("/in-flight", "DevOps"), ("/done", "DevOps"), ("/failed", "DevOps")])
+    frontier.mark("/in-flight", "DevOps", IN_FLIGHT)
+    frontier.mark("/failed", "DevOps", FAILED)
+    frontier.mark_written(["/done"])
+    assert sorted(frontier.resume()) == [("/in-flight", "DevOps"), ("/pending", "DevOps")]
+    assert frontier.counts() == {PENDING: 2, DONE: 1, FAILED: 1}
+
+
+def test_reset_forgets_the_previous_run(frontier):
+    frontier.add([("/a", "DevOps")])
+    frontier.reset()
+    assert frontier.resume() == []
+
+
+def test_filter_modified_skips_processed_lastmod(frontier):
+    frontier.add([("/a", "DevOps"), ("/b", "DevOps")])
+    assert frontier.filter_modified([("/a", "2026-01-01"), ("/b", "2026-01-01")]) == {"/a", "/b"}
+    frontier.mark_written(["/a", "/b"])
+    assert frontier.filter_modified([("/a", "2026-01-01"), ("/b", "2026-02-01"), ("/c", None)]) == {"/b", "/c"}
+
+
+def test_resume_after_uncommitted_bulk_batch(frontier, tmp_path):
+    database = str(tmp_path / "products.db")
+    frontier.add([("/marketplace/a", "DevOps"), ("/marketplace/b", "DevOps")])
+    writer = SqliteWriter(database, Queue(), frontier=frontier, bulk=True, bulk_commit_rows=1000)
+    writer._conn = sqlite3.connect(database, check_same_thread=False)
+    writer._ensure_table()
+    writer._append(product("/marketplace/a"))
+    writer._flush()
+    # the run crashes before the bulk transaction is committed
+    writer._conn.close()
+    assert sqlite3.connect(database).execute("SELECT COUNT(*) FROM vendr_products").fetchone()[0] == 0
+    assert sorted(frontier.resume()) == [("/marketplace/a", "DevOps"), ("/marketplace/b", "DevOps")]
+
+
+def test_bulk_batch_is_marked_written_once_committed(frontier, tmp_path):
+    database = str(tmp_path / "products.db")
+    frontier.add([("/marketplace/a", "DevOps"), ("/marketplace/b", "DevOps")])
+    writer = SqliteWriter(database, Queue(), frontier=frontier, bulk=True, bulk_commit_rows=1000)
+    writer._conn = sqlite3.connect(database, check_same_thread=False)
+    writer._ensure_table()
+    writer._append(product("/marketplace/a"))
+    writer._flush()
+    writer._commit()
+    writer._conn.close()
+    assert frontier.resume() == [("/marketplace/b", "DevOps")]
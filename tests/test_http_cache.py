@@ -0,0 +1,85 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src.http_cache import ResponseCache
+from src.http_client import HttpClient
+from src.logger import configure_logging
+
+PAGE = "<html><body><h1>Café</h1></body></html>".encode("latin-1")
+ETAG = '"v1"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        Handler.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=iso-8859-1")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(autouse=True, scope="module")
+def no_log_file():
+    configure_logging(path=None)
+
+
+@pytest.fixture
+def server():
+    Handler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/product"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    yield cache
+    cache.close()
+
+
+def test_store_requires_a_validator(cache):
+    cache.store("/no-validator", PAGE, {})
+    cache.store("/etag", PAGE, {"ETag": ETAG}, "iso8859-1")
+    assert cache.get("/no-validator") is None
+    entry = cache.get("/etag")
+    assert (entry.body, entry.encoding) == (PAGE, "iso8859-1")
+    assert cache.conditional_headers(entry) == {"If-None-Match": ETAG}
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_bytes=2 * len(PAGE))
+    try:
+        for url in ("/a", "/b", "/c"):
+            cache.store(url, PAGE, {"ETag": ETAG})
+        assert cache.get("/a") is None
+        assert cache.get("/b") is not None and cache.get("/c") is not None
+    finally:
+        cache.close()
+
+
+def test_revalidated_page_is_served_from_cache(server, cache):
+    client = HttpClient(retries=0, cache=cache)
+    try:
+        first = client.fetch_bytes(server)
+        second = client.fetch_bytes(server)
+    finally:
+        client.close()
+    assert Handler.requests == [None, ETAG]
+    assert first.body == second.body == PAGE
+    assert second.encoding == "iso8859-1"
+    assert second.text() == "<html><body><h1>Café</h1></body></html>"
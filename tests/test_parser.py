@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+import pytest
+from src.embedded_json import JSON_PATH, XPATH_PATH
+from src.logger import configure_logging
+from src.parser import ProductParser
+
+PRODUCT_PAGE = (Path(__file__).parent.parent / "benchmarks" / "fixtures" / "product.html").read_bytes()
+URL = "/marketplace/datadog"
+
+
+@pytest.fixture(autouse=True, scope="module")
+def no_log_file():
+    configure_logging(path=None)
+
+
+def embed(page: bytes, offers: dict) -> bytes:
+    data = {"@context": "https://schema.org", "@type": "Product", "name": "Datadog", "offers": offers}
+    script = f'<script type="application/ld+json">{json.dumps(data)}</script>'.encode()
+    return page.replace(b"</head>", script + b"</head>", 1)
+
+
+def test_recorded_page_without_blob_uses_xpath():
+    product, path = ProductParser().extract(PRODUCT_PAGE, URL, "DevOps")
+    assert path == XPATH_PATH
+    assert (product.name, product.min_price, product.max_price, product.median_price) == (
+        "Datadog", 4500, 210000, 36402
+    )
+
+
+def test_median_price_is_never_read_from_offers_price():
+    page = embed(PRODUCT_PAGE, {"@type": "AggregateOffer", "price": 1, "lowPrice": 4500, "highPrice": 210000})
+    product, path = ProductParser().extract(page, URL, "DevOps")
+    assert path == XPATH_PATH
+    assert (product.min_price, product.max_price, product.median_price) == (4500, 210000, 36402)
+    assert product.description.startswith("Datadog is a monitoring")
+
+
+def test_blob_without_parsable_page_reports_json_path():
+    page = embed(b"<html><head></head><body></body></html>", {"lowPrice": "$4,500", "highPrice": 210000})
+    product, path = ProductParser().extract(page, URL, "DevOps")
+    assert path == JSON_PATH
+    assert (product.name, product.min_price, product.max_price, product.median_price) == (
+        "Datadog", 4500, 210000, None
+    )
@@ -0,0 +1,40 @@
+from queue import Queue
+import pytest
+from src.logger import configure_logging
+from src.producers import SitemapProducer
+
+SITE = "https://www.vendr.com"
+
+
+@pytest.fixture(autouse=True, scope="module")
+def no_log_file():
+    configure_logging(path=None)
+
+
+@pytest.fixture
+def producer():
+    # product pages below their category pages, so the URL alone suggests a category
+    producer = SitemapProducer(
+        None, [f"{SITE}/categories/devops"], Queue(), product_pattern=r"^/categories/[^/]+/[^/]+/[^/]+$"
+    )
+    producer.set_known_categories({
+        f"{SITE}/categories/devops/ci-cd/jenkins": "DevOps - CI/CD",
+        f"{SITE}/categories/collaboration/chat/slack": "Collaboration",
+    })
+    return producer
+
+
+def test_known_categories_keep_configured_categories_only(producer):
+    assert producer.known_categories == {f"{SITE}/categories/devops/ci-cd/jenkins": "DevOps - CI/CD"}
+
+
+def test_sitemap_urls_take_stored_categories_only(producer):
+    producer._enqueue_entries([
+        (f"{SITE}/categories/devops/ci-cd/jenkins", None),
+        (f"{SITE}/categories/devops/ci-cd/circleci", "2026-01-01"),
+        (f"{SITE}/blog/post", None),
+    ])
+    assert producer.task_queue.get_nowait() == (f"{SITE}/categories/devops/ci-cd/jenkins", "DevOps - CI/CD")
+    assert producer.task_queue.empty()
+    # no "Devops - Ci-cd" from the slugs, the category crawl names the category after the page heading
+    assert producer._unmatched == {f"{SITE}/categories/devops/ci-cd/circleci": "2026-01-01"}
@@ -0,0 +1,118 @@
+import threading
+from queue import Empty, Full
+import pytest
+from src.logger import configure_logging
+from src.scheduler import LISTING_TASK, REFRESH_TASK, RETRY_TASK, TaskScheduler
+
+
+@pytest.fixture(autouse=True, scope="module")
+def no_log_file():
+    configure_logging(path=None)
+
+
+def drain(scheduler: TaskScheduler) -> list:
+    items = []
+    while True:
+        try:
+            items.append(scheduler.get(block=False))
+        except Empty:
+            return items
+        scheduler.task_done()
+
+
+def job():
+    pass
+
+
+def test_classes_are_served_by_priority():
+    scheduler = TaskScheduler()
+    scheduler.put(("/p", "DevOps"))
+    scheduler.submit((job,), LISTING_TASK)
+    scheduler.submit(("/r", "DevOps"), REFRESH_TASK)
+    scheduler.submit(("/f", "DevOps"), RETRY_TASK)
+    assert drain(scheduler) == [("/f", "DevOps"), ("/r", "DevOps"), (job,), ("/p", "DevOps")]
+
+
+def test_priorities_can_be_overridden():
+    scheduler = TaskScheduler(priorities={LISTING_TASK: 5})
+    scheduler.submit((job,), LISTING_TASK)
+    scheduler.put(("/p", "DevOps"))
+    assert drain(scheduler) == [("/p", "DevOps"), (job,)]
+
+
+def test_unknown_task_class_is_rejected():
+    with pytest.raises(ValueError):
+        TaskScheduler(priorities={"sitemap": 0})
+
+
+def test_categories_take_turns_by_quota():
+    scheduler = TaskScheduler(category_quotas={"DevOps": 2})
+    for i in range(3):
+        scheduler.put((f"/d{i}", "DevOps - Monitoring"))
+    for i in range(3):
+        scheduler.put((f"/s{i}", "Security"))
+    assert [url for url, _ in drain(scheduler)] == ["/d0", "/d1", "/s0", "/d2", "/s1", "/s2"]
+
+
+def test_retries_are_exhausted_after_max_retries():
+    scheduler = TaskScheduler(max_retries=2)
+    task = ("/p", "DevOps")
+    assert scheduler.retry(task)
+    assert scheduler.retry(task)
+    assert not scheduler.retry(task)
+    assert drain(scheduler) == [task, task]
+    assert scheduler.retry(task)
+
+
+def test_finished_forgets_attempts_of_a_retried_task():
+    scheduler = TaskScheduler(max_retries=1)
+    task = ("/p", "DevOps")
+    assert scheduler.retry(task)
+    # the failed attempt ends, then the retry succeeds
+    scheduler.finished(task)
+    scheduler.finished(task)
+    assert scheduler._attempts == {}
+    assert scheduler.retry(task)
+
+
+def test_maxsize_bounds_product_tasks_only():
+    scheduler = TaskScheduler(maxsize=2)
+    scheduler.put(("/p0", "DevOps"))
+    scheduler.submit(("/r0", "DevOps"), REFRESH_TASK)
+    with pytest.raises(Full):
+        scheduler.put(("/p1", "DevOps"), block=False)
+    scheduler.submit((job,), LISTING_TASK)
+    assert scheduler.retry(("/p0", "DevOps"))
+    assert scheduler.qsize() == 4
+
+
+def test_jobs_block_while_products_are_full():
+    scheduler = TaskScheduler(maxsize=1, max_jobs=1)
+    put_done = threading.Event()
+
+    def enqueue_products():
+        scheduler.put(("/p0", "DevOps"))
+        scheduler.put(("/p1", "DevOps"))
+        put_done.set()
+
+    scheduler.submit((enqueue_products,), LISTING_TASK)
+    runner = threading.Thread(target=scheduler.run_job, args=(scheduler.get(block=False),))
+    runner.start()
+    assert not put_done.wait(0.2)
+    assert scheduler.get(timeout=1) == ("/p0", "DevOps")
+    assert put_done.wait(1)
+    runner.join()
+
+
+def test_max_jobs_limits_running_jobs():
+    scheduler = TaskScheduler(max_jobs=1)
+    scheduler.submit((job,), LISTING_TASK)
+    scheduler.submit((job,), LISTING_TASK)
+    scheduler.put(("/p", "DevOps"))
+    first = scheduler.get(block=False)
+    # the second job waits for the first, products are still served
+    assert scheduler.get(block=False) == ("/p", "DevOps")
+    with pytest.raises(Empty):
+        scheduler.get(block=False)
+    scheduler.run_job(first)
+    assert scheduler.get(block=False) == (job,)
@@ -0,0 +1,54 @@
+import sqlite3
+from queue import Queue
+import pytest
+from src.databases.sqlite_writer import HISTORY_TABLE, SqliteWriter
+from src.logger import configure_logging
+from src.product import Product
+from src.product_batch import ProductBatch
+
+
+@pytest.fixture(autouse=True, scope="module")
+def no_log_file():
+    configure_logging(path=None)
+
+
+@pytest.fixture
+def writer(tmp_path):
+    writer = SqliteWriter(str(tmp_path / "products.db"), Queue())
+    writer._conn = sqlite3.connect(writer.dsn, check_same_thread=False)
+    writer._ensure_table()
+    yield writer
+    writer._conn.close()
+
+
+def write(writer: SqliteWriter, median_price: int) -> None:
+    batch = ProductBatch()
+    batch.append(Product(
+        name="Jenkins", description="CI server", category="DevOps",
+        min_price=100, max_price=300, median_price=median_price, url="/marketplace/jenkins"
+    ))
+    writer._write(batch)
+
+
+def history(writer: SqliteWriter):
+    return writer._conn.execute(f"SELECT median_price FROM {HISTORY_TABLE} ORDER BY id").fetchall()
+
+
+def test_history_records_new_product(writer):
+    write(writer, 200)
+    assert history(writer) == [(200,)]
+
+
+def test_history_skips_unchanged_prices(writer):
+    write(writer, 200)
+    write(writer, 200)
+    assert history(writer) == [(200,)]
+    assert writer._conn.execute("SELECT COUNT(*) FROM vendr_products").fetchone()[0] == 1
+
+
+def test_history_records_price_change(writer):
+    write(writer, 200)
+    write(writer, 250)
+    write(writer, 250)
+    assert history(writer) == [(200,), (250,)]
+    assert writer._conn.execute("SELECT median_price FROM vendr_products").fetchone()[0] == 250